@@ -0,0 +1,61 @@
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, FloatField, OuterRef, Prefetch, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+# ---------------- BUNDLE AGGREGATES -----------------
+# BundleOffer.total_hashrate_th / total_power_watts / component_price /
+# savings are derived from the bundle's items and their products and stored
+# on the bundle, so listing bundles needs no per-item arithmetic.
+# update_bundle_aggregates() refreshes any set of bundles with one
+# UPDATE ... SET col = (SELECT SUM(...) FROM bundle items) and is called on
+# every BundleItem / BundleOffer / Product write that can change them.
+
+AGGREGATE_COLUMNS = ["total_hashrate_th", "total_power_watts", "component_price", "savings"]
+
+# what BundleItemDetailSerializer reads from an item
+ITEM_FIELDS = ["bundle", "product", "quantity", "product__model_name", "product__price"]
+
+# product columns a bundle's aggregates depend on
+PRODUCT_FIELDS = {"price", "hashrate", "power", "hashrate_th", "power_watts"}
+
+
+def _items_total(bundles, expression, output_field, zero):
+    item_model = bundles.model._meta.get_field("bundle_items").related_model
+    total = (
+        item_model.objects.filter(bundle=OuterRef("pk"))
+        .order_by()
+        .values("bundle")
+        .annotate(total=Sum(expression, output_field=output_field))
+        .values("total")
+    )
+    return Coalesce(Subquery(total[:1]), Value(zero), output_field=output_field)
+
+
+def update_bundle_aggregates(bundles):
+    """Recompute the aggregate columns for every bundle in `bundles` with one UPDATE."""
+    money = DecimalField(max_digits=12, decimal_places=2)
+    component_price = _items_total(bundles, F("product__price") * F("quantity"), money, Decimal("0.00"))
+
+    return bundles.order_by().update(
+        total_hashrate_th=_items_total(
+            bundles, F("product__hashrate_th") * F("quantity"), FloatField(), 0.0
+        ),
+        total_power_watts=_items_total(
+            bundles, F("product__power_watts") * F("quantity"), FloatField(), 0.0
+        ),
+        component_price=component_price,
+        savings=component_price - F("price"),
+    )
+
+
+def with_bundle_items(bundles):
+    """Bundles with their items and products loaded in one extra query."""
+    item_model = bundles.model._meta.get_field("bundle_items").related_model
+    return bundles.prefetch_related(
+        Prefetch(
+            "bundle_items",
+            queryset=item_model.objects.select_related("product").only(*ITEM_FIELDS).order_by("id"),
+        )
+    )
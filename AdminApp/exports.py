@@ -0,0 +1,212 @@
+import csv
+import tempfile
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from UserApp.models import HostingRequest, Order, Rental
+from UserApp.utils import with_invoice_id
+
+# ---------------- ADMIN DATA EXPORTS -----------------
+# Finance exports of orders / rentals / hosting requests / users.
+# Rows are read with queryset.iterator(chunk_size=CHUNK_SIZE) and written
+# one by one, so memory stays flat whatever the history size:
+#   csv   streamed line by line
+#   xlsx  openpyxl write-only workbook spooled to a temp file, then streamed
+
+CHUNK_SIZE = 2000
+STREAM_BLOCK = 64 * 1024
+# a cell starting with one of these is run as a formula by Excel / Sheets
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def _date(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return timezone.localtime(value).strftime("%Y-%m-%d %H:%M:%S")
+    return str(value)
+
+
+def _cell(value):
+    """Neutralize user-typed text a spreadsheet would evaluate (=HYPERLINK(...) etc.)."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def date_range_filter(date_field, start=None, end=None):
+    """
+    Inclusive day range as plain datetime bounds (local midnight), so the
+    column's index is usable - `__date` would wrap the column in a cast.
+    """
+    bounds = {}
+    if start:
+        bounds[f"{date_field}__gte"] = timezone.make_aware(datetime.combine(start, time.min))
+    if end:
+        bounds[f"{date_field}__lt"] = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+    return bounds
+
+
+def _order_items(order):
+    return "; ".join(
+        f"{item.quantity}x {item.product.model_name if item.product else item.bundle.name}"
+        for item in order.items.all()
+    )
+
+
+def _hosting_devices(hosting):
+    return sum(int(item.get("quantity") or 0) for item in hosting.items or [])
+
+
+# ---------- RESOURCES ----------
+# name -> queryset(), date field, {status value: filter}, [(header, value(obj))]
+
+EXPORTS = {
+    "orders": {
+        "queryset": lambda: (
+            with_invoice_id(Order.objects.select_related("user"), "buy")
+            .prefetch_related("items__product", "items__bundle")
+        ),
+        "date_field": "created_at",
+        "statuses": {key: {"status": key} for key, _ in Order.STATUS_CHOICES},
+        "columns": [
+            ("Order ID", lambda o: o.id),
+            ("Created", lambda o: _date(o.created_at)),
+            ("Customer", lambda o: o.user.username),
+            ("Email", lambda o: o.user.email),
+            ("Status", lambda o: o.status),
+            ("Total", lambda o: o.total_amount),
+            ("Items", _order_items),
+            ("Country", lambda o: (o.delivery_address or {}).get("country") or ""),
+            ("Invoice ID", lambda o: o.invoice_pk or ""),
+            ("Payment Intent", lambda o: o.stripe_payment_intent),
+        ],
+    },
+    "rentals": {
+        "queryset": lambda: with_invoice_id(
+            Rental.objects.select_related("user", "product", "bundle"), "rent"
+        ),
+        "date_field": "start_date",
+        "statuses": {"active": {"is_active": True}, "ended": {"is_active": False}},
+        "columns": [
+            ("Rental ID", lambda r: r.id),
+            ("Start", lambda r: _date(r.start_date)),
+            ("End", lambda r: _date(r.end_date)),
+            ("Customer", lambda r: r.user.username),
+            ("Email", lambda r: r.user.email),
+            ("Item", lambda r: r.product.model_name if r.product else r.bundle.name),
+            ("Days", lambda r: r.duration_days),
+            ("Amount Paid", lambda r: r.amount_paid),
+            ("Active", lambda r: "yes" if r.is_active else "no"),
+            ("Invoice ID", lambda r: r.invoice_pk or ""),
+        ],
+    },
+    "hosting": {
+        "queryset": lambda: with_invoice_id(HostingRequest.objects.select_related("user"), "hosting"),
+        "date_field": "created_at",
+        "statuses": {"paid": {"is_paid": True}, "unpaid": {"is_paid": False}},
+        "columns": [
+            ("Request ID", lambda h: h.id),
+            ("Created", lambda h: _date(h.created_at)),
+            ("Customer", lambda h: h.user.username),
+            ("Email", lambda h: h.user.email),
+            ("Phone", lambda h: h.phone),
+            ("Location", lambda h: h.get_hosting_location_display()),
+            ("Devices", _hosting_devices),
+            ("Setup Fee", lambda h: h.setup_fee if h.setup_fee is not None else ""),
+            ("Total", lambda h: h.total_amount if h.total_amount is not None else ""),
+            ("Paid", lambda h: "yes" if h.is_paid else "no"),
+            ("Monitoring", lambda h: h.monitoring_type or ""),
+            ("Invoice ID", lambda h: h.invoice_pk or ""),
+        ],
+    },
+    "users": {
+        "queryset": lambda: get_user_model().objects.all(),
+        "date_field": "date_joined",
+        "statuses": {
+            "active": {"is_active": True},
+            "inactive": {"is_active": False},
+            "staff": {"is_staff": True},
+        },
+        "columns": [
+            ("User ID", lambda u: u.id),
+            ("Joined", lambda u: _date(u.date_joined)),
+            ("Username", lambda u: u.username),
+            ("Email", lambda u: u.email),
+            ("First Name", lambda u: u.first_name),
+            ("Last Name", lambda u: u.last_name),
+            ("Active", lambda u: "yes" if u.is_active else "no"),
+            ("Staff", lambda u: "yes" if u.is_staff else "no"),
+            ("Last Login", lambda u: _date(u.last_login)),
+        ],
+    },
+}
+
+
+def export_queryset(resource, start=None, end=None, status=None):
+    """
+    Filtered queryset for an export, oldest first. Raises ValueError for an
+    unknown resource or status.
+    """
+    if resource not in EXPORTS:
+        raise ValueError(f"Unknown export '{resource}'. Use one of: {', '.join(EXPORTS)}")
+    spec = EXPORTS[resource]
+    date_field = spec["date_field"]
+
+    queryset = spec["queryset"]().filter(**date_range_filter(date_field, start, end))
+    if status:
+        if status not in spec["statuses"]:
+            raise ValueError(f"Unknown status '{status}'. Use one of: {', '.join(spec['statuses'])}")
+        queryset = queryset.filter(**spec["statuses"][status])
+
+    return queryset.order_by(date_field, "id")
+
+
+def export_rows(resource, queryset):
+    """Header row, then one row per object, fetched CHUNK_SIZE at a time."""
+    columns = EXPORTS[resource]["columns"]
+    yield [header for header, _ in columns]
+    for obj in queryset.iterator(chunk_size=CHUNK_SIZE):
+        yield [_cell(value(obj)) for _, value in columns]
+
+
+class _Echo:
+    """csv.writer target that hands each formatted line straight back."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield "\ufeff"      # BOM so Excel opens UTF-8 names correctly
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_xlsx(rows, title="Export"):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31])
+    for row in rows:
+        sheet.append(row)
+
+    with tempfile.TemporaryFile() as spool:
+        workbook.save(spool)
+        spool.seek(0)
+        while block := spool.read(STREAM_BLOCK):
+            yield block
+
+
+def stream_export(resource, file_format, queryset):
+    rows = export_rows(resource, queryset)
+    if file_format == "xlsx":
+        return stream_xlsx(rows, title=resource.title())
+    return stream_csv(rows)
@@ -0,0 +1,174 @@
+import hashlib
+import io
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from UserApp.helpers.cache import NamespacedCache
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+# ---------------- PRODUCT IMAGE INGESTION -----------------
+# Runs after the imported rows are committed (never inside a transaction):
+#   download every distinct URL concurrently (bounded pool, pooled session)
+#   -> sha256 of the bytes -> upload each distinct image once
+#   -> attach to all products with one bulk_update
+# The content hash -> Cloudinary resource map is cached, so re-importing a
+# sheet (or the same picture under another URL) uploads nothing again.
+
+MAX_WORKERS = 8
+DOWNLOAD_TIMEOUT = 10         # seconds, per request
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+HEARTBEAT_EVERY = 10          # seconds between progress() calls while ingesting
+HASH_CACHE_TTL = 30 * 24 * 3600
+
+image_cache = NamespacedCache("product-images", version=1)
+
+
+def make_session(pool_size=MAX_WORKERS):
+    """One keep-alive connection pool shared by all download threads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=[502, 503, 504]),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = "Cryptonite image importer"
+    return session
+
+
+def upload_to_cloudinary(content, digest):
+    """Upload image bytes; returns the value stored in Product.image."""
+    from cloudinary import uploader
+
+    resource = uploader.upload_resource(
+        io.BytesIO(content),
+        public_id=f"products/{digest[:32]}",   # same picture -> same public id
+        overwrite=False,
+        resource_type="image",
+    )
+    return resource.get_prep_value()
+
+
+class ImageIngestor:
+    """
+    usage:
+        report = ImageIngestor().attach([(product_id, image_url), ...])
+
+    report: {"attached", "downloaded", "uploaded", "reused", "failed": [{product_id, url, error}]}
+
+    progress() (no arguments) is called from the calling thread at most every
+    HEARTBEAT_EVERY seconds while downloads / uploads complete, so a
+    background job can show it is still alive.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, timeout=DOWNLOAD_TIMEOUT,
+                 session=None, uploader=upload_to_cloudinary, progress=None):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.session = session or make_session(max_workers)
+        self.uploader = uploader
+        self.progress = progress
+        self._last_beat = time.monotonic()
+
+    # ---------- stages ----------
+
+    def download(self, url):
+        with self.session.get(url, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+
+            content_type = response.headers.get("Content-Type", "")
+            if content_type and not content_type.startswith("image/"):
+                raise ValueError(f"not an image ({content_type})")
+
+            content = bytearray()
+            for block in response.iter_content(64 * 1024):
+                content.extend(block)
+                if len(content) > MAX_IMAGE_BYTES:
+                    raise ValueError("image larger than 10 MB")
+
+        if not content:
+            raise ValueError("empty response")
+        return bytes(content)
+
+    def upload(self, digest, content):
+        stored = image_cache.get(digest)
+        if stored is not None:
+            return stored, False
+
+        stored = self.uploader(content, digest)
+        image_cache.set(digest, stored, HASH_CACHE_TTL)
+        return stored, True
+
+    # ---------- pipeline ----------
+
+    def attach(self, images):
+        report = {"attached": 0, "downloaded": 0, "uploaded": 0, "reused": 0, "failed": []}
+        if not images:
+            return report
+
+        urls = list(dict.fromkeys(url for _, url in images))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            downloads = dict(self._beating(zip(urls, pool.map(self._safe, [self.download] * len(urls), urls))))
+
+            # url -> content hash; identical bytes are uploaded once
+            digests = {}
+            contents = {}
+            for url, (content, error) in downloads.items():
+                if error is None:
+                    digest = hashlib.sha256(content).hexdigest()
+                    digests[url] = digest
+                    contents.setdefault(digest, content)
+
+            report["downloaded"] = len(digests)
+
+            hashes = list(contents)
+            uploads = dict(self._beating(zip(hashes, pool.map(
+                self._safe, [self.upload] * len(hashes), hashes, [contents[h] for h in hashes]
+            ))))
+
+        stored_by_hash = {}
+        for digest, (result, error) in uploads.items():
+            if error is None:
+                stored, uploaded = result
+                stored_by_hash[digest] = stored
+                report["uploaded" if uploaded else "reused"] += 1
+
+        products = []
+        for product_id, url in images:
+            digest = digests.get(url)
+            stored = stored_by_hash.get(digest)
+            if stored is None:
+                error = downloads[url][1] or uploads[digest][1]
+                report["failed"].append({"product_id": product_id, "url": url, "error": error})
+                continue
+            products.append(Product(id=product_id, image=stored))
+
+        Product.objects.bulk_update(products, ["image"], batch_size=500)
+        report["attached"] = len(products)
+        return report
+
+    def _beating(self, results):
+        # results arrive here (calling thread) as the pool finishes them
+        for result in results:
+            if self.progress and time.monotonic() - self._last_beat >= HEARTBEAT_EVERY:
+                self._last_beat = time.monotonic()
+                self.progress()
+            yield result
+
+    @staticmethod
+    def _safe(func, *args):
+        try:
+            return func(*args), None
+        except Exception as exc:
+            logger.info("Image ingestion step failed: %s", exc)
+            return None, f"{type(exc).__name__}: {exc}"
@@ -0,0 +1,510 @@
+import codecs
+import csv
+import io
+import logging
+from decimal import Decimal
+from itertools import islice
+
+import pandas as pd
+from django.db import transaction
+
+from .bundles import PRODUCT_FIELDS as BUNDLE_PRODUCT_FIELDS, update_bundle_aggregates
+from .models import BundleOffer, Product, import_key
+from .search import update_search_vectors
+
+logger = logging.getLogger(__name__)
+
+# ---------------- BULK PRODUCT IMPORT -----------------
+# Streaming pipeline used by bulk_upload_products:
+#   read rows lazily (openpyxl read-only / csv) -> chunks of CHUNK_SIZE
+#   -> vectorized validation (pandas) -> bulk_create per chunk
+# Memory stays flat with the sheet size; every bad row is reported, the
+# good rows are imported.
+#
+# mode="upsert" matches rows to existing products on a natural key
+# (default model_name + brand): new keys are bulk-created, changed rows are
+# bulk-updated (only the columns present in the sheet), identical rows are
+# not written at all. dry_run=True runs the same diff without writing.
+
+CHUNK_SIZE = 1000
+
+COLUMN_MAPPING = {
+    "Model Name": "model_name",
+    "Description": "description",
+    "Minable Coins": "minable_coins",
+    "Hashrate": "hashrate",
+    "Power": "power",
+    "Algorithm": "algorithm",
+    "Category": "category",
+    "Price": "price",
+    "Hosting Fee Per KW": "hosting_fee_per_kw",
+    "Brand": "brand",
+    "Efficiency": "efficiency",
+    "Noise Level": "noise",
+    "Delivery Type": "delivery_type",
+    "Delivery Date": "delivery_date",
+    "Is Available": "is_available",
+    "Image URL": "image_url",
+}
+
+FIELDS = list(COLUMN_MAPPING.values())
+
+REQUIRED_FIELDS = [
+    "model_name",
+    "description",
+    "minable_coins",
+    "hashrate",
+    "power",
+    "algorithm",
+    "category",
+]
+
+TEXT_FIELDS = [
+    "model_name",
+    "description",
+    "minable_coins",
+    "hashrate",
+    "power",
+    "algorithm",
+    "brand",
+    "efficiency",
+    "noise",
+]
+
+DECIMAL_FIELDS = ["price", "hosting_fee_per_kw"]
+
+EMPTY_VALUES = {"", "nan", "null", "none"}
+TRUE_VALUES = {"true", "yes", "y", "1", "1.0"}
+FALSE_VALUES = {"false", "no", "n", "0", "0.0"}
+
+SUPPORTED_EXTENSIONS = (".xlsx", ".xls", ".csv")
+
+IMPORT_MODES = ("insert", "upsert")
+DEFAULT_KEY = ("model_name", "brand")
+KEY_FIELDS = ("model_name", "brand", "algorithm", "category")
+PREVIEW_LIMIT = 100
+
+
+# ---------- READERS ----------
+
+def read_rows(file, filename):
+    """
+    Yield (sheet row number, {field: raw value}) without loading the whole
+    file. Header names are mapped through COLUMN_MAPPING; blank rows are skipped.
+    """
+    name = filename.lower()
+    if name.endswith(".csv"):
+        rows = csv.reader(codecs.iterdecode(file, "utf-8-sig"))
+    elif name.endswith(".xlsx"):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+    elif name.endswith(".xls"):
+        # legacy format (max 65k rows): no streaming reader, load via pandas
+        frame = pd.read_excel(file, header=None, dtype=object)
+        rows = frame.itertuples(index=False, name=None)
+    else:
+        raise ValueError("Invalid file format. Upload .xlsx, .xls or .csv")
+
+    header = next(rows, None)
+    if header is None:
+        return
+
+    columns = [
+        COLUMN_MAPPING.get(str(title).strip(), str(title).strip()) if title is not None else None
+        for title in header
+    ]
+
+    for number, values in enumerate(rows, start=2):
+        record = {
+            column: value
+            for column, value in zip(columns, values)
+            if column in FIELDS
+        }
+        if any(not _is_blank(value) for value in record.values()):
+            yield number, record
+
+
+def estimate_rows(content, filename):
+    """
+    Cheap data row count for progress reporting (header excluded, blank rows
+    included); 0 when the format gives no hint.
+    """
+    name = filename.lower()
+    if name.endswith(".csv"):
+        return max(content.rstrip(b"\r\n").count(b"\n"), 0)
+    if name.endswith(".xlsx"):
+        from openpyxl import load_workbook
+
+        try:
+            workbook = load_workbook(io.BytesIO(content), read_only=True)
+            return max((workbook.active.max_row or 1) - 1, 0)
+        except Exception:
+            return 0
+    return 0
+
+
+def _is_blank(value):
+    return value is None or (isinstance(value, float) and pd.isna(value)) or str(value).strip() == ""
+
+
+def chunked(iterable, size=CHUNK_SIZE):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+# ---------- VECTORIZED VALIDATION ----------
+
+def _clean_text(column):
+    """Excel NaN / empty / 'null' cells -> <NA>, everything else stripped text."""
+    text = column.astype("string").str.strip()
+    return text.mask(text.str.lower().isin(EMPTY_VALUES))
+
+
+def _choice_lookup(choices):
+    lookup = {}
+    for key, label in choices:
+        lookup[key.lower()] = key
+        lookup[label.lower()] = key
+    return lookup
+
+
+CATEGORY_LOOKUP = _choice_lookup(Product.CATEGORY_CHOICES)
+DELIVERY_TYPE_LOOKUP = _choice_lookup(Product.DELIVERY_TYPE_CHOICES)
+
+
+def validate_chunk(records):
+    """
+    Validate a chunk of raw records column by column.
+
+    Returns (clean DataFrame, {position: {field: [messages]}}) - rows with
+    an entry in the errors dict must not be imported.
+    """
+    frame = pd.DataFrame.from_records(records, columns=FIELDS)
+    clean = pd.DataFrame(index=frame.index)
+    errors = {}
+
+    def flag(mask, field, message):
+        for position in mask[mask.fillna(False)].index:
+            errors.setdefault(position, {}).setdefault(field, []).append(message)
+
+    for field in FIELDS:
+        clean[field] = _clean_text(frame[field])
+
+    # required
+    for field in REQUIRED_FIELDS:
+        flag(clean[field].isna(), field, "This field is required.")
+
+    # max lengths from the model
+    for field in TEXT_FIELDS:
+        max_length = Product._meta.get_field(field).max_length
+        if max_length:
+            flag(clean[field].str.len() > max_length, field,
+                 f"Ensure this field has no more than {max_length} characters.")
+
+    # decimals
+    for field in DECIMAL_FIELDS:
+        model_field = Product._meta.get_field(field)
+        numbers = pd.to_numeric(clean[field], errors="coerce")
+        flag(clean[field].notna() & numbers.isna(), field, "A valid number is required.")
+        limit = 10 ** (model_field.max_digits - model_field.decimal_places)
+        flag(numbers.abs() >= limit, field,
+             f"Ensure there are no more than {model_field.max_digits} digits in total.")
+        flag(numbers < 0, field, "Ensure this value is greater than or equal to 0.")
+
+    # choices (key or label, any case)
+    for field, lookup in (("category", CATEGORY_LOOKUP), ("delivery_type", DELIVERY_TYPE_LOOKUP)):
+        keys = clean[field].str.lower().map(lookup)
+        flag(clean[field].notna() & keys.isna(), field,
+             f"Must be one of: {', '.join(sorted(set(lookup.values())))}.")
+        clean[field] = keys
+
+    clean["delivery_type"] = clean["delivery_type"].fillna("spot")
+
+    # dates
+    dates = pd.to_datetime(clean["delivery_date"], errors="coerce", format="mixed")
+    flag(clean["delivery_date"].notna() & dates.isna(), "delivery_date", "Enter a valid date.")
+    flag((clean["delivery_type"] == "future") & dates.isna(), "delivery_date",
+         "Delivery date is required for future delivery type.")
+    flag((clean["delivery_type"] == "spot") & dates.notna(), "delivery_date",
+         "Delivery date should be empty for spot delivery type.")
+    clean["delivery_date"] = dates.dt.date
+
+    # booleans
+    flags = clean["is_available"].str.lower()
+    available = flags.isin(TRUE_VALUES)
+    flag(flags.notna() & ~available & ~flags.isin(FALSE_VALUES), "is_available",
+         "Must be a valid boolean.")
+    clean["is_available"] = available.where(flags.notna(), True)
+
+    return clean, errors
+
+
+def build_product(row):
+    """One clean row -> unsaved Product (spec columns filled like save())."""
+    data = {
+        field: row[field]
+        for field in FIELDS
+        if field != "image_url" and not pd.isna(row[field])
+    }
+    for field in DECIMAL_FIELDS:
+        if field in data:
+            data[field] = Decimal(data[field]).quantize(Decimal("0.01"))
+
+    product = Product(**data)
+    product.refresh_spec_columns()
+    return product
+
+
+def natural_key(product, fields):
+    """
+    Comparable key: stripped, case-insensitive; blank, NULL and the 'null'
+    brand default match. Normalized exactly like import_key() does in SQL
+    (TRIM strips spaces only, lower() is not casefold()), so the rows
+    existing_products() selects are the rows whose keys compare equal here.
+    """
+    values = []
+    for field in fields:
+        value = str(getattr(product, field) or "").strip(" ").lower()
+        values.append("" if value in EMPTY_VALUES else value)
+    return tuple(values)
+
+
+# ---------- PIPELINE ----------
+
+class ProductImporter:
+    """
+    usage:
+        result = ProductImporter().run(request.FILES["file"], request.FILES["file"].name)
+        result = ProductImporter(mode="upsert", key=("model_name", "brand"), dry_run=True).run(...)
+
+    result: {"mode", "dry_run", "success_count", "error_count", "created_count",
+             "updated_count", "unchanged_count", "errors": [{"row", "errors"}],
+             "preview": [{"row", "action", "id", "changes"}], "images"}
+    where images is [(product id, image url)] for rows that had an Image URL
+    and whose product has no image yet (attach them after the import with
+    AdminApp.images.ImageIngestor). Nothing is written when dry_run is set.
+
+    progress(importer) is called after every chunk and once after
+    after_import (AdminApp.jobs stores the counters on the ImportJob).
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE, mode="insert", key=DEFAULT_KEY, dry_run=False,
+                 progress=None):
+        if mode not in IMPORT_MODES:
+            raise ValueError(f"Unknown import mode '{mode}'. Use one of: {', '.join(IMPORT_MODES)}")
+        key = tuple(key)
+        if not key or set(key) - set(KEY_FIELDS):
+            raise ValueError(f"Key fields must be chosen from: {', '.join(KEY_FIELDS)}")
+
+        self.chunk_size = chunk_size
+        self.mode = mode
+        self.key = key
+        self.dry_run = dry_run
+        self.progress = progress
+
+        self.processed_rows = 0
+        self.success_count = 0
+        self.error_count = 0
+        self.created_count = 0
+        self.updated_count = 0
+        self.unchanged_count = 0
+        self.errors = []
+        self.preview = []
+        self.images = []
+
+        self.columns = set()     # sheet columns seen so far
+        self.seen_keys = {}      # natural key -> first sheet row (upsert)
+
+    def run(self, file, filename):
+        for chunk in chunked(read_rows(file, filename), self.chunk_size):
+            self.import_chunk(chunk)
+            self.processed_rows += len(chunk)
+            if self.progress:
+                self.progress(self)
+
+        self.after_import()
+        if self.progress:
+            self.progress(self)
+
+        self.errors.sort(key=lambda error: error["row"])
+        return {
+            "mode": self.mode,
+            "dry_run": self.dry_run,
+            "success_count": self.success_count,
+            "error_count": self.error_count,
+            "created_count": self.created_count,
+            "updated_count": self.updated_count,
+            "unchanged_count": self.unchanged_count,
+            "errors": self.errors,
+            "preview": self.preview,
+            "images": self.images,
+        }
+
+    def add_error(self, number, field_errors):
+        self.errors.append({"row": number, "errors": field_errors})
+        self.error_count += 1
+
+    def add_preview(self, number, action, product_id=None, changes=None):
+        if len(self.preview) < PREVIEW_LIMIT:
+            self.preview.append({"row": number, "action": action, "id": product_id, "changes": changes or {}})
+
+    def import_chunk(self, chunk):
+        numbers = [number for number, _ in chunk]
+        records = [record for _, record in chunk]
+        for record in records:
+            self.columns.update(record)
+
+        clean, errors = validate_chunk(records)
+
+        for position, field_errors in sorted(errors.items()):
+            self.add_error(numbers[position], field_errors)
+
+        valid = clean.drop(index=list(errors))
+        if valid.empty:
+            return
+
+        rows = valid.astype(object).where(valid.notna(), None).to_dict("records")
+        entries = [
+            (numbers[position], row, build_product(row))
+            for position, row in zip(valid.index, rows)
+        ]
+
+        if self.mode == "upsert":
+            self.upsert_chunk(entries)
+        else:
+            self.insert_chunk(entries)
+
+    def insert_chunk(self, entries):
+        self.success_count += len(entries)
+        self.created_count += len(entries)
+
+        if self.dry_run:
+            for number, _, _ in entries:
+                self.add_preview(number, "create")
+            return
+
+        with transaction.atomic():
+            created = Product.objects.bulk_create([product for _, _, product in entries], batch_size=self.chunk_size)
+            update_search_vectors(Product.objects.filter(id__in=[p.id for p in created]))
+
+        self.images.extend(
+            (product.id, row["image_url"])
+            for (_, row, _), product in zip(entries, created)
+            if row["image_url"]
+        )
+
+    # ---------- upsert ----------
+
+    def update_fields(self):
+        """Sheet columns an existing product takes over (the key never changes)."""
+        return [
+            field for field in FIELDS
+            if field in self.columns and field != "image_url" and field not in self.key
+        ]
+
+    def existing_products(self, keys):
+        """natural key -> [existing products] for the keys in this chunk (one query)."""
+        first = {key[0] for key in keys}
+        if "" in first:
+            first |= EMPTY_VALUES
+
+        queryset = (
+            Product.objects
+            .annotate(_key=import_key(self.key[0]))
+            .filter(_key__in=first)
+            .order_by("id")
+        )
+
+        existing = {}
+        for product in queryset:
+            existing.setdefault(natural_key(product, self.key), []).append(product)
+        return existing
+
+    def upsert_chunk(self, entries):
+        fields = self.update_fields()
+        existing = self.existing_products([natural_key(product, self.key) for _, _, product in entries])
+        label = " + ".join(self.key)
+
+        creates = []
+        updates = []
+        changed_fields = set()
+
+        for number, row, product in entries:
+            key = natural_key(product, self.key)
+
+            if key in self.seen_keys:
+                self.add_error(number, {"key": [f"Duplicate {label} (first seen on row {self.seen_keys[key]})."]})
+                continue
+            self.seen_keys[key] = number
+
+            matches = existing.get(key, [])
+            if len(matches) > 1:
+                self.add_error(number, {"key": [
+                    f"{label} matches {len(matches)} existing products "
+                    f"(ids {', '.join(str(match.id) for match in matches)})."
+                ]})
+                continue
+
+            self.success_count += 1
+
+            if not matches:
+                creates.append((number, row, product))
+                self.created_count += 1
+                self.add_preview(number, "create")
+                continue
+
+            current = matches[0]
+            changes = {
+                field: {"old": getattr(current, field), "new": getattr(product, field)}
+                for field in fields
+                if getattr(current, field) != getattr(product, field)
+            }
+
+            if row["image_url"] and not current.image and not self.dry_run:
+                self.images.append((current.id, row["image_url"]))
+
+            if not changes:
+                self.unchanged_count += 1
+                continue
+
+            for field, change in changes.items():
+                setattr(current, field, change["new"])
+            if set(changes) & set(Product.SPEC_FIELDS):
+                current.refresh_spec_columns()
+                changed_fields.update(Product.SPEC_COLUMNS)
+            changed_fields.update(changes)
+
+            updates.append(current)
+            self.updated_count += 1
+            self.add_preview(number, "update", current.id, changes)
+
+        if self.dry_run:
+            return
+
+        with transaction.atomic():
+            created = Product.objects.bulk_create([product for _, _, product in creates], batch_size=self.chunk_size)
+            if updates:
+                Product.objects.bulk_update(updates, sorted(changed_fields), batch_size=self.chunk_size)
+            update_search_vectors(
+                Product.objects.filter(id__in=[p.id for p in created] + [p.id for p in updates])
+            )
+            if updates and changed_fields & BUNDLE_PRODUCT_FIELDS:
+                update_bundle_aggregates(
+                    BundleOffer.objects.filter(bundle_items__product__in=[p.id for p in updates])
+                )
+
+        self.images.extend(
+            (product.id, row["image_url"])
+            for (_, row, _), product in zip(creates, created)
+            if row["image_url"]
+        )
+
+    def after_import(self):
+        # bulk writes skip save(): rank the new / changed rows in one vectorized pass
+        if (self.created_count or self.updated_count) and not self.dry_run:
+            from UserApp.helpers.mining import refresh_product_profitability
+
+            refresh_product_profitability()
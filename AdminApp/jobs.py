@@ -0,0 +1,188 @@
+import csv
+import io
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .images import ImageIngestor
+from .importers import SUPPORTED_EXTENSIONS, ProductImporter, estimate_rows
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+# ---------------- BACKGROUND PRODUCT IMPORT -----------------
+# The request only stores the sheet (submit_import_job) and kicks
+# AdminApp.tasks.run_product_import after commit; the worker streams it
+# through ProductImporter and saves the counters after every chunk, so the
+# admin UI can poll progress instead of holding a gunicorn worker.
+
+MAX_IMPORT_BYTES = 50 * 1024 * 1024
+SWEEP_AFTER = 60            # seconds a queued job may wait for its kick
+STALE_AFTER = 30 * 60       # a running job without progress for this long is failed
+
+PROGRESS_FIELDS = [
+    "processed_rows",
+    "success_count",
+    "error_count",
+    "created_count",
+    "updated_count",
+    "unchanged_count",
+]
+
+
+def submit_import_job(file, user=None, mode="insert", key="model_name,brand", dry_run=False):
+    """
+    Validate the options, store the upload and queue it. Raises ValueError
+    for an unsupported file, size or option (nothing is stored then).
+    """
+    if not file.name.lower().endswith(SUPPORTED_EXTENSIONS):
+        raise ValueError("Invalid file format. Upload .xlsx, .xls or .csv")
+    if file.size > MAX_IMPORT_BYTES:
+        raise ValueError("File is larger than 50 MB")
+
+    key_fields = [field.strip() for field in key.split(",") if field.strip()]
+    ProductImporter(mode=mode, key=key_fields, dry_run=dry_run)     # validates mode / key
+
+    content = file.read()
+
+    job = ImportJob.objects.create(
+        created_by=user,
+        filename=file.name[:255],
+        source=content,
+        mode=mode,
+        key=",".join(key_fields),
+        dry_run=dry_run,
+        total_rows=estimate_rows(content, file.name),
+    )
+
+    transaction.on_commit(lambda: kick_import_job(job.pk))
+    return job
+
+
+def kick_import_job(job_pk):
+    """Best effort - the beat schedule sweeps queued jobs anyway."""
+    from AdminApp.tasks import run_product_import
+
+    try:
+        run_product_import.apply_async(args=[job_pk], retry=False)
+    except Exception:
+        logger.warning("Could not enqueue import job %s", job_pk, exc_info=True)
+
+
+def claim_import_job(job_pk):
+    """QUEUED -> RUNNING for exactly one worker; None if someone else has it."""
+    with transaction.atomic():
+        job = (
+            ImportJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(pk=job_pk, status=ImportJob.QUEUED)
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = ImportJob.RUNNING
+        job.started_at = timezone.now()
+        job.save(update_fields=["status", "started_at", "updated_at"])
+        return job
+
+
+def run_import_job(job_pk):
+    """Run one queued job to completion. Returns the job (or None if not claimable)."""
+    job = claim_import_job(job_pk)
+    if job is None:
+        return None
+
+    running = ImportJob.objects.filter(pk=job.pk, status=ImportJob.RUNNING)
+
+    def save_progress(importer):
+        running.update(
+            updated_at=timezone.now(),
+            **{field: getattr(importer, field) for field in PROGRESS_FIELDS},
+        )
+
+    def heartbeat():
+        # keeps fail_stale_import_jobs off a long image ingest
+        running.update(updated_at=timezone.now())
+
+    importer = ProductImporter(
+        mode=job.mode,
+        key=job.key.split(","),
+        dry_run=job.dry_run,
+        progress=save_progress,
+    )
+
+    try:
+        result = importer.run(io.BytesIO(bytes(job.source)), job.filename)
+        images = result.pop("images")
+        result["images"] = ImageIngestor(progress=heartbeat).attach(images) if images else None
+    except Exception as exc:
+        logger.exception("Import job %s failed", job.pk)
+        status = ImportJob.FAILED
+        last_error = f"{type(exc).__name__}: {exc}"[:2000]
+        result = None
+    else:
+        status = ImportJob.SUCCEEDED
+        last_error = ""
+
+    # only a job still RUNNING is finished here: if the stale sweep already
+    # failed it, that verdict stands
+    finished = running.update(
+        status=status,
+        last_error=last_error,
+        errors=importer.errors,
+        result={"preview": result["preview"], "images": result["images"]} if result else {},
+        source=b"",             # the sheet is not needed any more
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+        **{field: getattr(importer, field) for field in PROGRESS_FIELDS},
+    )
+    if not finished:
+        logger.warning("Import job %s was no longer running when it finished", job.pk)
+
+    job.refresh_from_db()
+    return job
+
+
+def pending_import_jobs(older_than=SWEEP_AFTER):
+    """Queued jobs whose enqueue-time kick was lost."""
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return ImportJob.objects.filter(
+        status=ImportJob.QUEUED, created_at__lte=cutoff
+    ).order_by("created_at").values_list("pk", flat=True)
+
+
+def fail_stale_import_jobs(older_than=STALE_AFTER):
+    """
+    Running jobs whose worker died. They are not retried: an insert-mode
+    import may already have committed part of the sheet.
+    """
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return ImportJob.objects.filter(status=ImportJob.RUNNING, updated_at__lte=cutoff).update(
+        status=ImportJob.FAILED,
+        last_error="Worker stopped before the import finished.",
+        finished_at=timezone.now(),
+    )
+
+
+def error_report_rows(job):
+    """The stored error report as CSV lines: one line per row and field."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return line
+
+    writer.writerow(["row", "field", "message"])
+    yield flush()
+
+    for error in job.errors:
+        for field, messages in error["errors"].items():
+            for message in messages:
+                writer.writerow([error["row"], field, message])
+                yield flush()
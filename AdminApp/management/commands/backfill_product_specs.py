@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from AdminApp.bundles import update_bundle_aggregates
+from AdminApp.models import BundleOffer, Product
+
+
+class Command(BaseCommand):
+    help = "Re-parse hashrate / power / efficiency into the numeric spec columns"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        products = Product.objects.only(
+            "id", *Product.SPEC_FIELDS, *Product.SPEC_COLUMNS
+        ).order_by("id")
+
+        batch = []
+        updated = 0
+        unparsed = 0
+
+        for product in products.iterator(chunk_size=batch_size):
+            product.refresh_spec_columns()
+            if product.hashrate_th is None or product.power_watts is None:
+                unparsed += 1
+
+            batch.append(product)
+            if len(batch) >= batch_size:
+                updated += Product.objects.bulk_update(batch, Product.SPEC_COLUMNS)
+                batch = []
+
+        if batch:
+            updated += Product.objects.bulk_update(batch, Product.SPEC_COLUMNS)
+
+        # bulk_update skips Product.save: bring the bundle totals along
+        update_bundle_aggregates(BundleOffer.objects.all())
+
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} products."))
+        if unparsed:
+            self.stdout.write(self.style.WARNING(
+                f"{unparsed} products have a hashrate or power that could not be parsed."
+            ))
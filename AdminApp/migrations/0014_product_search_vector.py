@@ -0,0 +1,56 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:31
+
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+INDEX_NAME = "product_search_vector_gin"
+
+# The vector as defined when this migration was written (an inlined copy of
+# AdminApp.search.PRODUCT_SEARCH_VECTOR); later edits to search.py must not
+# change what replaying this migration does.
+SEARCH_CONFIG = "english"
+
+
+def create_search_index(apps, schema_editor):
+    # GIN / tsvector only exist on Postgres; other backends search with icontains
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    Product = apps.get_model("AdminApp", "Product")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS %s ON %s USING gin (search_vector)" % (
+            schema_editor.quote_name(INDEX_NAME),
+            schema_editor.quote_name(Product._meta.db_table),
+        )
+    )
+    Product.objects.using(schema_editor.connection.alias).update(search_vector=(
+        SearchVector("model_name", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("brand", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("algorithm", weight="B", config=SEARCH_CONFIG)
+        + SearchVector("minable_coins", weight="B", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="C", config=SEARCH_CONFIG)
+    ))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS %s" % schema_editor.quote_name(INDEX_NAME))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AdminApp', '0013_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:25
+
+from django.db import migrations, models
+
+from UserApp.helpers.units import parse_efficiency_j_th, parse_hashrate_th, parse_power_watts
+
+
+def backfill_spec_columns(apps, schema_editor):
+    # same rules as Product.refresh_spec_columns (historical models have no methods)
+    Product = apps.get_model("AdminApp", "Product")
+    products = list(Product.objects.only("id", "hashrate", "power", "efficiency"))
+    for product in products:
+        product.hashrate_th = parse_hashrate_th(product.hashrate)
+        product.power_watts = parse_power_watts(product.power)
+        product.efficiency_j_th = parse_efficiency_j_th(product.efficiency)
+        if product.efficiency_j_th is None and product.hashrate_th and product.power_watts:
+            product.efficiency_j_th = round(product.power_watts / product.hashrate_th, 2)
+    Product.objects.bulk_update(
+        products, ["hashrate_th", "power_watts", "efficiency_j_th"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AdminApp', '0014_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='efficiency_j_th',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='hashrate_th',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='power_watts',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_spec_columns, migrations.RunPython.noop),
+    ]
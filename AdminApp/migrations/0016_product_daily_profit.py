@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AdminApp', '0015_product_spec_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='daily_profit_usd',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='profitability_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:59
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+# Self-contained on historical models (not UserApp.helpers.reviews), so later
+# edits to the live helpers cannot change this backfill. review_count and
+# average_rating already exist; only the new columns are filled in.
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Product = apps.get_model("AdminApp", "Product")
+    ProductReview = apps.get_model("UserApp", "ProductReview")
+
+    columns = ["rating_sum"] + [f"rating_{stars}_count" for stars in range(1, 6)]
+    rows = (
+        ProductReview.objects.order_by()
+        .values("product_id")
+        .annotate(
+            rating_sum=Sum("rating"),
+            **{f"rating_{stars}_count": Count("id", filter=Q(rating=stars)) for stars in range(1, 6)},
+        )
+    )
+    products = [Product(id=row.pop("product_id"), **row) for row in rows.iterator()]
+    Product.objects.bulk_update(products, columns, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AdminApp', '0017_importjob'),
+        ('UserApp', '0019_invoicepdf'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:04
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+# Inlined copy of AdminApp.bundles.update_bundle_aggregates as of this
+# migration, on historical models; later edits to bundles.py must not
+# change what this backfill does.
+
+def _items_total(BundleItem, expression, output_field, zero):
+    total = (
+        BundleItem.objects.filter(bundle=OuterRef("pk"))
+        .order_by()
+        .values("bundle")
+        .annotate(total=Sum(expression, output_field=output_field))
+        .values("total")
+    )
+    return Coalesce(Subquery(total[:1]), Value(zero), output_field=output_field)
+
+
+def backfill_bundle_aggregates(apps, schema_editor):
+    BundleOffer = apps.get_model("AdminApp", "BundleOffer")
+    BundleItem = apps.get_model("AdminApp", "BundleItem")
+
+    money = models.DecimalField(max_digits=12, decimal_places=2)
+    component_price = _items_total(
+        BundleItem, F("product__price") * F("quantity"), money, Decimal("0.00")
+    )
+    BundleOffer.objects.update(
+        total_hashrate_th=_items_total(
+            BundleItem, F("product__hashrate_th") * F("quantity"), models.FloatField(), 0.0
+        ),
+        total_power_watts=_items_total(
+            BundleItem, F("product__power_watts") * F("quantity"), models.FloatField(), 0.0
+        ),
+        component_price=component_price,
+        savings=component_price - F("price"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AdminApp', '0018_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bundleoffer',
+            name='component_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='bundleoffer',
+            name='savings',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='bundleoffer',
+            name='total_hashrate_th',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='bundleoffer',
+            name='total_power_watts',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_bundle_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:20
+
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AdminApp', '0019_bundle_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.db.models.functions.text.Lower(django.db.models.functions.text.Trim(django.db.models.functions.comparison.Coalesce('model_name', models.Value('')))), django.db.models.functions.text.Lower(django.db.models.functions.text.Trim(django.db.models.functions.comparison.Coalesce('brand', models.Value('')))), name='product_import_key_idx'),
+        ),
+    ]
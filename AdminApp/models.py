@@ -4,6 +4,23 @@ from cloudinary.models import CloudinaryField
 from django.db import models
 from cloudinary.models import CloudinaryField
 from decimal import Decimal
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models import Value
+from django.db.models.functions import Coalesce, Lower, Trim
+
+from .search import SEARCH_FIELDS, update_search_vectors
+from .bundles import AGGREGATE_COLUMNS, PRODUCT_FIELDS as BUNDLE_PRODUCT_FIELDS, update_bundle_aggregates
+from django.utils import timezone
+from UserApp.helpers.mining import product_daily_profit
+from UserApp.helpers.units import parse_efficiency_j_th, parse_hashrate_th, parse_power_watts
+
+def import_key(field):
+    """
+    lower(trim(coalesce(field, ''))): the bulk importer's natural-key column,
+    matched by ProductImporter.existing_products and indexed on Product.
+    """
+    return Lower(Trim(Coalesce(field, Value(""))))
+
 
 class Product(models.Model):
 
@@ -137,6 +154,18 @@ class Product(models.Model):
         help_text="Example: 75 dB"
     )
 
+    # ---------------- NORMALIZED SPECS ----------------
+    # parsed from hashrate / power / efficiency on save (see refresh_spec_columns)
+    hashrate_th = models.FloatField(null=True, blank=True, editable=False, db_index=True)
+    power_watts = models.FloatField(null=True, blank=True, editable=False, db_index=True)
+    efficiency_j_th = models.FloatField(null=True, blank=True, editable=False, db_index=True)
+
+    # ---------------- PROFITABILITY RANKING ----------------
+    # daily profit (USD, 1 miner, default electricity cost), recomputed in bulk
+    # on every BTC price / network stats refresh - see UserApp.helpers.mining.refresh_product_profitability
+    daily_profit_usd = models.FloatField(null=True, blank=True, editable=False, db_index=True)
+    profitability_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
+
     # ---------------- DELIVERY ----------------
     DELIVERY_TYPE_CHOICES = [
         ("spot", "Spot"),
@@ -169,8 +198,97 @@ class Product(models.Model):
     average_rating = models.FloatField(default=0)
     review_count = models.PositiveIntegerField(default=0)
 
+    # ---------------- REVIEW AGGREGATES ----------------
+    # kept in step with ProductReview by UserApp/helpers/reviews.py
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+
+    # ---------------- SEARCH ----------------
+    # weighted tsvector over SEARCH_FIELDS, GIN-indexed on Postgres (see AdminApp/search.py)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # keyset pagination: ORDER BY created_at DESC, id DESC
+            models.Index(fields=["-created_at", "-id"], name="product_created_id_idx"),
+            # bulk upsert lookup on the default key (model_name, brand)
+            models.Index(import_key("model_name"), import_key("brand"), name="product_import_key_idx"),
+        ]
+
     def __str__(self):
         return self.model_name
+
+    SPEC_FIELDS = ["hashrate", "power", "efficiency"]
+    SPEC_COLUMNS = ["hashrate_th", "power_watts", "efficiency_j_th"]
+    PROFITABILITY_COLUMNS = ["daily_profit_usd", "profitability_updated_at"]
+    # pick the coin network the profit is priced on (helpers.network.network_for)
+    NETWORK_FIELDS = ["minable_coins", "algorithm"]
+    RATING_COLUMNS = [
+        "review_count", "rating_sum", "average_rating",
+        "rating_1_count", "rating_2_count", "rating_3_count", "rating_4_count", "rating_5_count",
+    ]
+
+    @property
+    def rating_histogram(self):
+        """{1: count, ..., 5: count}"""
+        return {stars: getattr(self, f"rating_{stars}_count") for stars in range(1, 6)}
+
+    def refresh_spec_columns(self):
+        """Fill hashrate_th / power_watts / efficiency_j_th from the text specs."""
+        self.hashrate_th = parse_hashrate_th(self.hashrate)
+        self.power_watts = parse_power_watts(self.power)
+        self.efficiency_j_th = parse_efficiency_j_th(self.efficiency)
+
+        # efficiency left blank -> derive it from power / hashrate
+        if self.efficiency_j_th is None and self.hashrate_th and self.power_watts:
+            self.efficiency_j_th = round(self.power_watts / self.hashrate_th, 2)
+
+    def refresh_profitability(self):
+        """daily_profit_usd at the last cached BTC price (no upstream call)."""
+        self.daily_profit_usd = product_daily_profit(self)
+        self.profitability_updated_at = timezone.now()
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None:
+            self.refresh_spec_columns()
+            self.refresh_profitability()
+            if not self._state.adding and not kwargs.get("force_insert"):
+                # the rating columns are only moved by apply_rating_delta's F()
+                # updates; writing back the values loaded with this instance
+                # would undo every review saved since it was read
+                kwargs["update_fields"] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in self.RATING_COLUMNS
+                ]
+        elif set(update_fields) & set(self.SPEC_FIELDS + self.NETWORK_FIELDS):
+            extra = set(self.PROFITABILITY_COLUMNS)
+            if set(update_fields) & set(self.SPEC_FIELDS):
+                self.refresh_spec_columns()
+                extra |= set(self.SPEC_COLUMNS)
+            self.refresh_profitability()
+            kwargs["update_fields"] = set(update_fields) | extra
+
+        super().save(*args, **kwargs)
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or set(update_fields) & set(SEARCH_FIELDS):
+            update_search_vectors(Product.objects.filter(pk=self.pk))
+        if update_fields is None or set(update_fields) & BUNDLE_PRODUCT_FIELDS:
+            update_bundle_aggregates(BundleOffer.objects.filter(bundle_items__product=self.pk))
+
+    def delete(self, *args, **kwargs):
+        # the cascade removes this product's BundleItems without calling their delete()
+        bundle_ids = list(BundleItem.objects.filter(product=self.pk).values_list("bundle_id", flat=True))
+        result = super().delete(*args, **kwargs)
+        if bundle_ids:
+            update_bundle_aggregates(BundleOffer.objects.filter(pk__in=bundle_ids))
+        return result
+
     @property
     def discount_amount(self):
         if self.price and self.discount_percentage > 0:
@@ -201,6 +319,13 @@ class BundleOffer(models.Model):
     total_hashrate = models.CharField(max_length=100, blank=True, null=True)  
     total_power = models.CharField(max_length=100, blank=True, null=True)
 
+    # ---------------- COMPUTED FROM ITEMS ----------------
+    # kept up to date by AdminApp/bundles.py:update_bundle_aggregates
+    total_hashrate_th = models.FloatField(default=0, editable=False)
+    total_power_watts = models.FloatField(default=0, editable=False)
+    component_price = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    savings = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+
     image = CloudinaryField("image", blank=True, null=True)
 
 
@@ -209,6 +334,17 @@ class BundleOffer(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # savings follows the bundle price
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "price" in update_fields:
+            self.refresh_aggregates()
+
+    def refresh_aggregates(self):
+        update_bundle_aggregates(BundleOffer.objects.filter(pk=self.pk))
+        self.refresh_from_db(fields=AGGREGATE_COLUMNS)
+
 
 
 class BundleItem(models.Model):
@@ -223,9 +359,19 @@ class BundleItem(models.Model):
     class Meta:
         unique_together = ("bundle", "product")
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_bundle_aggregates(BundleOffer.objects.filter(pk=self.bundle_id))
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        update_bundle_aggregates(BundleOffer.objects.filter(pk=self.bundle_id))
+        return result
+
 
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils.text import slugify
 
 class Blog(models.Model):
@@ -319,3 +465,74 @@ class Events(models.Model):
 
 
 
+
+
+class ImportJob(models.Model):
+    """
+    Background product import (AdminApp.jobs). The uploaded sheet is kept in
+    `source` until the worker has run it; progress counters are updated after
+    every chunk and the per-row error report is stored in `errors`.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    STATUS_CHOICES = (
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    )
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+
+    filename = models.CharField(max_length=255)
+    source = models.BinaryField(editable=False)
+    mode = models.CharField(max_length=10, default="insert")
+    key = models.CharField(max_length=100, default="model_name,brand")
+    dry_run = models.BooleanField(default=False)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+
+    # ---------------- PROGRESS ----------------
+    total_rows = models.PositiveIntegerField(default=0, help_text="Estimated from the file at submit time")
+    processed_rows = models.PositiveIntegerField(default=0)
+    success_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    unchanged_count = models.PositiveIntegerField(default=0)
+
+    # ---------------- REPORT ----------------
+    errors = models.JSONField(default=list, blank=True)
+    result = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    last_error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="import_job_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.status})"
+
+    @property
+    def progress(self):
+        """0-100; an estimate while running (total_rows comes from the file size hints)."""
+        if self.status in (self.SUCCEEDED, self.FAILED):
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(99, int(self.processed_rows * 100 / self.total_rows))
@@ -0,0 +1,57 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Cast
+
+
+# ---------------- PRODUCT FULL-TEXT SEARCH -----------------
+# Postgres: stored, weighted tsvector (Product.search_vector) + GIN index.
+# Other databases (SQLite in tests): plain icontains over the same fields.
+
+SEARCH_CONFIG = "english"
+
+SEARCH_FIELDS = ["model_name", "brand", "algorithm", "minable_coins", "description"]
+
+PRODUCT_SEARCH_VECTOR = (
+    SearchVector("model_name", weight="A", config=SEARCH_CONFIG)
+    + SearchVector("brand", weight="A", config=SEARCH_CONFIG)
+    + SearchVector("algorithm", weight="B", config=SEARCH_CONFIG)
+    + SearchVector("minable_coins", weight="B", config=SEARCH_CONFIG)
+    + SearchVector("description", weight="C", config=SEARCH_CONFIG)
+)
+
+
+def full_text_supported(using="default"):
+    return connections[using].vendor == "postgresql"
+
+
+def update_search_vectors(queryset):
+    """
+    Recompute search_vector for every product in `queryset` with one UPDATE.
+    No-op on databases without tsvector support.
+    """
+    if not full_text_supported(queryset.db):
+        return 0
+    return queryset.update(search_vector=PRODUCT_SEARCH_VECTOR)
+
+
+def search_products(queryset, term):
+    """
+    Filter `queryset` to products matching `term` and annotate `search_rank`
+    (higher is better).
+    """
+    if full_text_supported(queryset.db):
+        query = SearchQuery(term, search_type="websearch", config=SEARCH_CONFIG)
+        # ts_rank is float4; as float8 it survives the JSON keyset cursor
+        # unchanged, so the seek filter compares like with like on ties
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=Cast(SearchRank(F("search_vector"), query), FloatField())
+        )
+
+    condition = Q()
+    for field in SEARCH_FIELDS:
+        condition |= Q(**{f"{field}__icontains": term})
+
+    return queryset.filter(condition).annotate(
+        search_rank=Value(0.0, output_field=FloatField())
+    )
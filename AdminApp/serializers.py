@@ -10,7 +10,7 @@ class ProductSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Product
-        fields = "__all__"
+        exclude = ["search_vector"]
 
     def get_image(self, obj):
         if obj.image:
@@ -26,7 +26,7 @@ class ProductSerializer(serializers.ModelSerializer):
 class ProductCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = "__all__"
+        exclude = ["search_vector"]
 
     def validate(self, data):
         delivery_type = data.get("delivery_type")
@@ -53,7 +53,7 @@ class ProductUpdateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Product
-        fields = "__all__"
+        exclude = ["search_vector"]
 
     def validate(self, data):
         delivery_type = data.get("delivery_type")
@@ -211,13 +211,16 @@ class BundleOfferCreateSerializer(serializers.ModelSerializer):
         # Create the bundle (CloudinaryField handles image upload automatically)
         bundle = BundleOffer.objects.create(**validated_data)
         
-        # Create bundle items
-        for item_data in items_data:
-            BundleItem.objects.create(
+        # Create bundle items (bulk_create skips BundleItem.save, so refresh totals once)
+        BundleItem.objects.bulk_create(
+            BundleItem(
                 bundle=bundle,
                 product_id=item_data["product_id"],
                 quantity=item_data["quantity"]
             )
+            for item_data in items_data
+        )
+        bundle.refresh_aggregates()
         
         return bundle
 
@@ -236,12 +239,15 @@ class BundleOfferCreateSerializer(serializers.ModelSerializer):
             instance.bundle_items.all().delete()
             
             # Create new items
-            for item_data in items_data:
-                BundleItem.objects.create(
+            BundleItem.objects.bulk_create(
+                BundleItem(
                     bundle=instance,
                     product_id=item_data["product_id"],
                     quantity=item_data["quantity"]
                 )
+                for item_data in items_data
+            )
+            instance.refresh_aggregates()
         
         return instance
 
@@ -276,6 +282,10 @@ class BundleOfferSerializer(serializers.ModelSerializer):
             'hosting_fee_per_kw',
             'total_hashrate',
             'total_power',
+            'total_hashrate_th',
+            'total_power_watts',
+            'component_price',
+            'savings',
             'image',
             'items',
             'created_at',
@@ -308,4 +318,17 @@ class EventsSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Events
-        fields = "__all__"
\ No newline at end of file
+        fields = "__all__"
+
+
+
+from .models import ImportJob
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.IntegerField(read_only=True)
+    created_by = serializers.CharField(source="created_by.username", default=None, read_only=True)
+
+    class Meta:
+        model = ImportJob
+        exclude = ["source", "errors"]
+
@@ -0,0 +1,18 @@
+from celery import shared_task
+
+from .jobs import fail_stale_import_jobs, pending_import_jobs, run_import_job
+
+
+@shared_task(ignore_result=True)
+def run_product_import(job_pk):
+    """Run one queued product import (no-op if another worker claimed it)."""
+    job = run_import_job(job_pk)
+    return job.status if job else None
+
+
+@shared_task(ignore_result=True)
+def sweep_import_jobs():
+    """Start queued jobs whose kick was lost; fail jobs whose worker died."""
+    fail_stale_import_jobs()
+    for job_pk in list(pending_import_jobs()[:10]):
+        run_import_job(job_pk)
@@ -1,3 +1,595 @@
+import io
+import threading
+import time
+import zipfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import Workbook, load_workbook
+from rest_framework.test import APIClient
+
+from UserApp.helpers.invoices import store_invoice_pdf
+from UserApp.models import HostingRequest, Invoice, Order, OrderItem, Rental
+
+from .images import ImageIngestor
+from .jobs import fail_stale_import_jobs, pending_import_jobs, run_import_job
+from .models import BundleItem, BundleOffer, ImportJob, Product
+
+HEADERS = ["Model Name", "Description", "Minable Coins", "Hashrate", "Power",
+           "Algorithm", "Category", "Price", "Delivery Type", "Delivery Date", "Is Available"]
+
+
+def sheet_rows(count):
+    rows = [
+        [f"Miner {i}", "test miner", "BTC", "100 TH/s", "3000", "SHA-256", "Air Cooled",
+         "1999.99", "spot", "", "yes"]
+        for i in range(count)
+    ]
+    rows[1][0] = ""                                  # missing required
+    rows[2][7] = "abc"                               # bad price
+    rows[3][8:10] = ["future", ""]                   # future without a date
+    rows[4][8:10] = ["future", "2030-01-15"]         # ok
+    return rows
+
+
+def as_csv(rows, headers=HEADERS):
+    lines = [",".join(headers)] + [",".join(str(value) for value in row) for row in rows]
+    return SimpleUploadedFile("products.csv", "\n".join(lines).encode())
+
+
+def as_xlsx(rows):
+    workbook = Workbook()
+    workbook.active.append(HEADERS)
+    for row in rows:
+        workbook.active.append([value or None for value in row])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return SimpleUploadedFile("products.xlsx", buffer.getvalue())
+
+
+# ---------------- BULK PRODUCT IMPORT -----------------
+
+class BulkUploadTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_superuser("admin", "admin@example.com", "pass")
+        )
+
+    def upload(self, file, expected_status=201, **options):
+        response = self.client.post(
+            "/api/admin/products/bulk-upload/", {"file": file, **options}, format="multipart"
+        )
+        self.assertEqual(response.status_code, expected_status, response.data)
+        return response.data
+
+    def assertImported(self, result):
+        self.assertEqual((result["success_count"], result["error_count"]), (7, 3))
+        self.assertEqual(
+            [(error["row"], list(error["errors"])) for error in result["errors"]],
+            [(3, ["model_name"]), (4, ["price"]), (5, ["delivery_date"])],
+        )
+
+        product = Product.objects.get(model_name="Miner 0")
+        self.assertEqual((product.category, product.hashrate_th, product.power_watts), ("air", 100.0, 3000.0))
+        self.assertEqual(str(Product.objects.get(model_name="Miner 4").delivery_date), "2030-01-15")
+
+    def test_csv(self):
+        self.assertImported(self.upload(as_csv(sheet_rows(10))))
+
+    def test_xlsx(self):
+        self.assertImported(self.upload(as_xlsx(sheet_rows(10))))
+
+    def test_upsert(self):
+        headers = HEADERS + ["Brand"]
+
+        def sheet(rows):
+            return as_csv(
+                [[name, "test miner", "BTC", hashrate, "3000", "SHA-256", "Air Cooled",
+                  price, "spot", "", "yes", brand] for name, brand, hashrate, price in rows],
+                headers,
+            )
+
+        self.upload(sheet([
+            ("Miner A", "Bitmain", "100 TH/s", "100"),
+            ("Miner B", "MicroBT", "100 TH/s", "200"),
+            ("Miner C", "", "100 TH/s", "300"),
+        ]))
+
+        refresh = [
+            ("miner a ", "BITMAIN", "100 TH/s", "150"),      # price changed
+            ("Miner B", "MicroBT", "100 TH/s", "200"),       # unchanged
+            ("Miner C", "", "120 TH/s", "300"),              # spec changed
+            ("Miner D", "Canaan", "90 TH/s", "400"),         # new
+            ("Miner D", "Canaan", "90 TH/s", "400"),         # duplicate in sheet
+        ]
+
+        preview = self.upload(sheet(refresh), 200, mode="upsert", dry_run="true")
+        self.assertEqual(
+            [preview[name] for name in ("created_count", "updated_count", "unchanged_count", "error_count")],
+            [1, 2, 1, 1],
+        )
+        self.assertEqual(preview["errors"][0]["row"], 6)
+        self.assertEqual(
+            {entry["action"]: list(entry["changes"]) for entry in preview["preview"] if entry["row"] == 2},
+            {"update": ["price"]},
+        )
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(str(Product.objects.get(model_name="Miner A").price), "100.00")
+
+        result = self.upload(sheet(refresh), mode="upsert")
+        self.assertEqual((result["created_count"], result["updated_count"]), (1, 2))
+        self.assertEqual(Product.objects.count(), 4)
+        self.assertEqual(str(Product.objects.get(model_name="Miner A").price), "150.00")
+        self.assertEqual(Product.objects.get(model_name="Miner C").hashrate_th, 120.0)
+
+        again = self.upload(sheet(refresh), mode="upsert")
+        self.assertEqual((again["created_count"], again["updated_count"], again["unchanged_count"]), (0, 0, 4))
+
+    def test_upsert_key_matches_like_sql(self):
+        # casefold() would turn "ß" into "ss" and miss the row SQL lower() selects
+        existing = Product.objects.create(
+            model_name="STRAßE S1 ", description="x", minable_coins="BTC", hashrate="100 TH/s",
+            power="3000", algorithm="SHA-256", price=100,
+        )
+        self.assertEqual(existing.brand, "null")
+
+        result = self.upload(
+            as_csv([["straße s1", "x", "BTC", "100 TH/s", "3000", "SHA-256", "Air Cooled",
+                     "250", "spot", "", "yes", ""]], HEADERS + ["Brand"]),
+            mode="upsert",
+        )
+        self.assertEqual((result["created_count"], result["updated_count"]), (0, 1))
+        existing.refresh_from_db()
+        self.assertEqual(str(existing.price), "250.00")
+
+    def test_upsert_rejects_unknown_key(self):
+        self.upload(as_csv(sheet_rows(5)), 400, mode="upsert", key="price")
+
+    def test_rejects_unknown_format(self):
+        response = self.client.post(
+            "/api/admin/products/bulk-upload/",
+            {"file": SimpleUploadedFile("products.txt", b"x")},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+# ---------------- BACKGROUND IMPORT JOBS -----------------
+
+class ImportJobTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_superuser("admin", "admin@example.com", "pass")
+        )
+
+    def submit(self, file, **options):
+        response = self.client.post("/api/admin/products/import-jobs/", {"file": file, **options}, format="multipart")
+        self.assertEqual(response.status_code, 202, response.data)
+        return response.data
+
+    def poll(self, job_id):
+        return self.client.get(f"/api/admin/products/import-jobs/{job_id}/").data
+
+    def test_submit_poll_and_error_report(self):
+        with mock.patch("AdminApp.jobs.kick_import_job") as kick, self.captureOnCommitCallbacks(execute=True):
+            job = self.submit(as_csv(sheet_rows(10)))
+
+        kick.assert_called_once_with(job["id"])
+        self.assertEqual((job["status"], job["total_rows"], job["progress"]), ("queued", 10, 0))
+        self.assertFalse(Product.objects.exists())
+
+        run_import_job(job["id"])
+        self.assertIsNone(run_import_job(job["id"]))          # already claimed
+
+        job = self.poll(job["id"])
+        self.assertEqual(
+            (job["status"], job["progress"], job["processed_rows"], job["success_count"], job["error_count"]),
+            ("succeeded", 100, 10, 7, 3),
+        )
+        self.assertEqual(Product.objects.count(), 7)
+        self.assertEqual(ImportJob.objects.get().source, b"")
+
+        response = self.client.get(f"/api/admin/products/import-jobs/{job['id']}/errors/")
+        report = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(report[0], "row,field,message")
+        self.assertEqual([line.split(",")[:2] for line in report[1:]],
+                         [["3", "model_name"], ["4", "price"], ["5", "delivery_date"]])
+
+    def test_eager_mode_runs_inline(self):
+        from Cryptonite.celery import app
+
+        # CELERY_ namespace: the settings key, not task_always_eager
+        self.addCleanup(app.conf.update, CELERY_TASK_ALWAYS_EAGER=app.conf.task_always_eager)
+        app.conf.update(CELERY_TASK_ALWAYS_EAGER=True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            job = self.submit(as_xlsx(sheet_rows(10)), mode="upsert")
+
+        self.assertEqual((self.poll(job["id"])["status"], Product.objects.count()), ("succeeded", 7))
+
+    def test_image_stage_heartbeat_and_sweep_verdict(self):
+        rows = [row + ["http://images.invalid/miner.png"] for row in sheet_rows(5)]
+        with mock.patch("AdminApp.jobs.kick_import_job"):
+            job_id = self.submit(as_csv(rows, HEADERS + ["Image URL"]))["id"]
+
+        beats = []
+
+        def slow_attach(ingestor, images):
+            # a long ingest: heartbeats keep updated_at fresh ...
+            ImportJob.objects.filter(id=job_id).update(updated_at=timezone.now() - timedelta(hours=1))
+            ingestor.progress()
+            beats.append(ImportJob.objects.get(id=job_id).updated_at)
+            self.assertEqual(fail_stale_import_jobs(), 0)
+
+            # ... until the sweep fails it anyway (worker presumed dead)
+            ImportJob.objects.filter(id=job_id).update(updated_at=timezone.now() - timedelta(hours=1))
+            self.assertEqual(fail_stale_import_jobs(), 1)
+            return {"attached": len(images)}
+
+        with mock.patch("AdminApp.jobs.ImageIngestor.attach", autospec=True, side_effect=slow_attach):
+            job = run_import_job(job_id)
+
+        self.assertGreater(beats[0], timezone.now() - timedelta(minutes=1))
+        self.assertEqual(job.status, ImportJob.FAILED)          # the late finish does not overwrite it
+        self.assertEqual(self.poll(job_id)["status"], "failed")
+
+    def test_rejects_bad_options(self):
+        response = self.client.post(
+            "/api/admin/products/import-jobs/", {"file": as_csv(sheet_rows(10)), "mode": "replace"}, format="multipart"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ImportJob.objects.exists())
+
+    def test_sweep(self):
+        with mock.patch("AdminApp.jobs.kick_import_job"):
+            lost = self.submit(as_csv(sheet_rows(10)))["id"]
+            stuck = self.submit(as_csv(sheet_rows(10)))["id"]
+
+        long_ago = timezone.now() - timedelta(hours=1)
+        ImportJob.objects.filter(id=lost).update(created_at=long_ago)
+        ImportJob.objects.filter(id=stuck).update(status=ImportJob.RUNNING)
+        ImportJob.objects.filter(id=stuck).update(updated_at=long_ago)   # no auto_now on update()
+
+        self.assertEqual(list(pending_import_jobs()), [lost])
+        self.assertEqual(fail_stale_import_jobs(), 1)
+        self.assertEqual(self.poll(stuck)["status"], "failed")
+
+
+# ---------------- IMAGE INGESTION -----------------
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"red pixel"
+
+
+class LocalImageServer:
+    """
+    Stand-in image host on 127.0.0.1 for tests:
+      /red.png, /red-copy.png  same bytes
+      /slow/<n>.png            distinct bytes after SLOW_DELAY seconds
+      /page.html               not an image
+      anything else            404
+    """
+    SLOW_DELAY = 0.3
+
+    def __enter__(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path in ("/red.png", "/red-copy.png"):
+                    self.reply(PNG, "image/png")
+                elif self.path.startswith("/slow/"):
+                    time.sleep(server.SLOW_DELAY)
+                    self.reply(PNG + self.path.encode(), "image/png")
+                elif self.path == "/page.html":
+                    self.reply(b"<html></html>", "text/html")
+                else:
+                    self.send_error(404)
+
+            def reply(self, body, content_type):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.httpd.server_port}{path}"
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class ImageIngestionTests(TestCase):
+
+    def setUp(self):
+        for alias in ("default", "local"):
+            caches[alias].clear()
+        self.uploads = []
+
+    def fake_upload(self, content, digest):
+        self.uploads.append(digest)
+        return f"image/upload/v1/products/{digest[:32]}.png"
+
+    def make_products(self, count):
+        return [
+            Product.objects.create(
+                model_name=f"Miner {i}", description="d", minable_coins="BTC",
+                hashrate="100 TH/s", power="3000", algorithm="SHA-256",
+            )
+            for i in range(count)
+        ]
+
+    def test_concurrent_deduped_ingestion(self):
+        products = self.make_products(9)
+
+        with LocalImageServer() as server:
+            paths = ["/red.png", "/red-copy.png", "/red.png", "/missing.png", "/page.html",
+                     "/slow/1.png", "/slow/2.png", "/slow/3.png", "/slow/4.png"]
+            images = [(product.id, server.url(path)) for product, path in zip(products, paths)]
+
+            started = time.monotonic()
+            report = ImageIngestor(uploader=self.fake_upload).attach(images)
+            elapsed = time.monotonic() - started
+
+            # same sheet again: every picture is already uploaded
+            again = ImageIngestor(uploader=self.fake_upload).attach(images)
+
+        self.assertLess(elapsed, 4 * LocalImageServer.SLOW_DELAY)   # slow hosts overlap
+        self.assertEqual(
+            (report["attached"], report["uploaded"], len(report["failed"])), (7, 5, 2)
+        )
+        self.assertEqual(len(self.uploads), 5)                       # red uploaded once
+        self.assertEqual((again["uploaded"], again["reused"]), (0, 5))
+
+        self.assertEqual(
+            {failure["product_id"] for failure in report["failed"]}, {products[3].id, products[4].id}
+        )
+        red = Product.objects.get(id=products[0].id).image
+        self.assertEqual(red.public_id, Product.objects.get(id=products[1].id).image.public_id)
+
+    def test_progress_heartbeat(self):
+        products = self.make_products(3)
+        beats = []
+
+        with LocalImageServer() as server, mock.patch("AdminApp.images.HEARTBEAT_EVERY", 0):
+            images = [(product.id, server.url(f"/slow/{i}.png")) for i, product in enumerate(products)]
+            ImageIngestor(uploader=self.fake_upload, progress=lambda: beats.append(1)).attach(images)
+
+        self.assertGreaterEqual(len(beats), 3)      # at least one per download
+
+
+# ---------------- INVOICE EXPORT -----------------
+
+class InvoiceExportTests(TestCase):
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser("admin", "admin@example.com", "pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+        for day in (1, 2, 3, 10):
+            invoice = Invoice.objects.create(
+                user=self.admin, invoice_number=f"INV-BUY-{day}", purchase_type="buy", related_id=day,
+                amount="100.00", stripe_payment_intent=f"pi_{day}",
+                invoice_data={"items": [{"title": "Miner", "quantity": 1,
+                                         "unit_price": "100.00", "total_price": "100.00"}]},
+            )
+            Invoice.objects.filter(id=invoice.id).update(created_at=timezone.make_aware(datetime(2026, 3, day, 12)))
+            if day != 2:
+                store_invoice_pdf(invoice)          # day 2 is rendered during the export
+
+    def export(self, **params):
+        return self.client.get("/api/admin/invoices/export/", params)
+
+    def test_streams_zip_for_date_range(self):
+        response = self.export(**{"from": "2026-03-01", "to": "2026-03-03"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(archive.namelist(), ["INV-BUY-1.pdf", "INV-BUY-2.pdf", "INV-BUY-3.pdf"])
+        self.assertTrue(all(archive.read(name).startswith(b"%PDF") for name in archive.namelist()))
+        self.assertIsNone(archive.testzip())
+
+    def test_pdf_bodies_not_fetched_with_rows(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.export(**{"from": "2026-03-01", "to": "2026-03-10"})
+            content = b"".join(response.streaming_content)
+
+        self.assertEqual(len(zipfile.ZipFile(io.BytesIO(content)).namelist()), 4)
+        listing = [query["sql"] for query in queries if 'FROM "UserApp_invoice" ' in query["sql"]]
+        self.assertEqual(len(listing), 1)
+        self.assertNotIn('"UserApp_invoicepdf"."content"', listing[0])
+        self.assertNotIn("django_datetime_cast_date", listing[0])
+
+    def test_rejects_bad_range(self):
+        self.assertEqual(self.export(**{"from": "2026-03-05", "to": "2026-03-01"}).status_code, 400)
+        self.assertEqual(self.export(**{"from": "March"}).status_code, 400)
+
+
+# ---------------- DATA EXPORTS -----------------
+
+class DataExportTests(TestCase):
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser("admin", "admin@example.com", "pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+        product = Product.objects.create(
+            model_name="Miner X", description="d", minable_coins="BTC",
+            hashrate="100 TH/s", power="3000", algorithm="SHA-256", price="1000.00",
+        )
+        for day, status in ((1, "completed"), (2, "shipped"), (3, "completed"), (20, "completed")):
+            order = Order.objects.create(user=self.admin, total_amount="2000.00", stripe_payment_intent=f"pi_{day}",
+                                         status=status, delivery_address={"country": "US"})
+            OrderItem.objects.create(order=order, product=product, quantity=2)
+            Order.objects.filter(id=order.id).update(created_at=timezone.make_aware(datetime(2026, 3, day, 12)))
+
+        Rental.objects.create(user=self.admin, product=product, amount_paid="100.00", duration_days=30,
+                              end_date=timezone.now() + timedelta(days=30))
+        HostingRequest.objects.create(user=self.admin, phone="1", hosting_location="US",
+                                      items=[{"title": "Miner X", "quantity": 3}], is_paid=True)
+
+    def export(self, resource, file_format="csv", **params):
+        response = self.client.get(f"/api/admin/exports/{resource}/{file_format}/", params)
+        if response.status_code == 200:
+            self.assertTrue(response.streaming)
+        return response
+
+    def csv_lines(self, response):
+        return b"".join(response.streaming_content).decode("utf-8-sig").splitlines()
+
+    def test_csv_with_filters(self):
+        lines = self.csv_lines(self.export("orders", **{"from": "2026-03-01", "to": "2026-03-10", "status": "completed"}))
+        self.assertTrue(lines[0].startswith("Order ID,Created,Customer"))
+        self.assertEqual(len(lines), 3)
+        self.assertIn("2x Miner X", lines[1])
+
+        self.assertEqual(len(self.csv_lines(self.export("orders"))), 5)
+        self.assertEqual(len(self.csv_lines(self.export("rentals", status="active"))), 2)
+        self.assertIn(",3,", self.csv_lines(self.export("hosting", status="paid"))[1])
+        self.assertEqual(len(self.csv_lines(self.export("users", status="staff"))), 2)
+
+    def test_date_bounds_are_local_days(self):
+        # 2026-03-03 23:30 local is in range for to=2026-03-03, 2026-03-04 00:00 is not
+        order = Order.objects.get(stripe_payment_intent="pi_3")
+        Order.objects.filter(id=order.id).update(created_at=timezone.make_aware(datetime(2026, 3, 3, 23, 30)))
+        lines = self.csv_lines(self.export("orders", **{"from": "2026-03-03", "to": "2026-03-03"}))
+        self.assertEqual(len(lines), 2)
+
+        Order.objects.filter(id=order.id).update(created_at=timezone.make_aware(datetime(2026, 3, 4)))
+        lines = self.csv_lines(self.export("orders", **{"from": "2026-03-03", "to": "2026-03-03"}))
+        self.assertEqual(len(lines), 1)
+
+    def test_formula_cells_escaped(self):
+        get_user_model().objects.create_user("=HYPERLINK(\"http://x\")", "-x@example.com", "pass", first_name="@sum")
+        lines = self.csv_lines(self.export("users"))
+        self.assertIn('"\'=HYPERLINK(""http://x"")",\'-x@example.com,\'@sum', lines[-1])
+
+        sheet = load_workbook(io.BytesIO(b"".join(self.export("users", "xlsx").streaming_content))).active
+        self.assertEqual(sheet.cell(sheet.max_row, 3).value, '\'=HYPERLINK("http://x")')
+
+    def test_xlsx(self):
+        response = self.export("orders", "xlsx")
+        sheet = load_workbook(io.BytesIO(b"".join(response.streaming_content))).active
+        self.assertEqual(sheet.max_row, 5)
+        self.assertEqual(sheet.cell(1, 1).value, "Order ID")
+
+    def test_rejects_bad_params(self):
+        self.assertEqual(self.export("orders", "pdf").status_code, 400)
+        self.assertEqual(self.export("payments").status_code, 400)
+        self.assertEqual(self.export("orders", status="lost").status_code, 400)
+        self.assertEqual(self.export("orders", **{"from": "2026-13-01"}).status_code, 400)
+        for dates in ({"from": "2026/01/01"}, {"to": "yesterday"}, {"from": "2026-01-1x"},
+                      {"from": "2026-02-01", "to": "2026-01-01"}):
+            with self.subTest(dates=dates):
+                response = self.export("orders", **dates)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.data)
+
+
+# ---------------- BUNDLE AGGREGATES -----------------
+
+class BundleAggregateTests(TestCase):
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser("admin", "admin@example.com", "pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+        self.miners = [
+            Product.objects.create(
+                model_name=f"Miner {index}", description="d", minable_coins="BTC",
+                hashrate=f"{100 * (index + 1)} TH/s", power="3000", algorithm="SHA-256", price="1000.00",
+            )
+            for index in range(2)
+        ]
+
+    def create_bundle(self, price="2500.00"):
+        items = f'[{{"product_id": {self.miners[0].id}, "quantity": 2}}, {{"product_id": {self.miners[1].id}, "quantity": 1}}]'
+        response = self.client.post("/api/admin/bundles/add/", {
+            "name": "Starter", "price": price, "hosting_fee_per_kw": "90.00", "items": items,
+        })
+        self.assertEqual(response.status_code, 201)
+        return response.data, BundleOffer.objects.get(id=response.data["id"])
+
+    def assertTotals(self, bundle, hashrate, power, component_price, savings):
+        bundle.refresh_from_db()
+        self.assertEqual(bundle.total_hashrate_th, hashrate)
+        self.assertEqual(bundle.total_power_watts, power)
+        self.assertEqual(bundle.component_price, Decimal(component_price))
+        self.assertEqual(bundle.savings, Decimal(savings))
+
+    def test_totals_follow_items_products_and_price(self):
+        data, bundle = self.create_bundle()
+        self.assertEqual(data["total_hashrate_th"], 400.0)
+        self.assertEqual(data["savings"], "500.00")
+        self.assertTotals(bundle, 400.0, 9000.0, "3000.00", "500.00")
+
+        miner = self.miners[1]
+        miner.price = Decimal("1500.00")
+        miner.power = "3500 W"
+        miner.save()
+        self.assertTotals(bundle, 400.0, 9500.0, "3500.00", "1000.00")
+
+        BundleOffer.objects.get(id=bundle.id).save()    # nothing changed
+        bundle.price = Decimal("3600.00")
+        bundle.save(update_fields=["price"])
+        self.assertTotals(bundle, 400.0, 9500.0, "3500.00", "-100.00")
+
+        item = BundleItem.objects.get(bundle=bundle, product=self.miners[0])
+        item.quantity = 1
+        item.save()
+        self.assertTotals(bundle, 300.0, 6500.0, "2500.00", "-1100.00")
+
+        self.miners[0].delete()
+        self.assertTotals(bundle, 200.0, 3500.0, "1500.00", "-2100.00")
+
+        item = BundleItem.objects.get(bundle=bundle)
+        item.delete()
+        self.assertTotals(bundle, 0.0, 0.0, "0.00", "-3600.00")
+
+    def test_update_replaces_items(self):
+        _, bundle = self.create_bundle()
+        items = f'[{{"product_id": {self.miners[1].id}, "quantity": 3}}]'
+        response = self.client.patch(f"/api/admin/bundles/{bundle.id}/update/", {"items": items})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["component_price"], "3000.00")
+        self.assertTotals(bundle, 600.0, 9000.0, "3000.00", "500.00")
+
+    def test_list_queries_do_not_grow_with_bundles(self):
+        self.create_bundle()
+        with CaptureQueriesContext(connection) as first:
+            response = self.client.get("/api/user/bundles/")
+        self.assertEqual(len(response.data), 1)
+
+        for _ in range(4):
+            self.create_bundle()
+        with CaptureQueriesContext(connection) as later:
+            response = self.client.get("/api/user/bundles/")
 
-# Create your tests here.
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(len(later), len(first))
+        self.assertEqual([item["quantity"] for item in response.data[0]["items"]], [2, 1])
@@ -9,6 +9,9 @@ urlpatterns = [
     path("products/add/", views.create_product, name="create-product"),
 
     path('products/bulk-upload/', views.bulk_upload_products, name='bulk-upload-products'),
+    path('products/import-jobs/', views.import_jobs, name='import-jobs'),
+    path('products/import-jobs/<int:id>/', views.import_job_detail, name='import-job-detail'),
+    path('products/import-jobs/<int:id>/errors/', views.import_job_errors, name='import-job-errors'),
 
     path('products/<int:id>/update/', views.update_product, name='update-product'),
     path('products/<int:id>/delete/', views.delete_product, name='delete-product'),
@@ -36,8 +39,11 @@ urlpatterns = [
     path("orders/", views.admin_list_orders, name="admin-list-orders"),
     path("orders/<int:id>/", views.admin_order_detail, name="admin-order-detail"),
     path("orders/<int:id>/status/", views.admin_update_order_status, name="admin-order-status"),
+    path("invoices/export/", views.admin_export_invoices, name="admin-export-invoices"),
+    path("exports/<str:resource>/<str:file_format>/", views.admin_export, name="admin-export"),
 
     path("hosting-requests/<int:id>/activate-monitoring/",views.admin_activate_monitoring, name="admin-activate-monitoring"),
+    path("email-outbox/metrics/", views.admin_email_outbox_metrics, name="admin-email-outbox-metrics"),
 
 
        # ---------------- ADMIN BLOG CRUD ----------------
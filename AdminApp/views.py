@@ -18,6 +18,8 @@ from rest_framework.response import Response
 from rest_framework import status
 
 from .serializers import ProductCreateSerializer
+from UserApp.pagination import KeysetPagination
+from UserApp.utils import with_invoice_id
 from .serializers import (
     ProductSerializer,
     ProductCreateSerializer,
@@ -45,8 +47,10 @@ def create_product(request):
 @permission_classes([permissions.AllowAny])
 def get_products(request):
     products = Product.objects.all().order_by('-created_at')
-    serializer = ProductSerializer(products, many=True)
-    return Response(serializer.data)
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(products, request)
+    serializer = ProductSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 
 # ---------- GET SINGLE PRODUCT ----------
@@ -100,9 +104,12 @@ from UserApp.serializers import ProductReviewSerializer, RentalSerializer
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
 def get_all_rent_orders(request):
-    rentals = Rental.objects.all().order_by('-start_date')
-    serializer = RentalSerializer(rentals, many=True)
-    return Response(serializer.data)
+    rentals = Rental.objects.select_related("product", "bundle").order_by('-start_date')
+    rentals = with_invoice_id(rentals, "rent")
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(rentals, request)
+    serializer = RentalSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 
 from rest_framework.decorators import api_view, permission_classes
@@ -117,8 +124,10 @@ User = get_user_model()
 @permission_classes([permissions.IsAdminUser])
 def get_all_users(request):
     users = User.objects.all().order_by("-date_joined")
-    serializer = AdminUserListSerializer(users, many=True)
-    return Response(serializer.data)
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(users, request)
+    serializer = AdminUserListSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 
 #10/12/2025
@@ -136,9 +145,12 @@ from UserApp.serializers import HostingRequestSerializer  # Serializer also in U
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
 def admin_get_all_hosting_requests(request):
-    hosting_requests = HostingRequest.objects.all().order_by('-created_at')
-    serializer = HostingRequestSerializer(hosting_requests, many=True)
-    return Response(serializer.data)
+    hosting_requests = HostingRequest.objects.select_related("user").order_by('-created_at')
+    hosting_requests = with_invoice_id(hosting_requests, "hosting")
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(hosting_requests, request)
+    serializer = HostingRequestSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 
 # ---------- Get Single Hosting Request ----------
@@ -205,9 +217,16 @@ from .serializers import AdminOrderSerializer
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
 def admin_list_orders(request):
-    orders = Order.objects.all().order_by("-created_at")
-    serializer = AdminOrderSerializer(orders, many=True)
-    return Response(serializer.data, status=200)
+    orders = (
+        Order.objects
+        .select_related("user")
+        .prefetch_related("items__product", "items__bundle")
+        .order_by("-created_at")
+    )
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(orders, request)
+    serializer = AdminOrderSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
@@ -242,6 +261,94 @@ def admin_update_order_status(request, id):
     )
 
 
+# ---------------- INVOICE EXPORT -----------------
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
+
+from UserApp.helpers.invoices import invoice_zip_stream
+from UserApp.models import Invoice
+from .exports import date_range_filter
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAdminUser])
+def admin_export_invoices(request):
+    """
+    ZIP of invoice PDFs created between ?from=YYYY-MM-DD and ?to=YYYY-MM-DD
+    (inclusive), optionally ?purchase_type=buy|rent|hosting. Streamed entry by
+    entry, so the archive is never held in memory.
+    """
+    try:
+        start = parse_date(request.query_params.get("from", ""))
+        end = parse_date(request.query_params.get("to", ""))
+    except ValueError:
+        start = end = None
+
+    if not start or not end or start > end:
+        return Response(
+            {"error": "from and to must be dates (YYYY-MM-DD), from <= to"},
+            status=400
+        )
+
+    invoices = Invoice.objects.filter(
+        **date_range_filter("created_at", start, end)
+    ).order_by("created_at", "id")
+
+    purchase_type = request.query_params.get("purchase_type")
+    if purchase_type:
+        invoices = invoices.filter(purchase_type=purchase_type)
+
+    response = StreamingHttpResponse(invoice_zip_stream(invoices), content_type="application/zip")
+    response["Content-Disposition"] = f'attachment; filename="invoices-{start}-{end}.zip"'
+    return response
+
+
+# ---------------- DATA EXPORTS -----------------
+from .exports import EXPORT_FORMATS, export_queryset, stream_export
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAdminUser])
+def admin_export(request, resource, file_format):
+    """
+    Stream orders / rentals / hosting / users as csv or xlsx.
+    Filters: ?from=YYYY-MM-DD&to=YYYY-MM-DD (inclusive) and ?status=
+    (orders: order status, rentals: active|ended, hosting: paid|unpaid,
+    users: active|inactive|staff).
+    """
+    if file_format not in EXPORT_FORMATS:
+        return Response({"error": "Format must be csv or xlsx"}, status=400)
+
+    dates = {}
+    for param in ("from", "to"):
+        value = request.query_params.get(param)
+        try:
+            dates[param] = parse_date(value) if value else None
+        except ValueError:
+            dates[param] = None
+        # a typo must not silently export the whole history
+        if value and dates[param] is None:
+            return Response({"error": f"{param} must be a date (YYYY-MM-DD)"}, status=400)
+
+    start, end = dates["from"], dates["to"]
+    if start and end and start > end:
+        return Response({"error": "from must not be after to"}, status=400)
+
+    try:
+        queryset = export_queryset(resource, start, end, request.query_params.get("status"))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    response = StreamingHttpResponse(
+        stream_export(resource, file_format, queryset),
+        content_type=EXPORT_FORMATS[file_format],
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{resource}-{start or "all"}-{end or "all"}.{file_format}"'
+    )
+    return response
+
+
 
 
 import pandas as pd
@@ -259,15 +366,8 @@ from rest_framework import status
 from .serializers import ProductCreateSerializer
 
 
-# ---------- HELPERS ----------
-def clean_value(value):
-    """
-    Converts Excel NaN / empty cells into None
-    """
-    if pd.isna(value):
-        return None
-    value = str(value).strip()
-    return None if value.lower() in ["nan", "null", ""] else value
+from .images import ImageIngestor
+from .importers import DEFAULT_KEY, SUPPORTED_EXTENSIONS, ProductImporter
 
 
 # ---------- BULK UPLOAD ----------
@@ -275,6 +375,16 @@ def clean_value(value):
 @permission_classes([IsAdminUser])
 @parser_classes([MultiPartParser, FormParser])
 def bulk_upload_products(request):
+    """
+    Import products from .xlsx / .xls / .csv (see AdminApp/importers.py).
+    Rows are streamed, validated per chunk and bulk-inserted; every invalid
+    row is reported with its sheet row number.
+
+    form fields (optional):
+        mode     insert (default) | upsert
+        key      natural key for upsert, comma separated (default model_name,brand)
+        dry_run  true -> validate and diff only, nothing is written
+    """
     if "file" not in request.FILES:
         return Response(
             {"error": "No file provided"},
@@ -283,156 +393,99 @@ def bulk_upload_products(request):
 
     file = request.FILES["file"]
 
-    if not file.name.endswith((".xlsx", ".xls")):
+    if not file.name.lower().endswith(SUPPORTED_EXTENSIONS):
         return Response(
-            {"error": "Invalid file format. Upload .xlsx or .xls"},
+            {"error": "Invalid file format. Upload .xlsx, .xls or .csv"},
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    mode = request.data.get("mode", "insert").strip().lower()
+    key = [field.strip() for field in request.data.get("key", ",".join(DEFAULT_KEY)).split(",") if field.strip()]
+    dry_run = str(request.data.get("dry_run", "")).lower() in ("1", "true", "yes")
+
     try:
-        df = pd.read_excel(file)
-
-        # ---------- COLUMN MAPPING ----------
-        column_mapping = {
-            "Model Name": "model_name",
-            "Description": "description",
-            "Minable Coins": "minable_coins",
-            "Hashrate": "hashrate",
-            "Power": "power",
-            "Algorithm": "algorithm",
-            "Category": "category",
-            "Price": "price",
-            "Hosting Fee Per KW": "hosting_fee_per_kw",
-            "Brand": "brand",
-            "Efficiency": "efficiency",
-            "Noise Level": "noise",
-            "Delivery Type": "delivery_type",
-            "Delivery Date": "delivery_date",
-            "Is Available": "is_available",
-            "Image URL": "image_url",
-        }
-
-        df = df.rename(columns=column_mapping)
-        df.columns = df.columns.str.strip()
-
-        # ---------- REQUIRED FIELDS ----------
-        required_fields = [
-            "model_name",
-            "description",
-            "minable_coins",
-            "hashrate",
-            "power",
-            "algorithm",
-            "category",
-        ]
-
-        success_count = 0
-        error_count = 0
-        errors = []
-
-        # ---------- PROCESS ROWS ----------
-        for index, row in df.iterrows():
-            try:
-                with transaction.atomic():
-                    product_data = {
-                        "model_name": clean_value(row.get("model_name")),
-                        "description": clean_value(row.get("description")),
-                        "minable_coins": clean_value(row.get("minable_coins")),
-                        "hashrate": clean_value(row.get("hashrate")),
-                        "power": clean_value(row.get("power")),
-                        "algorithm": clean_value(row.get("algorithm")),
-                        "category": clean_value(row.get("category")),
-                    }
-
-                    # ---------- REQUIRED VALIDATION ----------
-                    missing = [f for f in required_fields if not product_data.get(f)]
-                    if missing:
-                        error_count += 1
-                        errors.append({
-                            "row": index + 2,
-                            "errors": f"Missing required fields: {missing}"
-                        })
-                        continue
-
-                    # ---------- OPTIONAL FIELDS ----------
-                    try:
-                        if clean_value(row.get("price")):
-                            product_data["price"] = Decimal(str(row["price"]))
-                    except InvalidOperation:
-                        pass
-
-                    try:
-                        if clean_value(row.get("hosting_fee_per_kw")):
-                            product_data["hosting_fee_per_kw"] = Decimal(
-                                str(row["hosting_fee_per_kw"])
-                            )
-                    except InvalidOperation:
-                        pass
-
-                    for field in ["brand", "efficiency", "noise", "delivery_type"]:
-                        value = clean_value(row.get(field))
-                        if value:
-                            product_data[field] = value.lower() if field == "delivery_type" else value
-
-                    if clean_value(row.get("delivery_date")):
-                        try:
-                            product_data["delivery_date"] = pd.to_datetime(
-                                row["delivery_date"]
-                            ).date()
-                        except Exception:
-                            pass
-
-                    if "is_available" in row and not pd.isna(row["is_available"]):
-                        product_data["is_available"] = bool(row["is_available"])
-
-                    # ---------- IMAGE ----------
-                    image_file = None
-                    image_url = clean_value(row.get("image_url"))
-                    if image_url:
-                        try:
-                            res = requests.get(image_url, timeout=10)
-                            res.raise_for_status()
-                            image_file = ContentFile(
-                                res.content,
-                                name=f"{product_data['model_name'].replace(' ', '_')}.jpg"
-                            )
-                        except Exception:
-                            pass
-
-                    # ---------- SAVE ----------
-                    serializer = ProductCreateSerializer(data=product_data)
-                    if serializer.is_valid():
-                        product = serializer.save()
-                        if image_file:
-                            product.image = image_file
-                            product.save()
-                        success_count += 1
-                    else:
-                        error_count += 1
-                        errors.append({
-                            "row": index + 2,
-                            "errors": serializer.errors
-                        })
-
-            except Exception as e:
-                error_count += 1
-                errors.append({
-                    "row": index + 2,
-                    "errors": str(e)
-                })
-
-        return Response({
-            "message": "Bulk upload completed",
-            "success_count": success_count,
-            "error_count": error_count,
-            "errors": errors
-        }, status=status.HTTP_201_CREATED)
+        importer = ProductImporter(mode=mode, key=key, dry_run=dry_run)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    try:
+        result = importer.run(file, file.name)
     except Exception as e:
         return Response(
             {"error": f"Failed to process file: {str(e)}"},
             status=status.HTTP_400_BAD_REQUEST
         )
+
+    if dry_run:
+        result.pop("images")
+        return Response({"message": "Dry run - nothing was saved", **result}, status=status.HTTP_200_OK)
+
+    # ---------- IMAGES (after the rows are committed) ----------
+    # concurrent downloads, each distinct picture uploaded once
+    images = ImageIngestor().attach(result.pop("images"))
+
+    return Response({
+        "message": "Bulk upload completed",
+        **result,
+        "images": images,
+    }, status=status.HTTP_201_CREATED)
+
+
+# ---------- BACKGROUND IMPORT JOBS ----------
+from django.http import StreamingHttpResponse
+
+from .jobs import error_report_rows, submit_import_job
+from .models import ImportJob
+from .serializers import ImportJobSerializer
+
+
+@api_view(["GET", "POST"])
+@permission_classes([IsAdminUser])
+@parser_classes([MultiPartParser, FormParser])
+def import_jobs(request):
+    """
+    GET   latest import jobs
+    POST  queue a sheet for the background importer (same form fields as
+          bulk-upload: file, mode, key, dry_run) -> 202 + job to poll
+    """
+    if request.method == "GET":
+        jobs = ImportJob.objects.select_related("created_by").defer("source", "errors")[:20]
+        return Response(ImportJobSerializer(jobs, many=True).data)
+
+    if "file" not in request.FILES:
+        return Response({"error": "No file provided"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        job = submit_import_job(
+            request.FILES["file"],
+            user=request.user,
+            mode=request.data.get("mode", "insert").strip().lower(),
+            key=request.data.get("key", ",".join(DEFAULT_KEY)),
+            dry_run=str(request.data.get("dry_run", "")).lower() in ("1", "true", "yes"),
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def import_job_detail(request, id):
+    """Progress / counters of one import job (poll until status is succeeded or failed)."""
+    job = get_object_or_404(ImportJob.objects.select_related("created_by").defer("source", "errors"), id=id)
+    return Response(ImportJobSerializer(job).data)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def import_job_errors(request, id):
+    """Download the error report as CSV (row, field, message)."""
+    job = get_object_or_404(ImportJob.objects.defer("source"), id=id)
+
+    response = StreamingHttpResponse(error_report_rows(job), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="import-{job.id}-errors.csv"'
+    return response
     
 
 # ---------- CREATE BUNDLE ----------
@@ -444,6 +497,7 @@ from rest_framework.response import Response
 from rest_framework import permissions, status
 from .serializers import BundleOfferCreateSerializer, BundleOfferSerializer
 from .models import Blog, BundleOffer
+from .bundles import with_bundle_items
 from .serializers import BundleOfferCreateSerializer
 
 
@@ -505,7 +559,7 @@ def create_bundle_offer(request):
 @permission_classes([permissions.IsAdminUser])
 def list_bundle_offers(request):
     """List all bundle offers"""
-    bundles = BundleOffer.objects.all()
+    bundles = with_bundle_items(BundleOffer.objects.all())
     serializer = BundleOfferSerializer(bundles, many=True)
     return Response(serializer.data)
 
@@ -515,7 +569,7 @@ def list_bundle_offers(request):
 def get_bundle_offer(request, id):
     """Get a single bundle offer"""
     try:
-        bundle = BundleOffer.objects.get(id=id)
+        bundle = with_bundle_items(BundleOffer.objects.all()).get(id=id)
     except BundleOffer.DoesNotExist:
         return Response(
             {"error": "Bundle not found"},
@@ -595,13 +649,13 @@ def delete_bundle_offer(request, id):
 
 
 from django.shortcuts import get_object_or_404
-from django.core.mail import send_mail
 from django.conf import settings
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 from UserApp.models import HostingRequest
+from UserApp.helpers.outbox import enqueue_email, outbox_metrics
 
 
 @api_view(["POST"])
@@ -662,13 +716,12 @@ def admin_activate_monitoring(request, id):
             "Team Cryptonite"
         )
 
-    # Send email
-    send_mail(
+    # Queue email (sent by the Celery worker)
+    enqueue_email(
+        to_email=user.email,
         subject=subject,
-        message=message,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[user.email],
-        fail_silently=False,
+        body=message,
+        kind="monitoring",
     )
 
     return Response(
@@ -682,6 +735,14 @@ def admin_activate_monitoring(request, id):
     )
 
 
+# ---------------- EMAIL OUTBOX METRICS -----------------
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def admin_email_outbox_metrics(request):
+    """Delivery status of queued emails (pending / sent / failed / retrying, backlog age)."""
+    return Response(outbox_metrics(), status=status.HTTP_200_OK)
+
+
 
 @api_view(["POST"])
 @permission_classes([IsAdminUser])
@@ -774,7 +835,7 @@ def admin_list_events(request):
 @api_view(["GET"])
 @permission_classes([IsAdminUser])
 def admin_list_reviews(request):
-    reviews = ProductReview.objects.all().order_by("-created_at")
+    reviews = ProductReview.objects.select_related("user").order_by("-created_at")
     serializer = ProductReviewSerializer(reviews, many=True)
     return Response(serializer.data)
 
@@ -783,19 +844,6 @@ def admin_list_reviews(request):
 @permission_classes([IsAdminUser])
 def admin_delete_review(request, id):
     review = get_object_or_404(ProductReview, id=id)
-    product = review.product
-    review.delete()
-    reviews = ProductReview.objects.filter(product=product)
-
-    if reviews.exists():
-        product.review_count = reviews.count()
-        product.average_rating = round(
-            sum(r.rating for r in reviews) / product.review_count, 1
-        )
-    else:
-        product.review_count = 0
-        product.average_rating = 0
-
-    product.save()
+    review.delete()     # also moves the product's rating aggregates
 
     return Response({"message": "Review deleted"})
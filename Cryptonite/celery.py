@@ -0,0 +1,13 @@
+import os
+
+from celery import Celery
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "Cryptonite.settings")
+
+app = Celery("Cryptonite")
+
+# all CELERY_* settings in Cryptonite/settings.py
+app.config_from_object("django.conf:settings", namespace="CELERY")
+
+# picks up <app>/tasks.py
+app.autodiscover_tasks()
@@ -247,11 +247,94 @@ CLOUDINARY_STORAGE = {
 }
 
 
-CACHES = {
+# CACHE SETUP
+# Shared Redis cache for every gunicorn worker (BTC price, WhatToMine payload, ...).
+# Keys are prefixed + versioned; bump CACHE_VERSION to invalidate everything.
+# "local" is a per-process fallback used by UserApp.helpers.cache when Redis errors.
+
+REDIS_URL = env("REDIS_URL", default="")
+CACHE_VERSION = env.int("CACHE_VERSION", default=1)
+
+# per-process stand-in (no Redis configured, tests: override_settings(CACHES=LOCAL_CACHES))
+LOCAL_CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         "LOCATION": "cryptonite-locmem",
+        "KEY_PREFIX": "cryptonite",
+        "VERSION": CACHE_VERSION,
+    },
+    "local": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "cryptonite-local",
+        "KEY_PREFIX": "cryptonite",
+        "VERSION": CACHE_VERSION,
+    },
+}
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django_redis.cache.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "cryptonite",
+            "VERSION": CACHE_VERSION,
+            "OPTIONS": {
+                "CLIENT_CLASS": "django_redis.client.DefaultClient",
+                # zlib for anything over a few bytes - WhatToMine JSON shrinks ~10x
+                "COMPRESSOR": "django_redis.compressors.zlib.ZlibCompressor",
+                # fail fast so a Redis outage falls back to "local" instead of hanging requests
+                "SOCKET_CONNECT_TIMEOUT": 1,
+                "SOCKET_TIMEOUT": 1,
+                "CONNECTION_POOL_KWARGS": {"max_connections": 50, "retry_on_timeout": True},
+            },
+        },
+        "local": LOCAL_CACHES["local"],
     }
+else:
+    CACHES = LOCAL_CACHES
+
+# Market data (BTC price, WhatToMine) is refreshed in a background thread;
+# set False to refresh inline (tests / one-off scripts)
+MARKET_DATA_BACKGROUND_REFRESH = env.bool("MARKET_DATA_BACKGROUND_REFRESH", default=True)
+
+# Network hashrate / difficulty / block reward per coin for the profitability
+# engine. FixtureNetworkProvider reads UserApp/fixtures/network_stats.json
+# (tests, offline development).
+NETWORK_STATS_PROVIDER = env(
+    "NETWORK_STATS_PROVIDER", default="UserApp.helpers.network.WhatToMineNetworkProvider"
+)
+
+from django.core.exceptions import ImproperlyConfigured
+
+# CELERY (background jobs: email outbox, Stripe events, product imports, ...)
+# worker: celery -A Cryptonite worker -l info, scheduler: celery -A Cryptonite beat
+# (systemd units in deploy/systemd/, restarted by the deploy workflow)
+# CELERY_TASK_ALWAYS_EAGER=True runs tasks inline (no broker / worker needed);
+# it is the default only for DEBUG without a broker. Anywhere else a missing
+# broker is a startup error - a memory:// broker would silently drop every
+# verification email, Stripe fulfilment, import job and invoice render.
+CELERY_BROKER_URL = env("CELERY_BROKER_URL", default=REDIS_URL)
+CELERY_TASK_ALWAYS_EAGER = env.bool(
+    "CELERY_TASK_ALWAYS_EAGER", default=DEBUG and not CELERY_BROKER_URL
+)
+if not CELERY_BROKER_URL:
+    if not CELERY_TASK_ALWAYS_EAGER:
+        raise ImproperlyConfigured(
+            "No Celery broker: set CELERY_BROKER_URL or REDIS_URL, "
+            "or CELERY_TASK_ALWAYS_EAGER=True to run tasks inline"
+        )
+    CELERY_BROKER_URL = "memory://"
+CELERY_TASK_IGNORE_RESULT = True
+# publishing happens in the request (after commit) - fail fast if the broker is down
+CELERY_BROKER_CONNECTION_TIMEOUT = 1
+CELERY_BROKER_TRANSPORT_OPTIONS = {"socket_connect_timeout": 1, "socket_timeout": 1, "max_retries": 0}
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    # picks up retries and anything whose enqueue-time kick was lost
+    "email-outbox": {"task": "UserApp.tasks.send_email_outbox", "schedule": 30.0},
+    "stripe-events": {"task": "UserApp.tasks.sweep_stripe_events", "schedule": 60.0},
+    "import-jobs": {"task": "AdminApp.tasks.sweep_import_jobs", "schedule": 60.0},
+    "invoice-pdfs": {"task": "UserApp.tasks.render_missing_invoices", "schedule": 300.0},
 }
 
 # GMAIL SETUP FOR SENDING EMAIL
@@ -17,6 +17,14 @@ class ProductFilter(django_filters.FilterSet):
     brand = CharInFilter(field_name="brand", lookup_expr="in")
     coin = CharInFilter(field_name="currency", lookup_expr="in")
 
+    # spec ranges (indexed numeric columns)
+    min_hashrate = django_filters.NumberFilter(field_name="hashrate_th", lookup_expr="gte")
+    max_power = django_filters.NumberFilter(field_name="power_watts", lookup_expr="lte")
+    max_efficiency = django_filters.NumberFilter(field_name="efficiency_j_th", lookup_expr="lte")
+
+    # stored ranking (refreshed on every BTC price tick)
+    min_daily_profit = django_filters.NumberFilter(field_name="daily_profit_usd", lookup_expr="gte")
+
     # boolean
     inStock = django_filters.BooleanFilter(field_name="is_available")
 
@@ -27,3 +35,15 @@ class ProductFilter(django_filters.FilterSet):
             "currency",
             "is_available",
         ]
+
+
+from rest_framework.filters import OrderingFilter
+
+
+# 🔹 ?q= searches are ranked by relevance unless ?ordering= is given
+class SearchRankOrderingFilter(OrderingFilter):
+
+    def get_default_ordering(self, view):
+        if view.request.query_params.get("q", "").strip():
+            return ["-search_rank", "-id"]
+        return super().get_default_ordering(view)
@@ -0,0 +1,214 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+from .mining import whattomine_source
+
+# ---------------- WHATTOMINE ASIC INDEX -----------------
+# asic_profitability used to return the whole asic.json on every call.
+# The payload is now parsed once per refresh (per process) into AsicIndex:
+# coins ordered by profitability plus lookups by algorithm and coin. Each
+# distinct query is serialized + compressed once and kept in a small LRU, so
+# a hit is a dict lookup and a bytes copy.
+
+RECHECK_SECONDS = 5      # how often a process looks for a newer WhatToMine payload
+MAX_CACHED_RESPONSES = 256
+
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+class AsicIndex:
+    """
+    Read-only view of one WhatToMine payload.
+
+    index.select(algorithm="sha-256", coins=["btc"], top=5) -> [(name, coin dict)]
+    index.response(params, encoding) -> (body bytes, etag)
+    """
+
+    def __init__(self, payload, fetched_at):
+        self.fetched_at = fetched_at
+
+        coins = [
+            (name, coin) for name, coin in (payload or {}).get("coins", {}).items()
+            if isinstance(coin, dict)
+        ]
+        coins.sort(key=lambda item: -_number(item[1].get("profitability")))
+        self.coins = coins
+
+        self.by_algorithm = defaultdict(list)
+        self.by_coin = {}
+        fields = set()
+        for position, (name, coin) in enumerate(coins):
+            self.by_algorithm[str(coin.get("algorithm", "")).lower()].append(position)
+            self.by_coin.setdefault(name.lower(), position)
+            if coin.get("tag"):
+                self.by_coin.setdefault(str(coin["tag"]).lower(), position)
+            fields.update(coin)
+        self.fields = sorted(fields)
+
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ---------- queries ----------
+
+    def select(self, algorithm=None, coins=None, top=None):
+        """Coins in profitability order, narrowed by algorithm / coin tags or names."""
+        positions = range(len(self.coins))
+
+        if algorithm:
+            positions = self.by_algorithm.get(algorithm.lower(), [])
+        if coins:
+            wanted = {self.by_coin[coin.lower()] for coin in coins if coin.lower() in self.by_coin}
+            positions = [position for position in positions if position in wanted]
+        if top:
+            positions = positions[:top]
+
+        return [self.coins[position] for position in positions]
+
+    def response(self, params, encoding=None):
+        """
+        Pre-serialized (and compressed) body for normalized query params
+        (algorithm, coins tuple, top, fields tuple). Returns (bytes, etag).
+        """
+        key = (params, encoding)
+        with self._lock:
+            cached = self._responses.get(key)
+            if cached is not None:
+                self._responses.move_to_end(key)
+                return cached
+
+        if encoding is None:
+            body, digest = self._render(params)
+            cached = (body, f'"{digest}"')
+        else:
+            body, etag = self.response(params)
+            if encoding == "br":
+                body = brotli.compress(body, quality=5)
+            else:
+                body = gzip.compress(body, compresslevel=6, mtime=0)
+            # a different representation needs a different (strong) ETag
+            cached = (body, f'{etag[:-1]}-{encoding}"')
+
+        with self._lock:
+            self._responses[key] = cached
+            if len(self._responses) > MAX_CACHED_RESPONSES:
+                self._responses.popitem(last=False)
+        return cached
+
+    def _render(self, params):
+        algorithm, coins, top, fields = params
+        selected = self.select(algorithm, coins, top)
+
+        if fields:
+            data = {name: {field: coin.get(field) for field in fields} for name, coin in selected}
+        else:
+            data = dict(selected)
+
+        body = json.dumps(
+            {
+                "live": False,
+                "cached": True,
+                "source": "whattomine.com",
+                "fetched_at": self.fetched_at.isoformat(),
+                "count": len(data),
+                "data": {"coins": data},
+            },
+            separators=(",", ":"),
+        ).encode()
+        return body, hashlib.sha1(body).hexdigest()[:16]
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+# ---------- per-process index ----------
+
+_state = {"index": None, "checked_at": 0.0}
+_state_lock = threading.Lock()
+
+
+def get_asic_index():
+    """
+    The current AsicIndex (None before the first successful fetch). The
+    shared cache is consulted at most every RECHECK_SECONDS per process; that
+    read also schedules WhatToMine's background refresh when it is due.
+    """
+    now = time.monotonic()
+    index = _state["index"]
+    if index is not None and now - _state["checked_at"] < RECHECK_SECONDS:
+        return index
+
+    with _state_lock:
+        if _state["index"] is not None and now - _state["checked_at"] < RECHECK_SECONDS:
+            return _state["index"]
+
+        payload, fetched_at = whattomine_source.get_with_timestamp()
+        _state["checked_at"] = now
+        if payload is None:
+            return _state["index"]
+
+        if _state["index"] is None or _state["index"].fetched_at != fetched_at:
+            _state["index"] = AsicIndex(payload, fetched_at)
+        return _state["index"]
+
+
+def reset_asic_index():
+    """Drop the process-local index (tests, after a manual refresh)."""
+    with _state_lock:
+        _state["index"] = None
+        _state["checked_at"] = 0.0
+
+
+def parse_query(query_params, index):
+    """
+    ?algorithm=&coin=BTC,LTC&top=&fields=tag,profitability -> normalized
+    params tuple. Raises ValueError for a bad top or unknown fields.
+    """
+    algorithm = (query_params.get("algorithm") or "").strip().lower() or None
+
+    coins = tuple(sorted({
+        coin.strip().lower() for coin in (query_params.get("coin") or "").split(",") if coin.strip()
+    })) or None
+
+    top = query_params.get("top")
+    if top:
+        if not top.isdigit() or int(top) < 1:
+            raise ValueError("top must be a positive integer")
+        top = int(top)
+    else:
+        top = None
+
+    fields = tuple(field.strip() for field in (query_params.get("fields") or "").split(",") if field.strip())
+    unknown = [field for field in fields if field not in index.fields]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(index.fields)}")
+
+    return algorithm, coins, top, fields or None
+
+
+def negotiate_encoding(accept_encoding):
+    """Best supported content coding in an Accept-Encoding header (None = identity)."""
+    offered = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, quality = part.strip().partition(";q=")
+        try:
+            offered[coding.strip().lower()] = float(quality) if quality else 1.0
+        except ValueError:
+            continue
+
+    for encoding in ENCODINGS:
+        if offered.get(encoding, offered.get("*", 0)) > 0:
+            return encoding
+    return None
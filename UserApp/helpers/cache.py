@@ -0,0 +1,68 @@
+import logging
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+
+logger = logging.getLogger(__name__)
+
+# After a shared-cache error, skip it for this long and use the local cache
+# (avoids paying the socket timeout on every request while Redis is down).
+SHARED_CACHE_RETRY_AFTER = 30
+
+_shared_down_until = 0.0
+
+
+class NamespacedCache:
+    """
+    Thin wrapper over the shared ("default") cache.
+
+    - keys are "<namespace>:v<version>:<key>"; bump `version` when the cached
+      payload shape changes and old entries are simply never read again
+      (the global CACHE_VERSION setting still applies on top)
+    - when the shared cache (Redis) raises, the call is served by the
+      per-process "local" cache instead of failing the request
+
+    usage:
+        market_cache = NamespacedCache("market", version=1)
+        market_cache.set("btc_price_usd", 95000, 300)
+    """
+
+    def __init__(self, namespace, version=1):
+        self.namespace = namespace
+        self.version = version
+
+    def make_key(self, key):
+        return f"{self.namespace}:v{self.version}:{key}"
+
+    def get(self, key, default=None):
+        return self._call("get", self.make_key(key), default)
+
+    def set(self, key, value, timeout=None):
+        return self._call("set", self.make_key(key), value, timeout)
+
+    def add(self, key, value, timeout=None):
+        """Set only if missing; True if this call stored it (usable as a lock)."""
+        return self._call("add", self.make_key(key), value, timeout)
+
+    def delete(self, key):
+        return self._call("delete", self.make_key(key))
+
+    def _call(self, method, *args):
+        global _shared_down_until
+
+        if time.monotonic() >= _shared_down_until:
+            try:
+                return getattr(caches["default"], method)(*args)
+            except Exception as exc:
+                _shared_down_until = time.monotonic() + SHARED_CACHE_RETRY_AFTER
+                logger.warning("Shared cache unavailable (%s), using local cache", exc)
+
+        return getattr(_local_cache(), method)(*args)
+
+
+def _local_cache():
+    try:
+        return caches["local"]
+    except InvalidCacheBackendError:
+        return caches["default"]
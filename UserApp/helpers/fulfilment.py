@@ -0,0 +1,308 @@
+import logging
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from UserApp.models import (
+    CartItem,
+    HostingRequest,
+    Invoice,
+    Order,
+    OrderItem,
+    Rental,
+    StripeEvent,
+)
+from AdminApp.models import BundleOffer, Product
+from UserApp.helpers.invoices import schedule_invoice_render
+from UserApp.utils import get_cart_items, get_cart_totals, price_rentals, read_checkout_snapshot
+
+logger = logging.getLogger(__name__)
+
+# ---------------- STRIPE FULFILMENT -----------------
+# The webhook only verifies + records the event (StripeEvent);
+# process_stripe_event() runs here, in the Celery worker.
+
+FULFILMENT_EVENTS = {"payment_intent.succeeded"}
+MAX_ATTEMPTS = 5
+SWEEP_AFTER = 60  # seconds before the sweeper picks up an unprocessed event
+
+
+def record_stripe_event(event):
+    """
+    Store a verified event. Returns (StripeEvent, created); created is False
+    for Stripe retries / duplicate deliveries of the same event id.
+    """
+    event_type = event["type"]
+    try:
+        with transaction.atomic():
+            return StripeEvent.objects.create(
+                event_id=event["id"],
+                event_type=event_type,
+                payload=event,
+                status=StripeEvent.RECEIVED if event_type in FULFILMENT_EVENTS else StripeEvent.IGNORED,
+            ), True
+    except IntegrityError:
+        return StripeEvent.objects.get(event_id=event["id"]), False
+
+
+def kick_stripe_fulfilment(event_pk):
+    """Best effort - the beat schedule sweeps unprocessed events anyway."""
+    from UserApp.tasks import fulfil_stripe_event
+
+    try:
+        fulfil_stripe_event.apply_async(args=[event_pk], retry=False)
+    except Exception:
+        logger.warning("Could not enqueue fulfilment of Stripe event %s", event_pk, exc_info=True)
+
+
+def pending_stripe_events(older_than=SWEEP_AFTER):
+    """Events whose kick was lost or whose fulfilment failed and may be retried."""
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return StripeEvent.objects.filter(
+        status__in=[StripeEvent.RECEIVED, StripeEvent.FAILED],
+        attempts__lt=MAX_ATTEMPTS,
+        received_at__lte=cutoff,
+    ).order_by("received_at").values_list("pk", flat=True)
+
+
+def process_stripe_event(event_pk):
+    """
+    Fulfil one recorded event exactly once: the row is locked, fulfilment
+    and the PROCESSED flag commit together, and a failure rolls back both
+    (the event stays retryable). Returns True if this call fulfilled it.
+    """
+    try:
+        with transaction.atomic():
+            event = (
+                StripeEvent.objects
+                .select_for_update(skip_locked=True)
+                .filter(
+                    pk=event_pk,
+                    status__in=[StripeEvent.RECEIVED, StripeEvent.FAILED],
+                    attempts__lt=MAX_ATTEMPTS,
+                )
+                .first()
+            )
+            if event is None:
+                # already done, given up on, or locked by another worker
+                return False
+
+            fulfil_payment_intent(event.payload["data"]["object"])
+
+            event.status = StripeEvent.PROCESSED
+            event.attempts += 1
+            event.last_error = ""
+            event.processed_at = timezone.now()
+            event.save(update_fields=["status", "attempts", "last_error", "processed_at"])
+            return True
+
+    except Exception as exc:
+        logger.exception("Stripe event %s fulfilment failed", event_pk)
+        StripeEvent.objects.filter(pk=event_pk).update(
+            status=StripeEvent.FAILED,
+            attempts=F("attempts") + 1,
+            last_error=f"{type(exc).__name__}: {exc}"[:2000],
+        )
+        return False
+
+
+@transaction.atomic
+def fulfil_payment_intent(intent):
+    """
+    Create the order / rentals / hosting payment + invoice for a paid intent.
+
+    The cart is loaded once (get_cart_items), priced in memory and written
+    with bulk_create inside one transaction: a fixed number of queries
+    whatever the cart size, and never a half-written order.
+    """
+    metadata = intent.get("metadata", {})
+
+    user_id = metadata.get("user_id")
+    purchase_type = metadata.get("purchase_type")
+
+    if not user_id or not purchase_type:
+        return
+
+    User = get_user_model()
+    user = User.objects.get(id=user_id)
+
+    if purchase_type == "buy":
+        fulfil_buy(user, intent, metadata)
+    elif purchase_type == "rent":
+        fulfil_rent(user, intent, metadata)
+    elif purchase_type == "hosting":
+        fulfil_hosting(user, intent, metadata)
+
+
+# =====================================================
+# BUY
+# =====================================================
+def fulfil_buy(user, intent, metadata):
+    snapshot = read_checkout_snapshot(metadata)
+    if snapshot is None:
+        # intent created before checkout snapshots: price the live cart
+        cart_items = list(get_cart_items(user))
+        lines = [
+            ("product", item.product_id, item.quantity, item.product.price) if item.product
+            else ("bundle", item.bundle_id, item.quantity, item.bundle.price)
+            for item in cart_items if item.product or item.bundle
+        ]
+        totals = get_cart_totals(user)
+    else:
+        # exactly what was paid for, even if the cart changed since checkout
+        lines, totals = snapshot
+    if not lines:
+        return
+
+    products = Product.objects.in_bulk([object_id for kind, object_id, _, _ in lines if kind == "product"])
+    bundles = BundleOffer.objects.in_bulk([object_id for kind, object_id, _, _ in lines if kind == "bundle"])
+
+    order = Order.objects.create(
+        user=user,
+        total_amount=totals["total"],
+        stripe_payment_intent=intent["id"],
+        status="completed",
+        delivery_address={
+            "name": metadata.get("name"),
+            "line1": metadata.get("line1"),
+            "city": metadata.get("city"),
+            "state": metadata.get("state"),
+            "postal_code": metadata.get("postal_code"),
+            "country": metadata.get("country"),
+        },
+    )
+
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            product=products.get(object_id) if kind == "product" else None,
+            bundle=bundles.get(object_id) if kind == "bundle" else None,
+            quantity=quantity,
+        )
+        for kind, object_id, quantity, _ in lines
+    ])
+
+    invoice_items = []
+    for kind, object_id, quantity, unit_price in lines:
+        if kind == "product":
+            title = products[object_id].model_name if object_id in products else f"Product #{object_id}"
+        else:
+            title = bundles[object_id].name if object_id in bundles else f"Bundle #{object_id}"
+        invoice_items.append({
+            "title": title,
+            "quantity": quantity,
+            "unit_price": str(unit_price),
+            "total_price": str(unit_price * quantity),
+        })
+
+    # 🧾 INVOICE (BUY)
+    invoice = Invoice.objects.create(
+        user=user,
+        invoice_number=f"INV-BUY-{order.id}",
+        purchase_type="buy",
+        related_id=order.id,
+        amount=order.total_amount,
+        currency="USD",
+        stripe_payment_intent=intent["id"],
+        invoice_data={
+            "items": invoice_items,
+            "subtotal": str(totals["subtotal"]),
+            "discount": str(totals["discount"]),
+            "delivery_address": order.delivery_address,
+        },
+    )
+    schedule_invoice_render(invoice)
+
+    # remove the paid products / bundles; anything added after checkout stays
+    CartItem.objects.filter(user=user).filter(
+        Q(product_id__in=[object_id for kind, object_id, _, _ in lines if kind == "product"])
+        | Q(bundle_id__in=[object_id for kind, object_id, _, _ in lines if kind == "bundle"])
+    ).delete()
+
+
+# =====================================================
+# RENT
+# =====================================================
+def fulfil_rent(user, intent, metadata):
+    duration_days = int(metadata.get("duration_days", 30))
+    cart_items = list(get_cart_items(user))
+
+    end_date = timezone.now() + timedelta(days=duration_days)
+
+    rentals = Rental.objects.bulk_create([
+        Rental(
+            user=user,
+            product=item.product,
+            bundle=item.bundle,
+            duration_days=duration_days,
+            amount_paid=fee,
+            end_date=end_date,
+        )
+        for item, fee in price_rentals(cart_items, duration_days)
+    ])
+
+    # 🧾 INVOICE (RENT)
+    if rentals:
+        invoice = Invoice.objects.create(
+            user=user,
+            invoice_number=f"INV-RENT-{rentals[0].id}",
+            purchase_type="rent",
+            related_id=rentals[0].id,
+            amount=sum(r.amount_paid for r in rentals),
+            currency="USD",
+            stripe_payment_intent=intent["id"],
+            invoice_data={
+                "rentals": [
+                    {
+                        "item": r.product.model_name if r.product else r.bundle.name,
+                        "duration_days": r.duration_days,
+                        "amount": str(r.amount_paid),
+                        "end_date": str(r.end_date),
+                    }
+                    for r in rentals
+                ]
+            },
+        )
+        schedule_invoice_render(invoice)
+
+    CartItem.objects.filter(id__in=[item.id for item in cart_items]).delete()
+
+
+# =====================================================
+# HOSTING
+# =====================================================
+def fulfil_hosting(user, intent, metadata):
+    hosting_request = (
+        HostingRequest.objects
+        .select_for_update()
+        .get(id=metadata.get("hosting_request_id"), user=user)
+    )
+
+    if hosting_request.is_paid:
+        return
+
+    hosting_request.is_paid = True
+    hosting_request.stripe_payment_intent = intent["id"]
+    hosting_request.save(update_fields=["is_paid", "stripe_payment_intent"])
+
+    # 🧾 INVOICE (HOSTING)
+    invoice = Invoice.objects.create(
+        user=user,
+        invoice_number=f"INV-HOST-{hosting_request.id}",
+        purchase_type="hosting",
+        related_id=hosting_request.id,
+        amount=hosting_request.total_amount,
+        currency="USD",
+        stripe_payment_intent=intent["id"],
+        invoice_data={
+            "items": hosting_request.items,
+            "setup_fee": str(hosting_request.setup_fee),
+            "hosting_location": hosting_request.hosting_location,
+        },
+    )
+    schedule_invoice_render(invoice)
+
+    CartItem.objects.filter(user=user).delete()
@@ -0,0 +1,368 @@
+import hashlib
+import io
+import logging
+import zipfile
+from decimal import Decimal
+from functools import lru_cache
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Q
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import (
+    BaseDocTemplate, Frame, KeepTogether, PageTemplate, Spacer, Table, TableStyle
+)
+
+logger = logging.getLogger(__name__)
+
+# ---------------- INVOICE PDFS -----------------
+# Invoices are immutable once fulfilment has created them: the PDF is
+# rendered once (UserApp.tasks.render_invoice, kicked after commit) and
+# stored in InvoicePDF with its sha256. Downloads serve the stored bytes
+# with the hash as ETag; anything missing is rendered on first request.
+
+# bump when the drawing code changes - older PDFs are re-rendered lazily
+LAYOUT_VERSION = 2
+
+BRAND = colors.HexColor("#00c336")
+
+
+# ---------- LAYOUTS ----------
+# One function per purchase_type: invoice -> (columns, rows, summary, details)
+#   columns  [(title, width, align)]   table header, widths in points
+#   rows     [[cell, ...]]             one per line item (strings)
+#   summary  [(label, amount)]         lines above the TOTAL
+#   details  [(label, value)]          extra meta lines (address, location, ...)
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 40
+CONTENT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+
+ITEM_COLUMNS = (
+    ("ITEM", 255, "LEFT"),
+    ("QTY", 60, "RIGHT"),
+    ("UNIT PRICE", 100, "RIGHT"),
+    ("TOTAL", CONTENT_WIDTH - 415, "RIGHT"),
+)
+
+RENTAL_COLUMNS = (
+    ("ITEM", 255, "LEFT"),
+    ("DAYS", 60, "RIGHT"),
+    ("ENDS", 100, "RIGHT"),
+    ("AMOUNT", CONTENT_WIDTH - 415, "RIGHT"),
+)
+
+MAX_TITLE = 48  # characters that fit the ITEM column at 9pt
+MAX_META = 80   # characters that fit the meta value column at 10pt bold
+
+
+def _title(value):
+    value = str(value or "")
+    return value if len(value) <= MAX_TITLE else value[:MAX_TITLE - 1] + "\u2026"
+
+
+def _item_rows(items):
+    return [
+        [_title(item.get("title")), str(item.get("quantity", "")),
+         str(item.get("unit_price", "")), str(item.get("total_price", ""))]
+        for item in items
+    ]
+
+
+def _end_date(value):
+    # stored as str(datetime): "2026-05-01 10:00:00.123456+00:00"
+    return str(value or "")[:10]
+
+
+def buy_layout(invoice):
+    data = invoice.invoice_data
+    summary = [("Subtotal", data.get("subtotal"))]
+    if data.get("discount") and Decimal(data["discount"]):
+        summary.append(("Discount", f"-{data['discount']}"))
+
+    address = data.get("delivery_address") or {}
+    line = ", ".join(
+        str(address[field]) for field in ("name", "line1", "city", "state", "postal_code", "country")
+        if address.get(field)
+    )
+    return ITEM_COLUMNS, _item_rows(data.get("items", [])), summary, [("Deliver to", line)] if line else []
+
+
+def rent_layout(invoice):
+    rows = [
+        [_title(rental.get("item")), str(rental.get("duration_days", "")),
+         _end_date(rental.get("end_date")), str(rental.get("amount", ""))]
+        for rental in invoice.invoice_data.get("rentals", [])
+    ]
+    return RENTAL_COLUMNS, rows, [], []
+
+
+def hosting_layout(invoice):
+    data = invoice.invoice_data
+    items = data.get("items", [])
+    items_total = sum((Decimal(item.get("total_price") or 0) for item in items), Decimal("0"))
+
+    summary = [("Devices", f"{items_total:.2f}")]
+    if data.get("setup_fee") is not None:
+        summary.append(("Setup fee", data["setup_fee"]))
+
+    details = [("Location", data["hosting_location"])] if data.get("hosting_location") else []
+    return ITEM_COLUMNS, _item_rows(items), summary, details
+
+
+INVOICE_LAYOUTS = {
+    "buy": buy_layout,
+    "rent": rent_layout,
+    "hosting": hosting_layout,
+}
+
+
+# ---------- RENDERING ----------
+# platypus: the page template draws header / footer on every page, the
+# line-item table splits across pages and repeats its header row.
+
+BASE_TABLE_STYLE = [
+    ("FONT", (0, 0), (-1, -1), "Helvetica", 9),
+    ("TOPPADDING", (0, 0), (-1, -1), 3),
+    ("BOTTOMPADDING", (0, 0), (-1, -1), 3),
+]
+
+META_STYLE = TableStyle(BASE_TABLE_STYLE + [
+    ("FONT", (1, 0), (1, -1), "Helvetica-Bold", 10),
+    ("FONT", (0, 0), (0, -1), "Helvetica", 10),
+    ("LEFTPADDING", (0, 0), (-1, -1), 0),
+])
+
+SUMMARY_STYLE = TableStyle(BASE_TABLE_STYLE + [
+    ("ALIGN", (0, 0), (-1, -1), "RIGHT"),
+    ("FONT", (0, 0), (-1, -1), "Helvetica", 10),
+    ("FONT", (0, -1), (-1, -1), "Helvetica-Bold", 12),
+    ("LINEABOVE", (0, -1), (-1, -1), 1, BRAND),
+    ("TOPPADDING", (0, -1), (-1, -1), 6),
+])
+
+
+@lru_cache(maxsize=None)
+def items_style(columns):
+    """Line-item table style for a column layout (built once per layout)."""
+    commands = BASE_TABLE_STYLE + [
+        ("BACKGROUND", (0, 0), (-1, 0), BRAND),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("FONT", (0, 0), (-1, 0), "Helvetica-Bold", 10),
+        ("TOPPADDING", (0, 0), (-1, 0), 6),
+        ("BOTTOMPADDING", (0, 0), (-1, 0), 6),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#f3f7f4")]),
+    ]
+    commands += [("ALIGN", (index, 0), (index, -1), align) for index, (_, _, align) in enumerate(columns)]
+    return TableStyle(commands)
+
+
+class InvoiceTemplate(BaseDocTemplate):
+    """A4 document whose every page carries the brand header and footer."""
+
+    def __init__(self, buffer, invoice):
+        super().__init__(
+            buffer,
+            pagesize=A4,
+            leftMargin=MARGIN,
+            rightMargin=MARGIN,
+            topMargin=90,
+            bottomMargin=70,
+            title=invoice.invoice_number,
+            author="Cryptonite",
+            invariant=1,        # reproducible bytes -> stable sha256 / ETag
+        )
+        self.invoice = invoice
+        frame = Frame(self.leftMargin, self.bottomMargin, self.width, self.height, id="body",
+                      leftPadding=0, rightPadding=0, topPadding=0, bottomPadding=0)
+        self.addPageTemplates([PageTemplate(id="invoice", frames=[frame], onPage=self.draw_page)])
+
+    def draw_page(self, p, doc):
+        p.saveState()
+
+        # ================= HEADER =================
+        p.setFillColor(BRAND)
+        p.setFont("Helvetica-Bold", 22)
+        p.drawString(MARGIN, PAGE_HEIGHT - 50, "CRYPTONITE")
+
+        p.setFont("Helvetica", 11)
+        p.setFillColor(colors.black)
+        title = "INVOICE" if doc.page == 1 else f"INVOICE {self.invoice.invoice_number} (continued)"
+        p.drawRightString(PAGE_WIDTH - MARGIN, PAGE_HEIGHT - 50, title)
+
+        p.setStrokeColor(BRAND)
+        p.setLineWidth(3)
+        p.line(MARGIN, PAGE_HEIGHT - 65, PAGE_WIDTH - MARGIN, PAGE_HEIGHT - 65)
+
+        # ================= FOOTER =================
+        p.setFont("Helvetica", 9)
+        p.setFillColor(colors.grey)
+        p.drawCentredString(PAGE_WIDTH / 2, 40, "This is a system-generated invoice. Payment confirmed.")
+        p.drawRightString(PAGE_WIDTH - MARGIN, 40, f"Page {doc.page}")
+
+        p.restoreState()
+
+
+def invoice_story(invoice):
+    """Flowables for one invoice: meta block, paginated line items, totals."""
+    layout = INVOICE_LAYOUTS.get(invoice.purchase_type, buy_layout)
+    columns, rows, summary, details = layout(invoice)
+
+    meta = [
+        ("Invoice No", invoice.invoice_number),
+        ("Date", invoice.created_at.strftime("%d %b %Y")),
+        ("Customer", invoice.user.username),
+        ("Type", invoice.purchase_type.upper()),
+    ] + details
+
+    story = [
+        Table([[f"{label}:", str(value)[:MAX_META]] for label, value in meta],
+              colWidths=[80, CONTENT_WIDTH - 80], style=META_STYLE, hAlign="LEFT"),
+        Spacer(0, 14),
+    ]
+
+    rows = rows or [["No line items"] + [""] * (len(columns) - 1)]
+    story.append(Table(
+        [[title for title, _, _ in columns]] + rows,
+        colWidths=[width for _, width, _ in columns],
+        style=items_style(columns),
+        repeatRows=1,       # header row again on every page
+    ))
+
+    totals = [[label, str(amount)] for label, amount in summary if amount is not None]
+    totals.append(["TOTAL", f"{invoice.amount} {invoice.currency}"])
+    story += [
+        Spacer(0, 10),
+        KeepTogether(Table(totals, colWidths=[100, 120], style=SUMMARY_STYLE, hAlign="RIGHT")),
+    ]
+    return story
+
+
+def render_invoice_pdf(invoice):
+    """PDF bytes for an invoice (any purchase_type, any number of lines)."""
+    buffer = io.BytesIO()
+    InvoiceTemplate(buffer, invoice).build(invoice_story(invoice))
+    return buffer.getvalue()
+
+
+# ---------- STORAGE ----------
+
+def store_invoice_pdf(invoice):
+    """Render and save (or replace) the stored PDF; returns the InvoicePDF."""
+    from UserApp.models import InvoicePDF
+
+    content = render_invoice_pdf(invoice)
+    pdf, _ = InvoicePDF.objects.update_or_create(
+        invoice=invoice,
+        defaults={
+            "content": content,
+            "sha256": hashlib.sha256(content).hexdigest(),
+            "size": len(content),
+            "layout_version": LAYOUT_VERSION,
+        },
+    )
+    return pdf
+
+
+def get_invoice_pdf(invoice):
+    """The stored PDF, rendering it now if the worker has not (yet)."""
+    try:
+        pdf = invoice.pdf
+    except ObjectDoesNotExist:
+        pdf = None
+
+    if pdf is None or pdf.layout_version != LAYOUT_VERSION:
+        pdf = store_invoice_pdf(invoice)
+    return pdf
+
+
+def invoice_etag(sha256):
+    return f'"{sha256}"'
+
+
+def stored_invoice_etag(invoice_id):
+    """ETag of the current stored PDF without loading its bytes (None if not rendered)."""
+    from UserApp.models import InvoicePDF
+
+    sha256 = (
+        InvoicePDF.objects
+        .filter(invoice_id=invoice_id, layout_version=LAYOUT_VERSION)
+        .values_list("sha256", flat=True)
+        .first()
+    )
+    return invoice_etag(sha256) if sha256 else None
+
+
+# ---------- BACKGROUND RENDERING ----------
+
+def schedule_invoice_render(invoice):
+    """Render the PDF in the worker once the invoice is committed."""
+    transaction.on_commit(lambda: kick_invoice_render(invoice.pk))
+
+
+def kick_invoice_render(invoice_pk):
+    """Best effort - a missing PDF is rendered on download or by the sweep."""
+    from UserApp.tasks import render_invoice
+
+    try:
+        render_invoice.apply_async(args=[invoice_pk], retry=False)
+    except Exception:
+        logger.warning("Could not enqueue rendering of invoice %s", invoice_pk, exc_info=True)
+
+
+def unrendered_invoices():
+    """Invoices without a PDF of the current layout."""
+    from UserApp.models import Invoice
+
+    return Invoice.objects.filter(
+        Q(pdf__isnull=True) | ~Q(pdf__layout_version=LAYOUT_VERSION)
+    ).select_related("user").order_by("id")
+
+
+# ---------- ZIP EXPORT ----------
+
+class _ZipSink:
+    """Write-only, non-seekable target: zipfile then streams entries with data descriptors."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def invoice_zip_stream(invoices):
+    """
+    Yield a ZIP of `invoices` (a queryset) piece by piece: one PDF body in
+    memory at a time, rows fetched in chunks. Missing PDFs are rendered on
+    the way.
+    """
+    sink = _ZipSink()
+    # the chunked rows carry PDF metadata only; each body is loaded by its
+    # own query when it is written (deferred field), with its invoice row
+    invoices = invoices.select_related("user", "pdf").defer("pdf__content")
+
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for invoice in invoices.iterator(chunk_size=100):
+            pdf = get_invoice_pdf(invoice)
+
+            entry = zipfile.ZipInfo(
+                f"{invoice.invoice_number}.pdf",
+                date_time=invoice.created_at.timetuple()[:6],
+            )
+            entry.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(entry, bytes(pdf.content))
+
+            yield sink.drain()
+
+    yield sink.drain()
@@ -0,0 +1,185 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .cache import NamespacedCache
+
+logger = logging.getLogger(__name__)
+
+market_data_cache = NamespacedCache("market-data", version=1)
+
+# how long a cached envelope is kept at all (stale values are still served)
+MAX_STALE = 7 * 24 * 3600
+# an upstream call must finish within this or the next request may retry
+LOCK_TIMEOUT = 60
+# after a failed fetch no worker retries for this long (upstream outage)
+FAILURE_BACKOFF = 30
+
+
+class MarketDataSource:
+    """
+    External market data (CoinGecko, WhatToMine, ...) served without ever
+    blocking the request thread on the upstream API.
+
+    - stale-while-revalidate: get() always answers from cache / last known
+      good value and schedules a refresh in the background when needed
+    - refresh-ahead: the refresh starts `refresh_ahead` seconds before the
+      value turns stale, so hot keys never actually expire
+    - single-flight: one refresh at a time across all workers (cache lock)
+    - failure backoff: a failed fetch stops all refreshes for FAILURE_BACKOFF
+      seconds instead of every stale read retrying the broken upstream
+    - last known good: every successful fetch is persisted to
+      MarketDataSnapshot, so a cold cache / restart still has a value
+
+    get() returns None only if the source has never been fetched successfully.
+
+    on_refresh(value) runs after every successful fetch (in the refreshing
+    thread), for data derived from the source such as stored rankings.
+    """
+
+    def __init__(self, name, fetch, ttl, refresh_ahead=0, on_refresh=None):
+        self.name = name
+        self.fetch = fetch
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.on_refresh = on_refresh
+        self._thread_lock = threading.Lock()
+
+    # ---------- read path (request thread) ----------
+
+    def get(self):
+        value, _ = self.get_with_timestamp()
+        return value
+
+    def get_with_timestamp(self):
+        """Returns (value, fetched_at datetime) - both None if never fetched."""
+        envelope = self._load_envelope()
+
+        if envelope is None or self._needs_refresh(envelope):
+            self.refresh_in_background()
+
+        if envelope is None:
+            return None, None
+
+        fetched_at = datetime.fromtimestamp(envelope["fetched_at"], tz=dt_timezone.utc)
+        return envelope["value"], fetched_at
+
+    def cached(self):
+        """
+        Current value without ever scheduling a refresh (model save() hooks,
+        scripts). None if never fetched.
+        """
+        envelope = self._load_envelope()
+        return envelope["value"] if envelope is not None else None
+
+    def _load_envelope(self):
+        envelope = market_data_cache.get(self.name)
+
+        if envelope is None:
+            envelope = self._load_last_known_good()
+            if envelope is not None:
+                market_data_cache.set(self.name, envelope, MAX_STALE)
+
+        return envelope
+
+    def _needs_refresh(self, envelope):
+        age = time.time() - envelope["fetched_at"]
+        return age >= self.ttl - self.refresh_ahead
+
+    # ---------- refresh path (background thread / command / worker) ----------
+
+    def refresh_in_background(self):
+        if not getattr(settings, "MARKET_DATA_BACKGROUND_REFRESH", True):
+            # tests / scripts: refresh inline
+            self.refresh()
+            return
+
+        if self._backing_off():
+            return
+
+        # one refresh thread per process; the cache lock covers other processes
+        if not self._thread_lock.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._thread_lock.release()
+                close_old_connections()
+
+        threading.Thread(target=run, name=f"market-data-{self.name}", daemon=True).start()
+
+    def refresh(self, force=False):
+        """
+        Fetch from upstream and store. Returns the new value, or None if
+        another worker holds the refresh lock or has just refreshed, a
+        recent failure is still backing off (both skipped with force=True)
+        or the upstream call failed (the previous value keeps being served).
+        """
+        if not force and self._backing_off():
+            return None
+
+        lock_key = f"{self.name}:lock"
+        if not market_data_cache.add(lock_key, 1, LOCK_TIMEOUT):
+            return None
+
+        try:
+            if not force:
+                # refreshed by another worker between our stale read and the lock
+                current = market_data_cache.get(self.name)
+                if current is not None and not self._needs_refresh(current):
+                    return None
+
+            try:
+                value = self.fetch()
+            except Exception:
+                logger.warning("Market data refresh failed for %s", self.name, exc_info=True)
+                market_data_cache.set(f"{self.name}:backoff", 1, FAILURE_BACKOFF)
+                return None
+
+            # the new value is visible before the lock goes, so a reader
+            # that then takes the lock sees it fresh and does not fetch again
+            fetched_at = time.time()
+            market_data_cache.set(self.name, {"value": value, "fetched_at": fetched_at}, MAX_STALE)
+            market_data_cache.delete(f"{self.name}:backoff")
+        finally:
+            market_data_cache.delete(lock_key)
+
+        self._store_last_known_good(value, fetched_at)
+
+        if self.on_refresh is not None:
+            try:
+                self.on_refresh(value)
+            except Exception:
+                logger.exception("on_refresh hook failed for %s", self.name)
+
+        return value
+
+    def _backing_off(self):
+        return market_data_cache.get(f"{self.name}:backoff") is not None
+
+    # ---------- last known good ----------
+
+    def _load_last_known_good(self):
+        from UserApp.models import MarketDataSnapshot
+
+        snapshot = MarketDataSnapshot.objects.filter(key=self.name).first()
+        if snapshot is None:
+            return None
+        return {"value": snapshot.value, "fetched_at": snapshot.fetched_at.timestamp()}
+
+    def _store_last_known_good(self, value, fetched_at):
+        from UserApp.models import MarketDataSnapshot
+
+        MarketDataSnapshot.objects.update_or_create(
+            key=self.name,
+            defaults={
+                "value": value,
+                "fetched_at": datetime.fromtimestamp(fetched_at, tz=dt_timezone.utc),
+            },
+        )
@@ -1,45 +1,118 @@
-import re
+from .units import parse_hashrate_th
 
 def parse_hashrate(hashrate_str):
     """
-    Extract numeric value from '120 TH/s'
+    '120 TH/s' -> 120.0 (unit aware, always TH/s).
+    Prefer Product.hashrate_th, which is parsed once on save.
     """
-    match = re.search(r'(\d+\.?\d*)', str(hashrate_str))
-    return float(match.group(1)) if match else 0.0
+    return parse_hashrate_th(hashrate_str) or 0.0
 
 
 
+import numpy as np
 import requests
-from django.core.cache import cache
+from django.utils import timezone
+
+from .market_data import MarketDataSource
+from .network import DEFAULT_NETWORK, network_arrays, network_for
 
 COINGECKO_API = "https://api.coingecko.com/api/v3"
 CACHE_DURATION = 300  # 5 minutes
 
-def get_btc_price():
-    cache_key = "btc_price_usd"
-    cached = cache.get(cache_key)
+WHAT_TO_MINE_URL = "https://whattomine.com/asic.json"
+WHAT_TO_MINE_TTL = 900  # 15 minutes
 
-    if cached:
-        return cached
 
-    try:
-        response = requests.get(
-            f"{COINGECKO_API}/simple/price",
-            params={"ids": "bitcoin", "vs_currencies": "usd"},
-            timeout=10
-        )
-        response.raise_for_status()
-        price = response.json()["bitcoin"]["usd"]
+def fetch_btc_price():
+    response = requests.get(
+        f"{COINGECKO_API}/simple/price",
+        params={"ids": "bitcoin", "vs_currencies": "usd"},
+        timeout=10
+    )
+    response.raise_for_status()
+    return response.json()["bitcoin"]["usd"]
+
+
+def fetch_whattomine():
+    response = requests.get(
+        WHAT_TO_MINE_URL,
+        headers={"User-Agent": "Mozilla/5.0"},
+        timeout=10
+    )
+    response.raise_for_status()
+    return response.json()  # FULL response
+
+
+
+
+
+
+
+SECONDS_PER_DAY = 86_400
+DAYS_PER_MONTH = 30
+
+
+def _per_product(value):
+    # scalar -> scalar, one value per product -> (P, 1, 1)
+    if np.ndim(value):
+        return np.asarray(value, dtype=float)[:, None, None]
+    return float(value)
+
+
+def calculate_profitability_batch(
+    hashrates_th,
+    powers_watts,
+    btc_price,
+    electricity_costs=(0.058,),
+    miner_counts=(1,),
+    network=None
+):
+    """
+    Vectorized profitability for P miners x C electricity costs x M miner counts
+    in one NumPy pass.
 
-        cache.set(cache_key, price, CACHE_DURATION)
-        return price
+    `network` holds network_hashrate (TH/s), block_reward, block_time (s) and
+    coin_price_btc, each a scalar or one value per product (see
+    helpers.network.network_arrays); defaults to DEFAULT_NETWORK (Bitcoin).
 
-    except Exception:
-        # fallback
-        return 95000
+    Returns {metric name: ndarray of shape (P, C, M)} with the same metrics
+    and rounding as calculate_profitability.
+    """
+    network = network or DEFAULT_NETWORK
+
+    hashrate = np.asarray(hashrates_th, dtype=float)[:, None, None]        # (P, 1, 1)
+    power_kw = np.asarray(powers_watts, dtype=float)[:, None, None] / 1000
+    cost = np.asarray(electricity_costs, dtype=float)[None, :, None]      # (1, C, 1)
+    miners = np.asarray(miner_counts, dtype=float)[None, None, :]         # (1, 1, M)
+
+    network_hashrate = _per_product(network["network_hashrate"])
+    block_reward = _per_product(network["block_reward"])
+    blocks_per_day = SECONDS_PER_DAY / _per_product(network["block_time"])
+    coin_price_usd = _per_product(network["coin_price_btc"]) * btc_price
 
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coins_per_day_single = np.round(
+            np.nan_to_num((hashrate / network_hashrate) * block_reward * blocks_per_day), 8
+        )
 
+    daily_revenue = np.round(coins_per_day_single * coin_price_usd, 2)
+    daily_power_cost = np.round(power_kw * 24 * cost, 2)
+    daily_profit = np.round(daily_revenue - daily_power_cost, 2)
+
+    metrics = {
+        "salesDay": np.round(daily_revenue * miners, 2),
+        "dayCosts": np.round(daily_power_cost * miners, 2),
+        "winningDay": np.round(daily_profit * miners, 2),
+        "monthlyRevenue": np.round(daily_revenue * miners * DAYS_PER_MONTH, 2),
+        "monthlyCosts": np.round(daily_power_cost * miners * DAYS_PER_MONTH, 2),
+        "profitMonth": np.round(daily_profit * miners * DAYS_PER_MONTH, 2),
+        "dailyProfit": daily_profit,
+        "coinsPerDay": np.round(coins_per_day_single * miners, 8),
+    }
 
+    # every metric as a full (P, C, M) grid
+    shape = np.broadcast_shapes(hashrate.shape, cost.shape, miners.shape)
+    return {name: np.broadcast_to(values, shape) for name, values in metrics.items()}
 
 
 def calculate_profitability(
@@ -47,34 +120,97 @@ def calculate_profitability(
     power_watts,
     btc_price,
     number_of_miners=1,
-    electricity_cost=0.058
+    electricity_cost=0.058,
+    network=None
 ):
-    NETWORK_HASHRATE = 600_000_000  # TH/s
-    BLOCK_REWARD = 3.125
-    BLOCKS_PER_DAY = 144
+    metrics = calculate_profitability_batch(
+        [hashrate_th],
+        [power_watts],
+        btc_price,
+        electricity_costs=[electricity_cost],
+        miner_counts=[number_of_miners],
+        network=network,
+    )
+    return {name: float(values[0, 0, 0]) for name, values in metrics.items()}
+
+
+# ---------------- STORED PROFITABILITY RANKING -----------------
+# Product.daily_profit_usd = dailyProfit for one miner at the default
+# electricity cost, so the catalog can be sorted / filtered by it in SQL.
 
-    power_kw = power_watts / 1000
+DEFAULT_ELECTRICITY_COST = 0.058
 
-    coins_per_day_single = (
-        (hashrate_th / NETWORK_HASHRATE)
-        * BLOCK_REWARD
-        * BLOCKS_PER_DAY
+
+def refresh_product_profitability(btc_price=None):
+    """
+    Recompute daily_profit_usd for the whole catalog in one NumPy pass and
+    write back only the rows that changed. Runs after every BTC price and
+    network stats refresh. Returns the number of updated products.
+    """
+    from AdminApp.models import Product
+
+    if btc_price is None:
+        btc_price = btc_price_source.cached()
+    if btc_price is None:
+        return 0
+
+    rows = list(
+        Product.objects
+        .filter(hashrate_th__isnull=False, power_watts__isnull=False)
+        .values_list(
+            "id", "hashrate_th", "power_watts", "minable_coins", "algorithm", "daily_profit_usd"
+        )
+    )
+    if not rows:
+        return 0
+
+    ids, hashrates, powers, coins, algorithms, current = zip(*rows)
+
+    profits = calculate_profitability_batch(
+        hashrates,
+        powers,
+        btc_price,
+        electricity_costs=[DEFAULT_ELECTRICITY_COST],
+        network=network_arrays(zip(coins, algorithms)),
+    )["dailyProfit"][:, 0, 0].tolist()
+
+    now = timezone.now()
+    changed = [
+        Product(id=product_id, daily_profit_usd=profit, profitability_updated_at=now)
+        for product_id, profit, old in zip(ids, profits, current)
+        if profit != old
+    ]
+
+    return Product.objects.bulk_update(
+        changed, ["daily_profit_usd", "profitability_updated_at"], batch_size=500
     )
 
-    coins_per_day_single = round(coins_per_day_single, 8)
 
-    daily_revenue = round(coins_per_day_single * btc_price, 2)
-    daily_power_cost = round(power_kw * 24 * electricity_cost, 2)
-    daily_profit = round(daily_revenue - daily_power_cost, 2)
+def product_daily_profit(product):
+    """Single-product version for Product.save(); never calls upstream."""
+    btc_price = btc_price_source.cached()
+    if btc_price is None or product.hashrate_th is None or product.power_watts is None:
+        return None
+    return calculate_profitability(
+        product.hashrate_th,
+        product.power_watts,
+        btc_price,
+        electricity_cost=DEFAULT_ELECTRICITY_COST,
+        network=network_for(product.minable_coins, product.algorithm),
+    )["dailyProfit"]
 
-    return {
-        "salesDay": round(daily_revenue * number_of_miners, 2),
-        "dayCosts": round(daily_power_cost * number_of_miners, 2),
-        "winningDay": round(daily_profit * number_of_miners, 2),
-        "monthlyRevenue": round(daily_revenue * number_of_miners * 30, 2),
-        "monthlyCosts": round(daily_power_cost * number_of_miners * 30, 2),
-        "profitMonth": round(daily_profit * number_of_miners * 30, 2),
-        "dailyProfit": daily_profit,
-        "coinsPerDay": round(coins_per_day_single * number_of_miners, 8),
-    }
 
+# served from cache / last known good, refreshed in the background
+btc_price_source = MarketDataSource(
+    "btc_price_usd", fetch_btc_price, ttl=CACHE_DURATION, refresh_ahead=60,
+    on_refresh=refresh_product_profitability,  # keep the stored ranking in step with the price
+)
+whattomine_source = MarketDataSource("whattomine_asic", fetch_whattomine, ttl=WHAT_TO_MINE_TTL, refresh_ahead=120)
+
+
+def get_btc_price():
+    """
+    Latest BTC/USD price without waiting on CoinGecko.
+    None only before the very first successful fetch.
+    """
+    return btc_price_source.get()
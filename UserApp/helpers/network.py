@@ -0,0 +1,183 @@
+import json
+import logging
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .market_data import MarketDataSource
+
+logger = logging.getLogger(__name__)
+
+# ---------------- NETWORK STATS (per coin) -----------------
+# Inputs of the profitability engine that change with the network:
+# hashrate, difficulty, block reward, block time and the coin's BTC price.
+#
+# Normalized shape, keyed by coin tag:
+#   {"BTC": {"algorithm": "SHA-256", "network_hashrate": <TH/s>, "difficulty": ...,
+#            "block_reward": 3.125, "block_time": <seconds>, "coin_price_btc": 1.0}}
+
+NETWORK_STATS_TTL = 900  # 15 minutes
+
+FIXTURE_PATH = Path(__file__).resolve().parent.parent / "fixtures" / "network_stats.json"
+
+# used until the first successful fetch (the values that used to be hard-coded)
+DEFAULT_NETWORK = {
+    "coin": "BTC",
+    "algorithm": "SHA-256",
+    "network_hashrate": 600_000_000,  # TH/s
+    "difficulty": None,
+    "block_reward": 3.125,
+    "block_time": 600.0,
+    "coin_price_btc": 1.0,
+}
+
+
+class WhatToMineNetworkProvider:
+    """
+    Live stats from WhatToMine's ASIC coin list (nethash is in H/s), parsed
+    from the asic.json payload whattomine_source already fetches and caches.
+    """
+
+    def fetch(self):
+        from .mining import whattomine_source
+
+        if whattomine_source.cached() is None:
+            whattomine_source.refresh()     # very first run: fetch it here
+        payload = whattomine_source.get()   # schedules its own refresh when stale
+        if payload is None:
+            raise RuntimeError("WhatToMine payload is not available yet")
+        return self.parse(payload)
+
+    def parse(self, data):
+        stats = {}
+        for coin in data.get("coins", {}).values():
+            tag = (coin.get("tag") or "").upper()
+            if not tag or tag in stats or tag == "NICEHASH":
+                continue
+            try:
+                stats[tag] = {
+                    "algorithm": coin.get("algorithm", ""),
+                    "network_hashrate": float(coin["nethash"]) / 1e12,
+                    "difficulty": float(coin["difficulty"]),
+                    "block_reward": float(coin["block_reward"]),
+                    "block_time": float(coin["block_time"]),
+                    "coin_price_btc": float(coin.get("exchange_rate") or 0.0),
+                }
+            except (KeyError, TypeError, ValueError):
+                logger.debug("Skipping incomplete WhatToMine entry %s", tag)
+        if "BTC" in stats:
+            stats["BTC"]["coin_price_btc"] = 1.0
+        return stats
+
+
+class FixtureNetworkProvider:
+    """Static stats from a JSON file - tests, local development, offline demos."""
+
+    def __init__(self, path=None):
+        self.path = Path(path or getattr(settings, "NETWORK_STATS_FIXTURE", FIXTURE_PATH))
+
+    def fetch(self):
+        with open(self.path) as fixture:
+            return json.load(fixture)
+
+
+def get_provider():
+    return import_string(settings.NETWORK_STATS_PROVIDER)()
+
+
+def fetch_network_stats():
+    # resolved on every fetch so the provider can be swapped via settings
+    return get_provider().fetch()
+
+
+def _rerank_products(_stats):
+    from .mining import refresh_product_profitability
+
+    refresh_product_profitability()
+
+
+# served from cache / last known good, refreshed in the background
+network_stats_source = MarketDataSource(
+    "network_stats", fetch_network_stats, ttl=NETWORK_STATS_TTL, refresh_ahead=120,
+    on_refresh=_rerank_products,  # new difficulty -> new profitability ranking
+)
+
+
+def get_network_stats():
+    """
+    Latest stats without waiting on the provider (schedules a background
+    refresh when stale). {} before the very first successful fetch.
+    """
+    return network_stats_source.get() or {}
+
+
+# ---------------- PRODUCT -> COIN -----------------
+
+_COIN_SPLIT_RE = re.compile(r"[\s,/|;+&]+")
+
+
+def parse_coins(minable_coins):
+    """'BTC, BCH / BSV' -> ['BTC', 'BCH', 'BSV']"""
+    if not minable_coins:
+        return []
+    return [coin.upper() for coin in _COIN_SPLIT_RE.split(str(minable_coins)) if coin]
+
+
+def _algorithm_key(algorithm):
+    return re.sub(r"[^a-z0-9]", "", (algorithm or "").lower())
+
+
+def coins_by_algorithm(stats):
+    """
+    algorithm key -> the coin an unlabelled miner of that algorithm is priced
+    as: DEFAULT_NETWORK's coin (BTC for SHA-256) if listed, else the coin
+    with the largest network hashrate - never whatever the feed lists first.
+    """
+    best = {}
+    for coin, coin_stats in stats.items():
+        key = _algorithm_key(coin_stats.get("algorithm"))
+        rank = (coin == DEFAULT_NETWORK["coin"], coin_stats.get("network_hashrate") or 0)
+        if key and (key not in best or rank > best[key][0]):
+            best[key] = (rank, coin)
+    return {key: coin for key, (_, coin) in best.items()}
+
+
+def network_for(minable_coins, algorithm, stats=None, by_algorithm=None):
+    """
+    Network inputs for one product: the first of its coins we have stats for,
+    else the main coin of its algorithm (coins_by_algorithm), else
+    DEFAULT_NETWORK. `stats` defaults to the cached stats (never waits on
+    the provider); pass `by_algorithm` when pricing many products.
+    """
+    if stats is None:
+        stats = network_stats_source.cached() or {}
+
+    for coin in parse_coins(minable_coins):
+        if coin in stats:
+            return {"coin": coin, **stats[coin]}
+
+    if by_algorithm is None:
+        by_algorithm = coins_by_algorithm(stats)
+    coin = by_algorithm.get(_algorithm_key(algorithm))
+    if coin is not None:
+        return {"coin": coin, **stats[coin]}
+
+    return DEFAULT_NETWORK
+
+
+def network_arrays(products, stats=None):
+    """
+    Per-product network inputs for calculate_profitability_batch from
+    [(minable_coins, algorithm), ...] - one dict of lists, stats read once.
+    """
+    if stats is None:
+        stats = network_stats_source.cached() or {}
+
+    by_algorithm = coins_by_algorithm(stats)
+    networks = [network_for(coins, algorithm, stats, by_algorithm) for coins, algorithm in products]
+    return {
+        key: [network[key] for network in networks]
+        for key in ("network_hashrate", "block_reward", "block_time", "coin_price_btc")
+    }
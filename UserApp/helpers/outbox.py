@@ -0,0 +1,199 @@
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, Min, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# ---------------- EMAIL OUTBOX -----------------
+# Requests call enqueue_email() (one INSERT, no SendGrid round trip).
+# UserApp.tasks.send_email_outbox -> deliver_batch() sends due rows.
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 6
+RETRY_BASE = 30         # seconds; 30s, 1m, 2m, 4m, 8m between attempts
+RETRY_MAX = 3600
+SENDING_LEASE = 300     # a claimed row is retried if its worker died mid-send
+
+# a second verification email for the same user within this window is dropped
+DEDUPE_WINDOW = 60
+
+
+def enqueue_email(to_email, subject, body, kind="other", dedupe_key=""):
+    """
+    Queue an email and kick the worker after commit.
+
+    With a dedupe_key, a still-pending email with the same key is replaced
+    (the newest link wins) and a repeat within DEDUPE_WINDOW of the last
+    sent one is dropped. Returns the EmailOutbox row or None if dropped.
+    """
+    from UserApp.models import EmailOutbox
+
+    fields = {"to_email": to_email, "subject": subject, "body": body, "kind": kind}
+
+    if dedupe_key:
+        recently_sent = EmailOutbox.objects.filter(
+            dedupe_key=dedupe_key,
+            status=EmailOutbox.SENT,
+            sent_at__gte=timezone.now() - timedelta(seconds=DEDUPE_WINDOW),
+        ).exists()
+        if recently_sent:
+            return None
+
+        if EmailOutbox.objects.filter(dedupe_key=dedupe_key, status=EmailOutbox.PENDING).update(**fields):
+            return EmailOutbox.objects.filter(dedupe_key=dedupe_key, status=EmailOutbox.PENDING).first()
+
+    try:
+        with transaction.atomic():
+            email = EmailOutbox.objects.create(dedupe_key=dedupe_key, **fields)
+    except IntegrityError:
+        # concurrent request queued the same key first
+        EmailOutbox.objects.filter(dedupe_key=dedupe_key, status=EmailOutbox.PENDING).update(**fields)
+        return EmailOutbox.objects.filter(dedupe_key=dedupe_key, status=EmailOutbox.PENDING).first()
+
+    transaction.on_commit(kick_worker)
+    return email
+
+
+def kick_worker():
+    """Best effort - the beat schedule sweeps the outbox anyway."""
+    from UserApp.tasks import send_email_outbox
+
+    try:
+        send_email_outbox.apply_async(retry=False)
+    except Exception:
+        logger.warning("Could not enqueue email outbox task", exc_info=True)
+
+
+def retry_delay(attempts):
+    delay = min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+    return delay + random.uniform(0, delay / 10)
+
+
+def claim_batch(batch_size=BATCH_SIZE):
+    """
+    Lock up to batch_size due rows for this worker (SKIP LOCKED on Postgres,
+    so parallel workers never send the same email twice).
+    """
+    from UserApp.models import EmailOutbox
+
+    now = timezone.now()
+
+    with transaction.atomic():
+        ids = list(
+            EmailOutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                status__in=[EmailOutbox.PENDING, EmailOutbox.SENDING],
+                next_attempt_at__lte=now,
+            )
+            .order_by("next_attempt_at", "id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        EmailOutbox.objects.filter(id__in=ids).update(
+            status=EmailOutbox.SENDING,
+            next_attempt_at=now + timedelta(seconds=SENDING_LEASE),
+        )
+
+    return list(EmailOutbox.objects.filter(id__in=ids).order_by("id"))
+
+
+def _record_failure(email, exc):
+    """Back off a failed attempt, or give up after MAX_ATTEMPTS."""
+    from UserApp.models import EmailOutbox
+
+    email.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = EmailOutbox.FAILED
+        logger.error("Giving up on email %s to %s", email.id, email.to_email)
+    else:
+        email.status = EmailOutbox.PENDING
+        email.next_attempt_at = timezone.now() + timedelta(seconds=retry_delay(email.attempts))
+
+
+def deliver_batch(batch_size=BATCH_SIZE):
+    """
+    Send one batch over a single mail connection. Failures are rescheduled
+    with exponential backoff until MAX_ATTEMPTS, then marked failed; if the
+    connection itself cannot be opened, the whole batch counts as failed.
+    Returns (sent, failed) counts; the batch is full if sent + failed == batch_size.
+    """
+    from UserApp.models import EmailOutbox
+
+    emails = claim_batch(batch_size)
+    if not emails:
+        return 0, 0
+
+    fields = ["status", "attempts", "next_attempt_at", "last_error", "sent_at"]
+    sent = failed = 0
+
+    try:
+        connection = get_connection(fail_silently=False)
+        connection.open()
+    except Exception as exc:
+        # mail provider down / bad credentials: release the claimed rows now
+        # instead of leaving them SENDING until the lease runs out
+        logger.warning("Could not open mail connection", exc_info=True)
+        for email in emails:
+            email.attempts += 1
+            _record_failure(email, exc)
+        EmailOutbox.objects.bulk_update(emails, fields)
+        return 0, len(emails)
+
+    try:
+        for email in emails:
+            email.attempts += 1
+            try:
+                EmailMessage(
+                    subject=email.subject,
+                    body=email.body,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    to=[email.to_email],
+                    connection=connection,
+                ).send()
+            except Exception as exc:
+                failed += 1
+                _record_failure(email, exc)
+            else:
+                sent += 1
+                email.status = EmailOutbox.SENT
+                email.sent_at = timezone.now()
+                email.last_error = ""
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            # the messages are already handed over; don't lose their status
+            logger.warning("Could not close mail connection", exc_info=True)
+
+    EmailOutbox.objects.bulk_update(emails, fields)
+    return sent, failed
+
+
+def outbox_metrics():
+    """Delivery status counters for the admin dashboard (one query)."""
+    from UserApp.models import EmailOutbox
+
+    now = timezone.now()
+    last_hour = now - timedelta(hours=1)
+
+    stats = EmailOutbox.objects.aggregate(
+        pending=Count("id", filter=Q(status=EmailOutbox.PENDING)),
+        sending=Count("id", filter=Q(status=EmailOutbox.SENDING)),
+        sent=Count("id", filter=Q(status=EmailOutbox.SENT)),
+        failed=Count("id", filter=Q(status=EmailOutbox.FAILED)),
+        retrying=Count("id", filter=Q(status=EmailOutbox.PENDING, attempts__gt=0)),
+        sent_last_hour=Count("id", filter=Q(status=EmailOutbox.SENT, sent_at__gte=last_hour)),
+        oldest_pending=Min("created_at", filter=Q(status__in=[EmailOutbox.PENDING, EmailOutbox.SENDING])),
+        avg_attempts_sent=Avg("attempts", filter=Q(status=EmailOutbox.SENT)),
+    )
+
+    oldest = stats.pop("oldest_pending")
+    stats["oldest_pending_age_seconds"] = int((now - oldest).total_seconds()) if oldest else 0
+    stats["avg_attempts_sent"] = round(stats["avg_attempts_sent"] or 0, 2)
+    return stats
@@ -0,0 +1,178 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, FloatField, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+
+from AdminApp.models import Product
+from .cache import NamespacedCache
+
+# ---------------- PRODUCT REVIEW AGGREGATES -----------------
+# Product.review_count / rating_sum / rating_N_count / average_rating used to
+# be recomputed by loading every review of the product on each write. They
+# are now moved by a single UPDATE ... SET col = col + delta per review write
+# (ProductReview.save / delete), so concurrent reviews cannot overwrite each
+# other and the cost no longer grows with the number of reviews.
+# Writes that bypass the model (queryset.delete(), cascades) are repaired by
+# `manage.py reconcile_review_aggregates`.
+
+STARS = range(1, 6)
+SUMMARY_TTL = 60 * 60       # invalidated on every review write anyway
+
+review_cache = NamespacedCache("review-summary", version=1)
+
+
+def rating_column(rating):
+    if rating not in STARS:
+        raise ValueError(f"Rating must be between 1 and 5, got {rating!r}")
+    return f"rating_{rating}_count"
+
+
+def _average(rating_sum, review_count):
+    # rounded as numeric (Postgres has no ROUND(double precision, int)),
+    # half up like average_rating() below
+    average = Cast(
+        Cast(rating_sum, FloatField()) / NullIf(review_count, 0),
+        DecimalField(max_digits=12, decimal_places=4),
+    )
+    return Coalesce(Cast(Round(average, 1), FloatField()), Value(0.0), output_field=FloatField())
+
+
+def average_rating(rating_sum, review_count):
+    if not review_count:
+        return 0
+    average = Decimal(rating_sum) / Decimal(review_count)
+    return float(average.quantize(Decimal("0.1"), rounding=ROUND_HALF_UP))
+
+
+def apply_rating_delta(product_id, added=None, removed=None):
+    """
+    Move a product's aggregates for one review write in a single UPDATE:
+    added=5 (new review), removed=3 (deleted review) or both (rating edited).
+    Every right-hand side reads the row as it was before the statement, so
+    the average is derived from the same new sum / count.
+    """
+    if added == removed:
+        return 0
+
+    count_delta = (added is not None) - (removed is not None)
+    sum_delta = (added or 0) - (removed or 0)
+    review_count = F("review_count") + count_delta
+    rating_sum = F("rating_sum") + sum_delta
+
+    updates = {
+        "review_count": review_count,
+        "rating_sum": rating_sum,
+        "average_rating": _average(rating_sum, review_count),
+    }
+    if added is not None:
+        updates[rating_column(added)] = F(rating_column(added)) + 1
+    if removed is not None:
+        updates[rating_column(removed)] = F(rating_column(removed)) - 1
+
+    updated = Product.objects.filter(pk=product_id).update(**updates)
+    transaction.on_commit(lambda: invalidate_review_summary(product_id))
+    return updated
+
+
+def rating_aggregates(reviews):
+    """product_id -> {column: value} for a ProductReview queryset, in one GROUP BY."""
+    rows = (
+        reviews.order_by()
+        .values("product_id")
+        .annotate(
+            review_count=Count("id"),
+            rating_sum=Sum("rating"),
+            **{rating_column(stars): Count("id", filter=Q(rating=stars)) for stars in STARS},
+        )
+    )
+
+    aggregates = {}
+    for row in rows:
+        product_id = row.pop("product_id")
+        row["average_rating"] = average_rating(row["rating_sum"], row["review_count"])
+        aggregates[product_id] = row
+    return aggregates
+
+
+EMPTY_AGGREGATES = {
+    "review_count": 0,
+    "rating_sum": 0,
+    "average_rating": 0,
+    **{rating_column(stars): 0 for stars in STARS},
+}
+
+
+def reconcile_rating_aggregates(batch_size=500, dry_run=False):
+    """
+    Recompute every product's aggregates from its reviews, batch_size
+    products at a time (one GROUP BY + one bulk_update per batch), and fix
+    the ones that drifted. Returns (checked, fixed).
+    """
+    from UserApp.models import ProductReview
+
+    columns = list(EMPTY_AGGREGATES)
+    products = Product.objects.only("id", *columns).order_by("id")
+
+    checked = fixed = 0
+    batch = []
+
+    def flush(batch):
+        aggregates = rating_aggregates(
+            ProductReview.objects.filter(product_id__in=[product.id for product in batch])
+        )
+        drifted = []
+        for product in batch:
+            expected = aggregates.get(product.id, EMPTY_AGGREGATES)
+            if any(getattr(product, column) != expected[column] for column in columns):
+                for column in columns:
+                    setattr(product, column, expected[column])
+                drifted.append(product)
+
+        if drifted and not dry_run:
+            Product.objects.bulk_update(drifted, columns)
+            for product in drifted:
+                invalidate_review_summary(product.id)
+        return len(drifted)
+
+    for product in products.iterator(chunk_size=batch_size):
+        batch.append(product)
+        checked += 1
+        if len(batch) >= batch_size:
+            fixed += flush(batch)
+            batch = []
+
+    if batch:
+        fixed += flush(batch)
+
+    return checked, fixed
+
+
+# ---------- cached summary ----------
+
+def review_summary(product_id):
+    """
+    {product_id, review_count, average_rating, histogram} for the review
+    tab, read from the product's aggregate columns and cached until the next
+    review write. None for an unknown product (not cached).
+    """
+    summary = review_cache.get(product_id)
+    if summary is not None:
+        return summary
+
+    row = Product.objects.filter(pk=product_id).values("id", *EMPTY_AGGREGATES).first()
+    if row is None:
+        return None
+
+    summary = {
+        "product_id": row["id"],
+        "review_count": row["review_count"],
+        "average_rating": row["average_rating"],
+        "histogram": {str(stars): row[rating_column(stars)] for stars in STARS},
+    }
+    review_cache.set(product_id, summary, SUMMARY_TTL)
+    return summary
+
+
+def invalidate_review_summary(product_id):
+    review_cache.delete(product_id)
@@ -0,0 +1,75 @@
+import re
+
+# ---------------- SPEC STRING PARSING -----------------
+# Product.hashrate / power / efficiency are free text typed by admins
+# ("120 TH/s", "3.2 kW", "29.5 J/TH"). These helpers turn them into the
+# canonical numeric columns: TH/s, watts and J/TH.
+
+# hashrate unit prefix -> multiplier to TH/s
+HASHRATE_UNITS = {
+    "": 1e-12,
+    "k": 1e-9,
+    "m": 1e-6,
+    "g": 1e-3,
+    "t": 1.0,
+    "p": 1e3,
+    "e": 1e6,
+}
+
+_NUMBER = r"(\d+(?:\.\d+)?)"
+
+_HASHRATE_RE = re.compile(_NUMBER + r"\s*([kmgtpe]?)\s*h(?:/s|ps)?\b", re.IGNORECASE)
+_POWER_RE = re.compile(_NUMBER + r"\s*(kw|w)\b", re.IGNORECASE)
+_EFFICIENCY_RE = re.compile(_NUMBER + r"\s*[jw]\s*/\s*([kmgtpe]?)\s*h\b", re.IGNORECASE)
+_BARE_NUMBER_RE = re.compile(_NUMBER)
+
+
+def _normalize(value):
+    if value is None:
+        return ""
+    text = str(value).strip()
+    # "1,250 W" -> "1250 W", "3,2 kW" -> "3.2 kW"
+    text = re.sub(r"(?<=\d),(?=\d{3}\b)", "", text)
+    return text.replace(",", ".")
+
+
+def _bare_number(text):
+    match = _BARE_NUMBER_RE.search(text)
+    return float(match.group(1)) if match else None
+
+
+def parse_hashrate_th(value):
+    """
+    '120 TH/s' -> 120.0, '950 GH/s' -> 0.95, '1.2 PH/s' -> 1200.0.
+    A number without unit is taken as TH/s. Returns None if unparseable.
+    """
+    text = _normalize(value)
+    match = _HASHRATE_RE.search(text)
+    if match:
+        return round(float(match.group(1)) * HASHRATE_UNITS[match.group(2).lower()], 6)
+    return _bare_number(text)
+
+
+def parse_power_watts(value):
+    """
+    '3250W' -> 3250.0, '3.2 kW' -> 3200.0. A number without unit is taken
+    as watts. Returns None if unparseable.
+    """
+    text = _normalize(value)
+    match = _POWER_RE.search(text)
+    if match:
+        number = float(match.group(1))
+        return number * 1000 if match.group(2).lower() == "kw" else number
+    return _bare_number(text)
+
+
+def parse_efficiency_j_th(value):
+    """
+    '29.5 J/TH' -> 29.5, '0.03 J/GH' -> 30.0 (W/TH is the same as J/TH).
+    A number without unit is taken as J/TH. Returns None if unparseable.
+    """
+    text = _normalize(value)
+    match = _EFFICIENCY_RE.search(text)
+    if match:
+        return round(float(match.group(1)) / HASHRATE_UNITS[match.group(2).lower()], 6)
+    return _bare_number(text)
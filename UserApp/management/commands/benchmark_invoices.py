@@ -0,0 +1,68 @@
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from UserApp.helpers.invoices import INVOICE_LAYOUTS, render_invoice_pdf
+from UserApp.models import Invoice
+
+
+def sample_invoice(purchase_type, lines):
+    """Unsaved invoice shaped like the ones fulfilment writes (no database needed)."""
+    items = [
+        {"title": f"Antminer S21 Hydro {index}", "quantity": 2,
+         "unit_price": "4999.00", "total_price": "9998.00"}
+        for index in range(lines)
+    ]
+    data = {
+        "buy": {
+            "items": items, "subtotal": str(Decimal("9998.00") * lines), "discount": "0",
+            "delivery_address": {"name": "Benchmark", "line1": "1 Main St", "city": "Austin", "country": "US"},
+        },
+        "rent": {
+            "rentals": [
+                {"item": item["title"], "duration_days": 30, "amount": "450.00",
+                 "end_date": "2026-05-01 10:00:00+00:00"}
+                for item in items
+            ],
+        },
+        "hosting": {"items": items, "setup_fee": "100.00", "hosting_location": "ethiopia"},
+    }[purchase_type]
+
+    invoice = Invoice(
+        user=get_user_model()(username="benchmark"),
+        invoice_number=f"INV-{purchase_type.upper()}-1",
+        purchase_type=purchase_type,
+        related_id=1,
+        amount=Decimal("9998.00") * lines,
+        invoice_data=data,
+    )
+    invoice.created_at = timezone.now()
+    return invoice
+
+
+class Command(BaseCommand):
+    help = "Measure invoice PDF renders per second for each purchase type"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=200, help="renders per purchase type")
+        parser.add_argument("--lines", type=int, default=5, help="line items per invoice")
+
+    def handle(self, *args, **options):
+        count, lines = options["count"], options["lines"]
+
+        for purchase_type in INVOICE_LAYOUTS:
+            invoice = sample_invoice(purchase_type, lines)
+            render_invoice_pdf(invoice)     # warm-up (font metrics, style caches)
+
+            started = time.perf_counter()
+            for _ in range(count):
+                size = len(render_invoice_pdf(invoice))
+            elapsed = time.perf_counter() - started
+
+            self.stdout.write(
+                f"{purchase_type:8} {lines} lines: {count / elapsed:8.1f} renders/s "
+                f"({elapsed / count * 1000:.2f} ms each, {size / 1024:.1f} KiB)"
+            )
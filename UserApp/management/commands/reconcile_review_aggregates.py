@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from UserApp.helpers.reviews import reconcile_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = "Rebuild Product review_count / rating_sum / rating histogram / average_rating from the reviews"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only report products whose aggregates drifted"
+        )
+
+    def handle(self, *args, **options):
+        checked, fixed = reconcile_rating_aggregates(
+            batch_size=options["batch_size"], dry_run=options["dry_run"]
+        )
+
+        if options["dry_run"]:
+            self.stdout.write(f"Checked {checked} products, {fixed} out of step.")
+        elif fixed:
+            self.stdout.write(self.style.WARNING(f"Checked {checked} products, fixed {fixed}."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Checked {checked} products, all in step."))
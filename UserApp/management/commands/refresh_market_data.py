@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from UserApp.helpers.mining import btc_price_source, refresh_product_profitability, whattomine_source
+from UserApp.helpers.network import network_stats_source
+
+
+class Command(BaseCommand):
+    help = "Fetch BTC price, WhatToMine data and network stats now (deploy warm-up / cron)"
+
+    def handle(self, *args, **options):
+        for source in (btc_price_source, whattomine_source, network_stats_source):
+            if source.refresh(force=True) is None:
+                self.stdout.write(self.style.WARNING(f"{source.name}: not refreshed"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{source.name}: refreshed"))
+
+        # also fills the ranking when the price refresh above was skipped
+        updated = refresh_product_profitability()
+        self.stdout.write(f"profitability ranking: {updated} products updated")
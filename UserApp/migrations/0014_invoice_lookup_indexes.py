@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UserApp', '0013_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['purchase_type', 'related_id'], name='invoice_type_related_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['user', '-created_at'], name='invoice_user_created_idx'),
+        ),
+    ]
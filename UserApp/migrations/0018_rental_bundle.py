@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AdminApp', '0016_product_daily_profit'),
+        ('UserApp', '0017_stripeevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rental',
+            name='bundle',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='AdminApp.bundleoffer'),
+        ),
+        migrations.AlterField(
+            model_name='rental',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='AdminApp.product'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UserApp', '0018_rental_bundle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoicePDF',
+            fields=[
+                ('invoice', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pdf', serialize=False, to='UserApp.invoice')),
+                ('content', models.BinaryField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('size', models.PositiveIntegerField()),
+                ('layout_version', models.PositiveSmallIntegerField(default=1)),
+                ('rendered_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -8,7 +8,12 @@ class User(AbstractUser):
 
     # NEW → Save default shipping address if user chooses
     shipping_address = models.JSONField(null=True, blank=True)
-    
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=["-date_joined", "-id"], name="user_joined_id_idx"),
+        ]
+
     def __str__(self):
         return self.email or self.username
 
@@ -42,7 +47,9 @@ from decimal import Decimal
 
 class Rental(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    # exactly one of product / bundle is set
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True)
+    bundle = models.ForeignKey(BundleOffer, on_delete=models.CASCADE, null=True, blank=True)
 
     start_date = models.DateTimeField(auto_now_add=True)
     end_date = models.DateTimeField()
@@ -52,13 +59,24 @@ class Rental(models.Model):
 
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-start_date", "-id"], name="rental_start_id_idx"),
+        ]
+
     def __str__(self):
-        return f"{self.user.email} rented {self.product.model_name}"
+        item = self.product.model_name if self.product else self.bundle.name
+        return f"{self.user.email} rented {item}"
     
     def calculate_rental_fee(self):
-        # Read machine power from product.
-        # ASSUMPTION: power is stored in WATTS (no unit in DB)
-        power_watts = Decimal(self.product.power)
+        # Bundles rent at the bundle price (see utils.price_rentals)
+        if self.product is None:
+            raise ValueError("rental fee is only calculated for products")
+
+        # Read machine power from product (normalized to watts on save)
+        if self.product.power_watts is None:
+            raise ValueError("power is not set for this product")
+        power_watts = Decimal(str(self.product.power_watts))
 
         # Convert power from watts to kilowatts (1 kW = 1000 W)
         power_kw = power_watts / Decimal("1000")
@@ -113,6 +131,11 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     delivery_address = models.JSONField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="order_created_id_idx"),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.status}"
 
@@ -174,6 +197,11 @@ class HostingRequest(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="hosting_created_id_idx"),
+        ]
+
 
 
 class Invoice(models.Model):
@@ -187,11 +215,40 @@ class Invoice(models.Model):
     invoice_data = models.JSONField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # invoice_id lookups for orders / rentals / hosting requests
+            models.Index(fields=["purchase_type", "related_id"], name="invoice_type_related_idx"),
+            # "my invoices", newest first
+            models.Index(fields=["user", "-created_at"], name="invoice_user_created_idx"),
+        ]
+
+
+
+class InvoicePDF(models.Model):
+    """
+    Pre-rendered invoice PDF (UserApp.helpers.invoices). Invoices never
+    change after fulfilment, so the bytes are rendered once in the worker
+    and served with their sha256 as ETag. Rows from an older
+    layout_version are re-rendered on the next request.
+    """
+    invoice = models.OneToOneField(Invoice, on_delete=models.CASCADE, primary_key=True, related_name="pdf")
+    content = models.BinaryField()
+    sha256 = models.CharField(max_length=64)
+    size = models.PositiveIntegerField()
+    layout_version = models.PositiveSmallIntegerField(default=1)
+    rendered_at = models.DateTimeField(auto_now=True)
 
+    def __str__(self):
+        return f"PDF for invoice {self.invoice_id}"
 
-from django.db import models
+
+
+from django.db import models, transaction
 from django.conf import settings
 
+from .helpers.reviews import apply_rating_delta
+
 class ProductReview(models.Model):
     product = models.ForeignKey( "AdminApp.Product",  on_delete=models.CASCADE, related_name="reviews")
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -201,6 +258,152 @@ class ProductReview(models.Model):
 
     class Meta:
         unique_together = ("product", "user")
+        indexes = [
+            # a product's review tab: WHERE product_id = ? ORDER BY created_at DESC, id DESC
+            models.Index(fields=["product", "-created_at", "-id"], name="review_product_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product} - {self.rating}"
+
+    def save(self, *args, **kwargs):
+        # review row + product aggregates (UserApp/helpers/reviews.py) commit together
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding:
+                previous = (
+                    ProductReview.objects.select_for_update()
+                    .filter(pk=self.pk).values_list("product_id", "rating").first()
+                )
+            super().save(*args, **kwargs)
+
+            if previous is None:
+                apply_rating_delta(self.product_id, added=self.rating)
+            elif previous[0] != self.product_id:
+                apply_rating_delta(previous[0], removed=previous[1])
+                apply_rating_delta(self.product_id, added=self.rating)
+            else:
+                apply_rating_delta(self.product_id, added=self.rating, removed=previous[1])
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            # the stored rating of a row this call really deletes: a concurrent
+            # delete of the same review waits here, then finds nothing to remove
+            stored = (
+                ProductReview.objects.select_for_update()
+                .filter(pk=self.pk).values_list("product_id", "rating").first()
+            )
+            result = super().delete(*args, **kwargs)
+            if stored is not None and result[1].get(self._meta.label):
+                apply_rating_delta(stored[0], removed=stored[1])
+        return result
+
+class MarketDataSnapshot(models.Model):
+    """
+    Last known good value of an external market data feed
+    (see UserApp.helpers.market_data.MarketDataSource).
+    """
+    key = models.CharField(max_length=100, unique=True)
+    value = models.JSONField()
+    fetched_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.key} @ {self.fetched_at}"
+
+
+from django.utils import timezone
+
+
+class EmailOutbox(models.Model):
+    """
+    Durable queue of outgoing emails. Requests only insert rows
+    (UserApp.helpers.outbox.enqueue_email); the Celery worker
+    (UserApp.tasks.send_email_outbox) delivers them in batches with retries.
+    """
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+
+    STATUS_CHOICES = (
+        (PENDING, "Pending"),
+        (SENDING, "Sending"),
+        (SENT, "Sent"),
+        (FAILED, "Failed"),
+    )
+
+    KIND_CHOICES = (
+        ("verification", "Email verification"),
+        ("password_reset", "Password reset"),
+        ("monitoring", "Monitoring activation"),
+        ("other", "Other"),
+    )
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES, default="other")
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+
+    # same key + still pending -> the newer request replaces the queued one
+    dedupe_key = models.CharField(max_length=100, blank=True, default="")
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="outbox_status_due_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dedupe_key"],
+                condition=models.Q(status="pending") & ~models.Q(dedupe_key=""),
+                name="outbox_pending_dedupe_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} -> {self.to_email} ({self.status})"
+
+
+class StripeEvent(models.Model):
+    """
+    Raw Stripe webhook event, recorded before any fulfilment.
+    The unique event_id makes Stripe's retries (and concurrent deliveries)
+    no-ops; UserApp.tasks.process_stripe_event fulfils each event once.
+    """
+    RECEIVED = "received"
+    PROCESSED = "processed"
+    FAILED = "failed"
+    IGNORED = "ignored"
+
+    STATUS_CHOICES = (
+        (RECEIVED, "Received"),
+        (PROCESSED, "Processed"),
+        (FAILED, "Failed"),
+        (IGNORED, "Ignored"),
+    )
+
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=RECEIVED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "received_at"], name="stripe_event_status_idx"),
+        ]
 
     def __str__(self):
-        return f"{self.product} - {self.rating}"
\ No newline at end of file
+        return f"{self.event_type} {self.event_id} ({self.status})"
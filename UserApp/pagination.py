@@ -0,0 +1,217 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+# ---------------- KEYSET (CURSOR) PAGINATION -----------------
+
+class KeysetPagination(BasePagination):
+    """
+    Seek-based pagination shared by the catalog and the admin lists.
+
+    The page position is the (ordering fields..., id) tuple of the last row
+    sent, so every page is a `WHERE (...) < (...) LIMIT n` range scan on the
+    ordering index instead of an OFFSET that grows with the page number.
+
+    The ordering is read from the queryset, so it follows `OrderingFilter`
+    on generic views and the explicit `order_by()` in function views.
+
+    Response: { "next": <url or null>, "results": [...] }
+    """
+
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+    default_ordering = ("-created_at", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.keys = self.get_keys(queryset)
+        self.key_fields = [self._key_field(queryset, name) for name, _, _ in self.keys]
+
+        queryset = queryset.order_by(*[self._order_expression(key) for key in self.keys])
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self._seek_filter(position))
+
+        # fetch one extra row to know whether there is a next page (no COUNT)
+        rows = list(queryset[: self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    # ---------- ordering ----------
+
+    def get_keys(self, queryset):
+        """
+        Returns [(field_name, descending, nullable), ...] ending with the
+        primary key as a unique tie-breaker.
+        """
+        ordering = [f for f in queryset.query.order_by if isinstance(f, str)]
+        if not ordering:
+            ordering = list(queryset.model._meta.ordering or self.default_ordering)
+
+        pk_name = queryset.model._meta.pk.name
+        keys = []
+        for field in ordering:
+            descending = field.startswith("-")
+            name = field.lstrip("-")
+            if name == "pk":
+                name = pk_name
+            keys.append((name, descending, self._is_nullable(queryset.model, name)))
+
+        if pk_name not in [name for name, _, _ in keys]:
+            keys.append((pk_name, keys[-1][1] if keys else True, False))
+        return keys
+
+    def _is_nullable(self, model, name):
+        try:
+            return model._meta.get_field(name).null
+        except FieldDoesNotExist:
+            # annotations (e.g. search rank) - be safe and handle NULLs
+            return True
+
+    def _key_field(self, queryset, name):
+        """Model field (or annotation output field) a key is compared on."""
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        model = queryset.model
+        *path, last = name.split("__")
+        try:
+            for part in path:
+                model = model._meta.get_field(part).related_model
+            return model._meta.get_field(last)
+        except (AttributeError, FieldDoesNotExist):
+            return None
+
+    def _order_expression(self, key):
+        name, descending, nullable = key
+        if not nullable:
+            # plain string keeps the default NULLS ordering so a btree index matches
+            return f"-{name}" if descending else name
+        # NULLs always sort last, whatever the direction, so the seek filter stays simple
+        return F(name).desc(nulls_last=True) if descending else F(name).asc(nulls_last=True)
+
+    def _seek_filter(self, position):
+        """
+        Rows strictly after `position` in (k1, k2, ..., id) order:
+            k1 > v1 OR (k1 = v1 AND k2 > v2) OR ...
+        """
+        branches = []
+        equal = Q()
+
+        for (name, descending, nullable), value in zip(self.keys, position):
+            if value is None:
+                # NULLs are last, so nothing sorts after a NULL on this key
+                after = None
+                same = Q(**{f"{name}__isnull": True})
+            else:
+                after = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+                if nullable:
+                    after |= Q(**{f"{name}__isnull": True})
+                same = Q(**{name: value})
+
+            if after is not None:
+                branches.append(equal & after)
+            equal &= same
+
+        if not branches:
+            return Q(pk__in=[])
+
+        seek = reduce(or_, branches)
+
+        # redundant bound on the leading key lets the database range-scan its index
+        name, descending, nullable = self.keys[0]
+        if position[0] is not None and not nullable:
+            seek &= Q(**{f"{name}__{'lte' if descending else 'gte'}": position[0]})
+        return seek
+
+    # ---------- cursor encoding ----------
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        position = [self._encode_value(self._read_value(last, name)) for name, _, _ in self.keys]
+        cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, cursor
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or len(position) != len(self.keys):
+            raise NotFound(self.invalid_cursor_message)
+
+        # a tampered cursor must not reach the WHERE clause with the wrong types
+        try:
+            return [
+                value if value is None or field is None else field.to_python(value)
+                for field, value in zip(self.key_fields, position)
+            ]
+        except (ValidationError, TypeError, ValueError, ArithmeticError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _read_value(self, obj, name):
+        value = obj
+        for part in name.split("__"):
+            value = getattr(value, part, None)
+            if value is None:
+                return None
+        return value
+
+    def _encode_value(self, value):
+        # full precision - a truncated timestamp would skip or repeat rows
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
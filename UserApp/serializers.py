@@ -33,10 +33,23 @@ class RegisterSerializer(serializers.ModelSerializer):
 from .models import CartItem, Invoice, Order, OrderItem
 from AdminApp.models import Product
 
+
+def resolve_invoice_id(obj, purchase_type):
+    # list views annotate invoice_pk (utils.with_invoice_id); fall back to a lookup
+    if hasattr(obj, "invoice_pk"):
+        return obj.invoice_pk
+
+    invoice = Invoice.objects.filter(
+        user_id=obj.user_id,              # 🔐 IMPORTANT
+        purchase_type=purchase_type,
+        related_id=obj.id
+    ).only("id").first()
+    return invoice.id if invoice else None
+
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ["search_vector"]
 
 
 
@@ -71,6 +84,7 @@ from .models import Rental
 
 class RentalSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source="product.model_name", read_only=True)
+    bundle_name = serializers.CharField(source="bundle.name", read_only=True)
     calculated_fee = serializers.SerializerMethodField()
     invoice_id = serializers.SerializerMethodField()
 
@@ -85,12 +99,7 @@ class RentalSerializer(serializers.ModelSerializer):
         except Exception:
             return None
     def get_invoice_id(self, obj):
-        invoice = Invoice.objects.filter(
-            user=obj.user,              # 🔐 IMPORTANT
-            purchase_type="rent",
-            related_id=obj.id
-        ).first()
-        return invoice.id if invoice else None
+        return resolve_invoice_id(obj, "rent")
 
 from django.contrib.auth import get_user_model
 
@@ -127,12 +136,7 @@ class HostingRequestSerializer(serializers.ModelSerializer):
         fields = "__all__"
    
     def get_invoice_id(self, obj):
-        invoice = Invoice.objects.filter(
-            user=obj.user,
-            purchase_type="hosting",
-            related_id=obj.id
-        ).first()
-        return invoice.id if invoice else None
+        return resolve_invoice_id(obj, "hosting")
 
 class UserOrderItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source="product.model_name", read_only=True)
@@ -167,12 +171,7 @@ class UserOrderSerializer(serializers.ModelSerializer):
             "invoice_id"
         ]
     def get_invoice_id(self, obj):
-        invoice = Invoice.objects.filter(
-            user=obj.user,              # 🔐 IMPORTANT
-            purchase_type="buy",
-            related_id=obj.id
-        ).first()
-        return invoice.id if invoice else None
+        return resolve_invoice_id(obj, "buy")
 
 
 
@@ -204,6 +203,11 @@ class ProductReviewSerializer(serializers.ModelSerializer):
     def get_user_name(self, obj):
         return obj.user.username if obj.user else None
 
+    def validate_rating(self, value):
+        if not 1 <= value <= 5:
+            raise serializers.ValidationError("Rating must be between 1 and 5.")
+        return value
+
 
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
@@ -227,3 +231,31 @@ class ResendVerificationSerializer(serializers.Serializer):
 
         self.context["user"] = user
         return value
+
+
+import math
+
+MAX_GRID_VALUES = 20
+MAX_BATCH_PRODUCTS = 1000
+
+
+class FiniteFloatField(serializers.FloatField):
+    """FloatField that also rejects NaN / Infinity (not valid JSON on the way out)."""
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        if not math.isfinite(value):
+            self.fail("invalid")
+        return value
+
+
+class BatchProfitabilityRequestSerializer(serializers.Serializer):
+    product_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False, max_length=MAX_BATCH_PRODUCTS
+    )
+    electricity_costs = serializers.ListField(
+        child=FiniteFloatField(min_value=0), required=False, max_length=MAX_GRID_VALUES
+    )
+    miner_counts = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False, max_length=MAX_GRID_VALUES
+    )
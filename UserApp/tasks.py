@@ -0,0 +1,47 @@
+from celery import shared_task
+
+from .helpers.fulfilment import pending_stripe_events, process_stripe_event
+from .helpers.invoices import store_invoice_pdf, unrendered_invoices
+from .helpers.outbox import BATCH_SIZE, deliver_batch
+
+
+@shared_task(ignore_result=True)
+def send_email_outbox():
+    """
+    Send one batch of due outbox emails; re-queue while batches come back
+    full and the provider still accepts mail (an outage waits for the beat).
+    """
+    sent, failed = deliver_batch(BATCH_SIZE)
+    if sent and sent + failed == BATCH_SIZE:
+        send_email_outbox.delay()
+    return sent, failed
+
+
+@shared_task(ignore_result=True)
+def fulfil_stripe_event(event_pk):
+    """Fulfil one recorded Stripe event (no-op if already processed)."""
+    return process_stripe_event(event_pk)
+
+
+@shared_task(ignore_result=True)
+def sweep_stripe_events():
+    """Retry failed events and those whose enqueue-time kick was lost."""
+    for event_pk in list(pending_stripe_events()[:100]):
+        process_stripe_event(event_pk)
+
+
+@shared_task(ignore_result=True)
+def render_invoice(invoice_pk):
+    """Pre-render one invoice PDF (kicked after fulfilment commits)."""
+    from .models import Invoice
+
+    invoice = Invoice.objects.select_related("user").filter(pk=invoice_pk).first()
+    if invoice is not None:
+        store_invoice_pdf(invoice)
+
+
+@shared_task(ignore_result=True)
+def render_missing_invoices():
+    """Render invoices whose kick was lost or whose layout version is outdated."""
+    for invoice in unrendered_invoices()[:100]:
+        store_invoice_pdf(invoice)
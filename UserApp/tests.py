@@ -1,3 +1,1441 @@
-from django.test import TestCase
+import base64
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import re
+import runpy
+import time
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import F
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from AdminApp.models import BundleItem, BundleOffer, Product
+from .helpers import cache as shared_cache
+from .helpers.asic_index import reset_asic_index
+from .helpers.cache import NamespacedCache
+from .helpers.market_data import MarketDataSource, market_data_cache
+from .helpers.mining import (
+    DEFAULT_ELECTRICITY_COST, btc_price_source, calculate_profitability, refresh_product_profitability,
+    whattomine_source,
+)
+from .helpers.fulfilment import fulfil_payment_intent, process_stripe_event
+from .helpers.invoices import INVOICE_LAYOUTS, render_invoice_pdf, store_invoice_pdf, unrendered_invoices
+from .management.commands.benchmark_invoices import sample_invoice
+from .helpers.outbox import MAX_ATTEMPTS, deliver_batch, enqueue_email
+from .helpers.reviews import reconcile_rating_aggregates
+from .helpers.units import parse_efficiency_j_th, parse_hashrate_th, parse_power_watts
+from .helpers.network import (
+    DEFAULT_NETWORK, FixtureNetworkProvider, WhatToMineNetworkProvider, network_for, network_stats_source,
+    parse_coins,
+)
+from .pagination import KeysetPagination
+from .utils import checkout_snapshot, get_cart_items, get_cart_totals
+from .models import (
+    CartItem, EmailOutbox, HostingRequest, Invoice, InvoicePDF, Order, OrderItem, ProductReview, Rental,
+    StripeEvent,
+)
+
+User = get_user_model()
+
+
+def make_product(index, **extra):
+    data = {
+        "model_name": f"Miner {index}",
+        "description": "test miner",
+        "minable_coins": "BTC",
+        "hashrate": "100 TH/s",
+        "power": "3000",
+        "algorithm": "SHA-256",
+        "price": "1000.00",
+        "hosting_fee_per_kw": "100.00",
+    }
+    data.update(extra)
+    return Product.objects.create(**data)
+
+
+# ---------------- CART QUERY COUNTS -----------------
+
+class CartFixtureMixin:
+    """A logged-in buyer and fill_cart(lines): products and bundles alternating."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="buyer", email="buyer@example.com", password="pass", is_active=True
+        )
+        self.client.force_authenticate(self.user)
+
+    def fill_cart(self, lines):
+        CartItem.objects.filter(user=self.user).delete()
+
+        for index in range(lines):
+            if index % 2:
+                bundle = BundleOffer.objects.create(
+                    name=f"Bundle {index}", price="5000.00", hosting_fee_per_kw="90.00"
+                )
+                BundleItem.objects.create(bundle=bundle, product=make_product(f"b{index}"), quantity=2)
+                CartItem.objects.create(user=self.user, bundle=bundle, quantity=1)
+            else:
+                CartItem.objects.create(user=self.user, product=make_product(index), quantity=2)
+
+
+class CartQueryCountTests(CartFixtureMixin, APITestCase):
+    """
+    Every cart read path must cost the same number of queries for a
+    1-line cart and a 20-line cart (no per-item product / bundle loads).
+    """
+
+    def count_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data, format="json")
+        self.assertLess(response.status_code, 300, response.content)
+        return len(ctx.captured_queries)
+
+    def assertConstantQueries(self, method, url, data=None):
+        self.fill_cart(1)
+        small = self.count_queries(method, url, data)
+
+        self.fill_cart(20)
+        large = self.count_queries(method, url, data)
+
+        self.assertEqual(small, large, f"{url}: {small} queries for 1 line, {large} for 20")
+
+    def test_cart_list(self):
+        self.assertConstantQueries("get", "/api/user/cart/")
+
+    def test_cart_total(self):
+        self.assertConstantQueries("get", "/api/user/cart/total/")
+
+    def test_checkout(self):
+        self.assertConstantQueries("get", "/api/user/checkout/")
+
+    def test_create_hosting_request(self):
+        self.assertConstantQueries(
+            "post", "/api/user/hosting/create/", {"phone": "123", "hosting_location": "US"}
+        )
+
+
+# ---------------- CART TOTALS -----------------
+
+class CartTotalTests(CartFixtureMixin, APITestCase):
+    """get_cart_totals agrees, to the cent, with pricing each cart line in Python."""
+
+    def setUp(self):
+        super().setUp()
+        lines = [("1999.99", 15, 3), ("349.95", 7, 2), ("0.10", 33, 1), ("1000.00", 0, 5)]
+        for index, (price, discount, quantity) in enumerate(lines):
+            product = make_product(index, price=price, discount_percentage=discount)
+            CartItem.objects.create(user=self.user, product=product, quantity=quantity)
+
+        bundle = BundleOffer.objects.create(name="Bundle", price="5000.00", hosting_fee_per_kw="90.00")
+        BundleItem.objects.create(bundle=bundle, product=make_product("b"), quantity=2)
+        CartItem.objects.create(user=self.user, bundle=bundle, quantity=2)
+
+    def per_item_totals(self):
+        """The per-line loop get_cart_totals replaced, in Decimal and with discounts."""
+        subtotal = total = Decimal("0.00")
+        float_subtotal = 0
+        for item in get_cart_items(self.user):
+            if item.product:
+                subtotal += item.product.price * item.quantity
+                total += item.product.final_price * item.quantity
+                float_subtotal += float(item.product.price) * item.quantity
+            elif item.bundle:
+                subtotal += item.bundle.price * item.quantity
+                total += item.bundle.price * item.quantity
+                float_subtotal += float(item.bundle.price) * item.quantity
+        cents = Decimal("0.01")
+        return subtotal.quantize(cents), total.quantize(cents), float_subtotal
+
+    def test_matches_per_item_loop(self):
+        subtotal, total, float_subtotal = self.per_item_totals()
+        totals = get_cart_totals(self.user)
+
+        self.assertEqual((totals["subtotal"], totals["total"]), (subtotal, total))
+        self.assertEqual((totals["subtotal"], totals["total"]), (Decimal("21699.97"), Decimal("20750.95")))
+        self.assertEqual(totals["discount"], subtotal - total)
+        # the old float loop charged the list price
+        self.assertEqual(totals["subtotal"], Decimal(str(round(float_subtotal, 2))))
+        self.assertEqual(totals["device_count"], 13)
+        self.assertEqual(totals["breakdown"], {
+            "product": {"subtotal": Decimal("11699.97"), "total": Decimal("10750.95"), "quantity": 11},
+            "bundle": {"subtotal": Decimal("10000.00"), "total": Decimal("10000.00"), "quantity": 2},
+        })
+        for value in (totals["subtotal"], totals["discount"], totals["total"]):
+            self.assertIsInstance(value, Decimal)
+            self.assertEqual(value.as_tuple().exponent, -2)
+
+    def test_empty_cart(self):
+        CartItem.objects.filter(user=self.user).delete()
+        totals = get_cart_totals(self.user)
+
+        self.assertEqual(
+            (totals["subtotal"], totals["discount"], totals["total"], totals["device_count"]),
+            (Decimal("0.00"), Decimal("0.00"), Decimal("0.00"), 0),
+        )
+
+    def test_total_and_checkout_views(self):
+        total = self.client.get("/api/user/cart/total/").data
+        self.assertEqual((total["total_price"], total["discount"]), (Decimal("20750.95"), Decimal("949.02")))
+
+        breakup = self.client.get("/api/user/checkout/").data["price_breakup"]
+        self.assertEqual(breakup["tax"], Decimal("1037.55"))
+        self.assertEqual(breakup["final_total"], Decimal("21788.50"))
+
+
+# ---------------- KEYSET PAGINATION -----------------
+
+class KeysetWalkMixin:
+
+    def walk(self, url, max_pages=20):
+        ids = []
+        while url:
+            max_pages -= 1
+            self.assertGreaterEqual(max_pages, 0, "pagination does not terminate")
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [product["id"] for product in response.data["results"]]
+            url = response.data["next"]
+        return ids
+
+
+class KeysetPaginationTests(KeysetWalkMixin, APITestCase):
+    """Every ordering walks each product exactly once, in order, ties and NULLs included."""
+
+    def setUp(self):
+        # (price, daily profit): duplicated prices, NULL and duplicated profits
+        rows = [("900.00", 12.5), ("900.00", None), ("1000.00", 3.0), ("1200.50", 12.5),
+                ("800.00", None), ("1000.00", -1.0), ("900.00", 7.0)]
+        self.products = [make_product(index, price=price) for index, (price, _) in enumerate(rows)]
+        for product, (_, profit) in zip(self.products, rows):
+            Product.objects.filter(pk=product.pk).update(daily_profit_usd=profit)
+
+        # three products created in the same instant
+        tied = timezone.now()
+        Product.objects.filter(pk__in=[product.pk for product in self.products[2:5]]).update(created_at=tied)
+        for product in self.products:
+            product.refresh_from_db()
+
+    def expected(self, key, descending):
+        # NULLs last in either direction, then id in the direction of the key
+        present = sorted(
+            (product for product in self.products if key(product) is not None),
+            key=lambda product: (key(product), product.id), reverse=descending,
+        )
+        missing = sorted(
+            (product for product in self.products if key(product) is None),
+            key=lambda product: product.id, reverse=descending,
+        )
+        return [product.id for product in present + missing]
+
+    def test_default_ordering(self):
+        self.assertEqual(
+            self.walk("/api/user/products/?page_size=2"),
+            self.expected(lambda product: product.created_at, True),
+        )
+
+    def test_decimal_key(self):
+        for ordering, descending in (("price", False), ("-price", True)):
+            self.assertEqual(
+                self.walk(f"/api/user/products/?ordering={ordering}&page_size=2"),
+                self.expected(lambda product: product.price, descending),
+                ordering,
+            )
+
+    def test_nullable_key(self):
+        for ordering, descending in (("daily_profit_usd", False), ("-daily_profit_usd", True)):
+            for page_size in (1, 2, 3):
+                self.assertEqual(
+                    self.walk(f"/api/user/products/?ordering={ordering}&page_size={page_size}"),
+                    self.expected(lambda product: product.daily_profit_usd, descending),
+                    (ordering, page_size),
+                )
+
+    def test_annotated_key(self):
+        queryset = Product.objects.annotate(
+            profit_per_kw=F("daily_profit_usd") * 1000 / F("power_watts")
+        ).order_by("-profit_per_kw")
+
+        ids, cursor = [], None
+        for _ in range(10):
+            params = {"page_size": 2, **({"cursor": cursor} if cursor else {})}
+            paginator = KeysetPagination()
+            page = paginator.paginate_queryset(queryset, Request(APIRequestFactory().get("/", params)))
+            ids += [product.id for product in page]
+            next_link = paginator.get_next_link()
+            if next_link is None:
+                break
+            cursor = parse_qs(urlsplit(next_link).query)["cursor"][0]
+
+        # power is the same everywhere, so the annotation orders like the profit
+        self.assertEqual(ids, self.expected(lambda product: product.daily_profit_usd, True))
+
+    def test_cursor_round_trip(self):
+        response = self.client.get("/api/user/products/?page_size=3")
+        last = Product.objects.get(pk=response.data["results"][-1]["id"])
+
+        cursor = parse_qs(urlsplit(response.data["next"]).query)["cursor"][0]
+        position = json.loads(base64.urlsafe_b64decode(cursor))
+        # full-precision timestamp + id of the last row sent
+        self.assertEqual(position, [last.created_at.isoformat(), last.id])
+        self.assertEqual(datetime.fromisoformat(position[0]), last.created_at)
+
+    def test_invalid_cursor(self):
+        def encode(position):
+            return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+        for query in (
+            {"cursor": "not-base64!"},
+            {"cursor": encode(["only one"])},
+            # decodes, but the values do not fit the key fields
+            {"cursor": encode(["garbage", 1])},
+            {"cursor": encode([timezone.now().isoformat(), "x"])},
+            {"cursor": encode([timezone.now().isoformat(), [1]])},
+            {"cursor": encode(["abc", 1]), "ordering": "price"},
+            {"cursor": encode([{"a": 1}, 1]), "ordering": "price"},
+            {"cursor": encode(["abc", 1]), "ordering": "-daily_profit_usd"},
+            {"cursor": encode(["abc", 1]), "q": "miner"},
+        ):
+            with self.subTest(query=query):
+                response = self.client.get("/api/user/products/", query)
+                self.assertEqual(response.status_code, 404)
+
+        # a genuine cursor still works after the type check
+        first = self.client.get("/api/user/products/", {"page_size": 2, "ordering": "price"})
+        second = self.client.get(first.data["next"])
+        self.assertEqual(second.status_code, 200)
+
+
+# ---------------- SPEC UNITS -----------------
+
+class SpecUnitTests(APITestCase):
+    """Free-text hashrate / power / efficiency -> TH/s, W and J/TH."""
+
+    def assertParsed(self, parse, cases):
+        for text, expected in cases:
+            with self.subTest(text=text):
+                self.assertEqual(parse(text), expected)
+
+    def test_hashrate(self):
+        self.assertParsed(parse_hashrate_th, [
+            ("120 TH/s", 120.0),
+            ("120TH", 120.0),
+            ("110 Th/s", 110.0),
+            ("200 THps", 200.0),
+            ("950 GH/s", 0.95),
+            ("500 MH/s", 0.0005),
+            ("1.2 PH/s", 1200.0),
+            ("2 EH/s", 2000000.0),
+            ("1,250 GH/s", 1.25),
+            ("13,5 TH/s", 13.5),
+            ("95 TH/s ±3%", 95.0),
+            ("100", 100.0),             # bare number: TH/s
+            (104.5, 104.5),
+            ("fast", None),
+            ("", None),
+            (None, None),
+        ])
+
+    def test_power(self):
+        self.assertParsed(parse_power_watts, [
+            ("3250W", 3250.0),
+            ("3250 w", 3250.0),
+            ("3.2 kW", 3200.0),
+            ("3,2 kW", 3200.0),
+            ("1,250 W", 1250.0),
+            ("3010 W ±10%", 3010.0),
+            ("3000", 3000.0),           # bare number: watts
+            (3000, 3000.0),
+            ("n/a", None),
+            ("", None),
+            (None, None),
+        ])
+
+    def test_efficiency(self):
+        self.assertParsed(parse_efficiency_j_th, [
+            ("29.5 J/TH", 29.5),
+            ("29.5 W/TH", 29.5),
+            ("29.5j/th", 29.5),
+            ("0.03 J/GH", 30.0),
+            ("0.0295 J / GH", 29.5),
+            ("21", 21.0),               # bare number: J/TH
+            ("unknown", None),
+            ("", None),
+            (None, None),
+        ])
+
+    def test_columns_and_range_filters(self):
+        small = make_product(1, hashrate="950 GH/s", power="1.5 kW")
+        large = make_product(2, hashrate="1.2 PH/s", power="3,2 kW", efficiency="0.028 J/GH")
+
+        self.assertEqual((small.hashrate_th, small.power_watts), (0.95, 1500.0))
+        self.assertEqual(small.efficiency_j_th, round(1500.0 / 0.95, 2))   # derived when blank
+        self.assertEqual((large.hashrate_th, large.power_watts, large.efficiency_j_th), (1200.0, 3200.0, 28.0))
+
+        small.hashrate = "1 TH/s"
+        small.save(update_fields=["hashrate"])
+        small.refresh_from_db()
+        self.assertEqual((small.hashrate_th, small.efficiency_j_th), (1.0, 1500.0))
+
+        for query, expected in [
+            ("min_hashrate=1000", [large.id]),
+            ("max_power=2000", [small.id]),
+            ("max_efficiency=30", [large.id]),
+            ("min_hashrate=0.5&max_power=5000", [large.id, small.id]),
+        ]:
+            with self.subTest(query=query):
+                response = self.client.get(f"/api/user/products/?{query}")
+                self.assertEqual([product["id"] for product in response.data["results"]], expected)
+
+
+# ---------------- PRODUCT SEARCH -----------------
+
+class ProductSearchPaginationTests(KeysetWalkMixin, APITestCase):
+    """Ranked ?q= pages neither repeat nor skip products, including on tied ranks."""
+
+    def setUp(self):
+        # identical text -> identical rank; the rest rank higher via the description
+        self.tied = [make_product(f"tied {index}", model_name="Antminer S19") for index in range(5)]
+        self.ranked = [
+            make_product(f"ranked {index}", model_name="Antminer S21", description="antminer " * (index + 1))
+            for index in range(3)
+        ]
+        make_product("other", model_name="Whatsminer M50")
+
+    def test_pages_with_tied_ranks(self):
+        ids = self.walk("/api/user/products/?q=antminer&page_size=2")
+
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), {product.id for product in self.tied + self.ranked})
+        # ties are broken by -id
+        tied_ids = [product_id for product_id in ids if product_id in {p.id for p in self.tied}]
+        self.assertEqual(tied_ids, sorted(tied_ids, reverse=True))
+
+
+# ---------------- ORDER / RENTAL / HOSTING HISTORY -----------------
+
+class HistoryQueryCountTests(APITestCase):
+    """invoice_id is resolved in bulk, not with one Invoice query per row."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="owner", email="owner@example.com", password="pass", is_active=True
+        )
+        self.client.force_authenticate(self.user)
+        self.product = make_product(1)
+
+    def add_history(self, count):
+        for _ in range(count):
+            order = Order.objects.create(user=self.user, total_amount="10.00", stripe_payment_intent="pi")
+            OrderItem.objects.create(order=order, product=self.product, quantity=1)
+            rental = Rental.objects.create(
+                user=self.user, product=self.product, amount_paid="10.00",
+                duration_days=30, end_date=timezone.now(),
+            )
+            hosting = HostingRequest.objects.create(
+                user=self.user, phone="1", hosting_location="US", items=[],
+            )
+            for purchase_type, related in (("buy", order), ("rent", rental), ("hosting", hosting)):
+                Invoice.objects.create(
+                    user=self.user,
+                    invoice_number=f"INV-{purchase_type}-{related.id}",
+                    purchase_type=purchase_type,
+                    related_id=related.id,
+                    amount="10.00",
+                    stripe_payment_intent="pi",
+                    invoice_data={},
+                )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(row["invoice_id"] for row in response.data))
+        return len(ctx.captured_queries)
+
+    def test_history_pages_are_constant(self):
+        urls = ["/api/user/orders/my-orders/", "/api/user/my-rentals/", "/api/user/my-hosting-requests/"]
+
+        self.add_history(1)
+        small = [self.count_queries(url) for url in urls]
+
+        self.add_history(10)
+        large = [self.count_queries(url) for url in urls]
+
+        self.assertEqual(small, large)
+
+
+# ---------------- SHARED CACHE -----------------
+
+UNREACHABLE_REDIS = {
+    "default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": "redis://127.0.0.1:1/0",
+        "OPTIONS": {"SOCKET_CONNECT_TIMEOUT": 0.2, "SOCKET_TIMEOUT": 0.2},
+    },
+    "local": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "unreachable-redis-local"},
+}
+
+
+class SharedCacheTests(APITestCase):
+    """Namespaced, versioned keys; a failing shared cache degrades to the local one."""
+
+    def setUp(self):
+        for alias in ("default", "local"):
+            caches[alias].clear()
+        # the outage window is module state; never leak it into other tests
+        patcher = mock.patch.object(shared_cache, "_shared_down_until", 0.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_namespaced_versioned_keys(self):
+        cache = NamespacedCache("prices", version=1)
+        cache.set("btc", 95000, 60)
+
+        self.assertEqual(caches["default"].get("prices:v1:btc"), 95000)
+        self.assertIsNone(NamespacedCache("prices", version=2).get("btc"))
+        self.assertIsNone(NamespacedCache("other", version=1).get("btc"))
+
+        self.assertTrue(cache.add("lock", 1, 60))
+        self.assertFalse(cache.add("lock", 2, 60))
+        cache.delete("lock")
+        self.assertIsNone(cache.get("lock"))
+
+    def test_falls_back_to_local_and_retries_later(self):
+        cache = NamespacedCache("prices", version=1)
+        shared = caches["default"]
+
+        with mock.patch.object(shared, "set", side_effect=ConnectionError("redis down")) as shared_set, \
+                mock.patch.object(shared, "get", wraps=shared.get) as shared_get:
+            with self.assertLogs("UserApp.helpers.cache", "WARNING"):
+                cache.set("btc", 95000, 60)
+            self.assertEqual(caches["local"].get("prices:v1:btc"), 95000)
+
+            # inside the retry window the shared cache is not touched at all
+            self.assertEqual(cache.get("btc"), 95000)
+            self.assertEqual((shared_set.call_count, shared_get.call_count), (1, 0))
+
+            # after it, the shared cache is tried again
+            with mock.patch.object(
+                shared_cache.time, "monotonic",
+                return_value=time.monotonic() + shared_cache.SHARED_CACHE_RETRY_AFTER + 1,
+            ):
+                self.assertIsNone(cache.get("btc"))
+            self.assertEqual(shared_get.call_count, 1)
+
+    @override_settings(CACHES=UNREACHABLE_REDIS)
+    def test_unreachable_redis(self):
+        cache = NamespacedCache("prices", version=1)
+
+        with self.assertLogs("UserApp.helpers.cache", "WARNING"):
+            cache.set("btc", 95000, 60)
+        self.assertEqual(cache.get("btc"), 95000)
+        self.assertTrue(cache.add("lock", 1, 60))
+
+    def test_settings_switch_on_redis_url(self):
+        settings_file = str(Path(settings.BASE_DIR) / "Cryptonite" / "settings.py")
+        base_env = {"CELERY_BROKER_URL": "memory://"}
+
+        with mock.patch.dict(os.environ, {**base_env, "REDIS_URL": ""}):
+            local = runpy.run_path(settings_file)
+        self.assertEqual(local["CACHES"], local["LOCAL_CACHES"])
+
+        with mock.patch.dict(os.environ, {**base_env, "REDIS_URL": "redis://cache:6379/1"}):
+            shared = runpy.run_path(settings_file)
+        self.assertEqual(shared["CACHES"]["default"]["BACKEND"], "django_redis.cache.RedisCache")
+        self.assertEqual(shared["CACHES"]["default"]["LOCATION"], "redis://cache:6379/1")
+        self.assertEqual(shared["CACHES"]["local"], shared["LOCAL_CACHES"]["local"])
+
+
+# ---------------- MARKET DATA SOURCES -----------------
+
+class MarketDataSourceTests(APITestCase):
+    """Stale reads answer at once; refreshes are single-flight and back off on failure."""
+
+    def setUp(self):
+        for alias in ("default", "local"):
+            caches[alias].clear()
+        self.fetch = mock.Mock(return_value={"price": 1})
+        self.source = MarketDataSource("test-feed", self.fetch, ttl=60, refresh_ahead=10)
+
+    def store(self, value, age):
+        market_data_cache.set("test-feed", {"value": value, "fetched_at": time.time() - age}, 3600)
+
+    def test_stale_value_served_while_refresh_scheduled(self):
+        self.store({"price": 0}, age=55)      # inside the refresh-ahead window
+        with mock.patch.object(self.source, "refresh_in_background") as refresh:
+            self.assertEqual(self.source.get(), {"price": 0})
+        refresh.assert_called_once_with()
+
+        self.store({"price": 0}, age=5)
+        with mock.patch.object(self.source, "refresh_in_background") as refresh:
+            self.source.get()
+        refresh.assert_not_called()
+
+    def test_single_flight(self):
+        market_data_cache.add("test-feed:lock", 1, 60)     # another worker is fetching
+        self.assertIsNone(self.source.refresh())
+        self.fetch.assert_not_called()
+
+        market_data_cache.delete("test-feed:lock")
+        self.store({"price": 2}, age=1)                    # ... and has just finished
+        self.assertIsNone(self.source.refresh())
+        self.fetch.assert_not_called()
+
+    def test_value_stored_before_lock_released(self):
+        delete = market_data_cache.delete
+
+        def checked_delete(key):
+            if key == "test-feed:lock":
+                self.assertEqual(market_data_cache.get("test-feed")["value"], {"price": 1})
+            return delete(key)
+
+        with mock.patch.object(market_data_cache, "delete", side_effect=checked_delete):
+            self.assertEqual(self.source.refresh(), {"price": 1})
+
+    def test_failure_backs_off(self):
+        self.fetch.side_effect = ConnectionError("upstream down")
+        with self.assertLogs("UserApp.helpers.market_data", "WARNING"):
+            self.assertIsNone(self.source.refresh())
+        self.assertIsNone(self.source.refresh())
+        self.assertEqual(self.fetch.call_count, 1)
+        self.assertIsNone(market_data_cache.get("test-feed:lock"))
+
+        with override_settings(MARKET_DATA_BACKGROUND_REFRESH=False):
+            self.assertIsNone(self.source.get())
+        self.assertEqual(self.fetch.call_count, 1)
+
+        # forced (refresh_market_data) ignores the backoff; success clears it
+        self.fetch.side_effect = None
+        self.assertEqual(self.source.refresh(force=True), {"price": 1})
+        self.assertIsNone(market_data_cache.get("test-feed:backoff"))
+
+
+# ---------------- NETWORK STATS -----------------
+
+@override_settings(
+    NETWORK_STATS_PROVIDER="UserApp.helpers.network.FixtureNetworkProvider",
+    MARKET_DATA_BACKGROUND_REFRESH=False,
+)
+class NetworkStatsTests(APITestCase):
+    """Profitability uses per-coin network stats from the (fixture) provider."""
+
+    def setUp(self):
+        for alias in ("default", "local"):
+            caches[alias].clear()
+        self.stats = FixtureNetworkProvider().fetch()
+
+        with mock.patch.object(btc_price_source, "fetch", return_value=60000.0):
+            btc_price_source.refresh()
+        network_stats_source.refresh()
+
+    def test_parse_coins(self):
+        self.assertEqual(parse_coins("btc, BCH / bsv"), ["BTC", "BCH", "BSV"])
+        self.assertEqual(parse_coins(""), [])
+
+    def test_network_for_coin_then_algorithm(self):
+        self.assertEqual(network_for("LTC/DOGE", "Scrypt", self.stats)["coin"], "LTC")
+        self.assertEqual(network_for("XYZ", "scrypt", self.stats)["coin"], "LTC")
+        self.assertEqual(network_for("XYZ", "Unknown", self.stats), DEFAULT_NETWORK)
+
+    def test_algorithm_fallback_ignores_feed_order(self):
+        # BCH listed first must not price an unlabelled SHA-256 miner
+        stats = {coin: self.stats[coin] for coin in ("BCH", "DOGE", "BTC", "LTC")}
+        self.assertEqual(network_for("", "SHA-256", stats)["coin"], "BTC")
+        self.assertEqual(network_for(None, "scrypt", stats)["coin"], "LTC")     # largest hashrate
+
+        del stats["BTC"]
+        self.assertEqual(network_for("", "sha256", stats)["coin"], "BCH")
+
+    def test_whattomine_provider_reuses_cached_payload(self):
+        payload = {"coins": {
+            "Bitcoin": {"tag": "BTC", "algorithm": "SHA-256", "nethash": 6e20, "difficulty": 1e14,
+                        "block_reward": 3.125, "block_time": "600", "exchange_rate": 1},
+        }}
+        with mock.patch.object(whattomine_source, "fetch", return_value=payload):
+            whattomine_source.refresh()
+
+        with mock.patch("requests.get", side_effect=AssertionError("asic.json fetched twice")):
+            stats = WhatToMineNetworkProvider().fetch()
+        self.assertEqual(stats["BTC"]["network_hashrate"], 6e8)
+
+    def test_bitcoin_matches_default_network(self):
+        btc = network_for("BTC", "SHA-256", self.stats)
+        self.assertEqual(
+            calculate_profitability(100, 3000, 60000.0, network=btc),
+            calculate_profitability(100, 3000, 60000.0),
+        )
+
+    def test_endpoint_uses_product_coin(self):
+        product = make_product(1, minable_coins="LTC, DOGE", algorithm="Scrypt", hashrate="9.5 GH/s")
+
+        with mock.patch.object(btc_price_source, "fetch", side_effect=AssertionError("upstream call")):
+            response = self.client.post(
+                "/api/user/api/calculate-profitability/", {"product_id": product.id}, format="json"
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["network"]["coin"], "LTC")
+        self.assertEqual(
+            response.data["metrics"],
+            calculate_profitability(0.0095, 3000, 60000.0, network=network_for("LTC", "", self.stats)),
+        )
+        # stored ranking uses the same inputs
+        product.refresh_from_db()
+        self.assertEqual(product.daily_profit_usd, response.data["metrics"]["dailyProfit"])
+
+
+@override_settings(
+    NETWORK_STATS_PROVIDER="UserApp.helpers.network.FixtureNetworkProvider",
+    MARKET_DATA_BACKGROUND_REFRESH=False,
+)
+class ProfitRankingTests(APITestCase):
+    """daily_profit_usd follows every price tick and orders / filters the catalog."""
+
+    def setUp(self):
+        for alias in ("default", "local"):
+            caches[alias].clear()
+        self.products = [
+            make_product(0, hashrate="100 TH/s", power="3000"),
+            make_product(1, hashrate="200 TH/s", power="3500"),
+            make_product(2, hashrate="50 TH/s", power="3400"),
+            make_product(3, hashrate="unknown", power=""),
+        ]
+
+    def tick(self, price):
+        with mock.patch.object(btc_price_source, "fetch", return_value=price):
+            btc_price_source.refresh(force=True)
+
+    def stored(self):
+        return dict(Product.objects.values_list("id", "daily_profit_usd"))
+
+    def expected(self, price):
+        return {
+            product.id: None if product.hashrate_th is None else calculate_profitability(
+                product.hashrate_th, product.power_watts, price, electricity_cost=DEFAULT_ELECTRICITY_COST,
+            )["dailyProfit"]
+            for product in self.products
+        }
+
+    def test_refreshed_on_price_tick(self):
+        # no cached price yet: nothing to rank by
+        self.assertEqual(set(self.stored().values()), {None})
+
+        self.tick(60000.0)
+        self.assertEqual(self.stored(), self.expected(60000.0))
+        # unchanged price -> no rows written
+        self.assertEqual(refresh_product_profitability(60000.0), 0)
+
+        self.tick(90000.0)
+        self.assertEqual(self.stored(), self.expected(90000.0))
+
+        # save() of a single product uses the cached price, no upstream call
+        with mock.patch.object(btc_price_source, "fetch", side_effect=AssertionError("upstream call")):
+            product = make_product(4, hashrate="150 TH/s", power="3200")
+        self.assertEqual(
+            product.daily_profit_usd,
+            calculate_profitability(150.0, 3200.0, 90000.0, electricity_cost=DEFAULT_ELECTRICITY_COST)["dailyProfit"],
+        )
+
+    def test_recomputed_when_network_fields_change(self):
+        network_stats_source.refresh()
+        self.tick(60000.0)
+        product = Product.objects.get(pk=self.products[0].pk)
+        btc_profit = product.daily_profit_usd
+
+        product.minable_coins, product.algorithm = "LTC, DOGE", "Scrypt"
+        product.save(update_fields=["minable_coins", "algorithm"])
+        product.refresh_from_db()
+
+        ltc = network_for("LTC", "Scrypt", network_stats_source.cached())
+        self.assertNotEqual(product.daily_profit_usd, btc_profit)
+        self.assertEqual(
+            product.daily_profit_usd,
+            calculate_profitability(100.0, 3000.0, 60000.0, electricity_cost=DEFAULT_ELECTRICITY_COST,
+                                    network=ltc)["dailyProfit"],
+        )
+
+    def test_ordering_and_filter(self):
+        self.tick(60000.0)
+        profits = self.expected(60000.0)
+        ranked = sorted((product_id for product_id in profits if profits[product_id] is not None),
+                        key=profits.get, reverse=True)
+
+        response = self.client.get("/api/user/products/?ordering=-daily_profit_usd")
+        self.assertEqual([product["id"] for product in response.data["results"]], ranked + [self.products[3].id])
+
+        threshold = profits[self.products[0].id]
+        response = self.client.get(f"/api/user/products/?min_daily_profit={threshold}")
+        self.assertEqual(
+            {product["id"] for product in response.data["results"]},
+            {product_id for product_id in ranked if profits[product_id] >= threshold},
+        )
+
+
+@override_settings(
+    NETWORK_STATS_PROVIDER="UserApp.helpers.network.FixtureNetworkProvider",
+    MARKET_DATA_BACKGROUND_REFRESH=False,
+)
+class BatchProfitabilityTests(APITestCase):
+    """Bad bodies and filters are 400s, never 500s; a cut-off result says so."""
+
+    url = "/api/user/api/calculate-profitability/batch/"
+
+    def setUp(self):
+        for alias in ("default", "local"):
+            caches[alias].clear()
+        with mock.patch.object(btc_price_source, "fetch", return_value=60000.0):
+            btc_price_source.refresh()
+        self.products = [make_product(index) for index in range(3)]
+
+    def post(self, body, query=""):
+        return self.client.post(self.url + query, body, format="json")
+
+    def test_grid(self):
+        response = self.post({"electricity_costs": [0.05, 0.08], "miner_counts": [1, 10]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 3)
+        self.assertFalse(response.data["truncated"])
+        self.assertEqual(len(response.data["results"][0]["metrics"]["dailyProfit"]), 2)
+
+    def test_rejects_bad_body(self):
+        for body in (
+            {"product_ids": "1,2"},
+            {"product_ids": ["a"]},
+            {"electricity_costs": ["NaN"]},
+            {"electricity_costs": ["Infinity"]},
+            {"electricity_costs": [-0.1]},
+            {"miner_counts": [-1]},
+            {"miner_counts": [1] * 21},
+            {"product_ids": list(range(1, 1002))},
+        ):
+            with self.subTest(body=body):
+                self.assertEqual(self.post(body).status_code, 400)
+
+    def test_rejects_bad_filter(self):
+        response = self.post({}, "?min_hashrate=fast")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("min_hashrate", response.data)
+
+    def test_reports_truncation(self):
+        with mock.patch("UserApp.views.MAX_BATCH_PRODUCTS", 2):
+            response = self.post({})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["truncated"])
+        self.assertEqual([row["product_id"] for row in response.data["results"]],
+                         [product.id for product in self.products[:2]])
+
+
+# ---------------- EMAIL OUTBOX -----------------
+
+class EmailOutboxTests(APITestCase):
+    """Requests only queue emails; the worker sends, retries and dedupes."""
+
+    def register(self):
+        return self.client.post("/api/user/auth/register/", {
+            "username": "newbie",
+            "email": "newbie@example.com",
+            "password": "S3cure-pass!",
+            "password2": "S3cure-pass!",
+        }, format="json")
+
+    def resend(self):
+        return self.client.post(
+            "/api/user/auth/resend-verification/", {"email": "newbie@example.com"}, format="json"
+        )
+
+    def test_register_only_enqueues(self):
+        with mock.patch("django.core.mail.EmailMessage.send", side_effect=AssertionError("sent inline")):
+            self.assertEqual(self.register().status_code, 201)
+
+        self.assertEqual(len(mail.outbox), 0)
+        email = EmailOutbox.objects.get()
+        self.assertEqual((email.kind, email.status), ("verification", EmailOutbox.PENDING))
+
+        self.assertEqual(deliver_batch(), (1, 0))
+        self.assertEqual(mail.outbox[0].to, ["newbie@example.com"])
+        self.assertEqual(EmailOutbox.objects.get().status, EmailOutbox.SENT)
+
+    def test_repeat_verification_is_deduped(self):
+        self.register()
+        self.resend()
+        self.resend()
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutbox.PENDING).count(), 1)
+
+        deliver_batch()
+        self.resend()  # right after a send -> dropped
+        self.assertEqual(EmailOutbox.objects.count(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failures_back_off_then_give_up(self):
+        self.register()
+
+        with mock.patch("django.core.mail.EmailMessage.send", side_effect=ConnectionError("down")):
+            self.assertEqual(deliver_batch(), (0, 1))
+            email = EmailOutbox.objects.get()
+            self.assertEqual((email.status, email.attempts), (EmailOutbox.PENDING, 1))
+            self.assertGreater(email.next_attempt_at, timezone.now())
+            self.assertIn("down", email.last_error)
+
+            # not due yet
+            self.assertEqual(deliver_batch(), (0, 0))
+
+            for _ in range(MAX_ATTEMPTS - 1):
+                EmailOutbox.objects.update(next_attempt_at=timezone.now())
+                deliver_batch()
+
+        self.assertEqual(EmailOutbox.objects.get().status, EmailOutbox.FAILED)
+
+        admin = User.objects.create_superuser("admin", "admin@example.com", "pass")
+        self.client.force_authenticate(admin)
+        metrics = self.client.get("/api/admin/email-outbox/metrics/").data
+        self.assertEqual((metrics["failed"], metrics["pending"]), (1, 0))
+
+    def test_connection_failure_releases_batch(self):
+        self.register()
+        enqueue_email("other@example.com", "Hi", "body")
+
+        with mock.patch("UserApp.helpers.outbox.get_connection", side_effect=ConnectionError("smtp down")), \
+                self.assertLogs("UserApp.helpers.outbox", "WARNING"):
+            self.assertEqual(deliver_batch(), (0, 2))
+
+        for email in EmailOutbox.objects.all():
+            self.assertEqual((email.status, email.attempts), (EmailOutbox.PENDING, 1))
+            self.assertGreater(email.next_attempt_at, timezone.now())
+            self.assertIn("smtp down", email.last_error)
+
+        # counts toward MAX_ATTEMPTS like any other failure
+        EmailOutbox.objects.update(attempts=MAX_ATTEMPTS - 1, next_attempt_at=timezone.now())
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.open", side_effect=OSError("auth")), \
+                self.assertLogs("UserApp.helpers.outbox", "WARNING"):
+            self.assertEqual(deliver_batch(), (0, 2))
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutbox.FAILED).count(), 2)
+
+
+# ---------------- STRIPE WEBHOOK -----------------
+
+WEBHOOK_SECRET = "whsec_test"
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+class StripeWebhookTests(APITestCase):
+    """The webhook only records events; the worker fulfils each exactly once."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="payer", email="payer@example.com", password="pass", is_active=True
+        )
+        for index in range(3):
+            CartItem.objects.create(user=self.user, product=make_product(index), quantity=2)
+
+    def post_event(self, event_id="evt_1", intent_id="pi_1"):
+        payload = json.dumps({
+            "id": event_id,
+            "object": "event",
+            "type": "payment_intent.succeeded",
+            "data": {"object": {
+                "id": intent_id,
+                "object": "payment_intent",
+                "metadata": {"user_id": str(self.user.id), "purchase_type": "buy", "name": "A"},
+            }},
+        })
+        timestamp = int(time.time())
+        signature = hmac.new(
+            WEBHOOK_SECRET.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+        ).hexdigest()
+
+        return self.client.generic(
+            "POST", "/api/user/payments/webhook/", payload,
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=f"t={timestamp},v1={signature}",
+        )
+
+    def test_webhook_only_records(self):
+        self.assertEqual(self.post_event().status_code, 200)
+        self.assertEqual(self.post_event().status_code, 200)  # Stripe retry
+
+        self.assertEqual(StripeEvent.objects.get().status, StripeEvent.RECEIVED)
+        self.assertFalse(Order.objects.exists())
+
+    def test_fulfilled_exactly_once(self):
+        self.post_event()
+        event = StripeEvent.objects.get()
+
+        self.assertTrue(process_stripe_event(event.pk))
+        self.assertFalse(process_stripe_event(event.pk))
+
+        self.assertEqual(StripeEvent.objects.get().status, StripeEvent.PROCESSED)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OrderItem.objects.count(), 3)
+        self.assertEqual(Invoice.objects.count(), 1)
+        self.assertFalse(CartItem.objects.filter(user=self.user).exists())
+
+    def test_failure_rolls_back_and_stays_retryable(self):
+        self.post_event()
+        event = StripeEvent.objects.get()
+
+        with mock.patch("UserApp.helpers.fulfilment.Invoice.objects.create", side_effect=RuntimeError("boom")):
+            self.assertFalse(process_stripe_event(event.pk))
+
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), (StripeEvent.FAILED, 1))
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.filter(user=self.user).count(), 3)
+
+        self.assertTrue(process_stripe_event(event.pk))
+        self.assertEqual(Order.objects.count(), 1)
+
+
+@mock.patch("UserApp.views.stripe.PaymentIntent.create")
+class CheckoutSnapshotTests(APITestCase):
+    """A buy is fulfilled from the lines paid for, not the cart at webhook time."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="payer", email="payer@example.com", password="pass", is_active=True
+        )
+        self.client.force_authenticate(self.user)
+        self.products = [
+            make_product(index, price=price, discount_percentage=discount)
+            for index, (price, discount) in enumerate([("1999.99", 10), ("349.95", 0), ("500.00", 0)])
+        ]
+        self.bundle = BundleOffer.objects.create(name="Bundle", price="5000.00", hosting_fee_per_kw="90.00")
+        CartItem.objects.create(user=self.user, product=self.products[0], quantity=2)
+        CartItem.objects.create(user=self.user, product=self.products[1], quantity=1)
+        CartItem.objects.create(user=self.user, bundle=self.bundle, quantity=1)
+
+    def checkout(self, create):
+        create.return_value = mock.Mock(client_secret="secret")
+        response = self.client.post("/api/user/payments/create-intent/", {
+            "purchase_type": "buy", "address": {"name": "A", "line1": "1 Main St", "country": "US"},
+        }, format="json")
+        self.assertEqual(response.status_code, 200, response.data)
+        return {"id": "pi_1", **create.call_args.kwargs}
+
+    def test_cart_changes_after_payment(self, create):
+        intent = self.checkout(create)
+        self.assertEqual(intent["amount"], 894993)
+        for value in intent["metadata"].values():
+            self.assertIsInstance(value, str)
+            self.assertLessEqual(len(value), 500)
+
+        # after paying: one line removed, one quantity changed, one product added
+        CartItem.objects.filter(user=self.user, product=self.products[1]).delete()
+        CartItem.objects.filter(user=self.user, product=self.products[0]).update(quantity=5)
+        CartItem.objects.create(user=self.user, product=self.products[2], quantity=3)
+        Product.objects.filter(pk=self.products[0].pk).update(price="2500.00")
+
+        fulfil_payment_intent(intent)
+
+        order = Order.objects.get()
+        self.assertEqual(
+            list(order.items.order_by("id").values_list("product_id", "bundle_id", "quantity")),
+            [(self.products[0].id, None, 2), (self.products[1].id, None, 1), (None, self.bundle.id, 1)],
+        )
+        self.assertEqual(order.total_amount, Decimal("8949.93"))
+
+        invoice = Invoice.objects.get()
+        self.assertEqual(invoice.amount, order.total_amount)
+        self.assertEqual(invoice.invoice_data["subtotal"], "9349.93")
+        self.assertEqual(invoice.invoice_data["items"][0]["unit_price"], "1999.99")
+
+        # only the item added after checkout is left in the cart
+        self.assertEqual(
+            list(CartItem.objects.filter(user=self.user).values_list("product_id", "quantity")),
+            [(self.products[2].id, 3)],
+        )
+
+    def test_large_cart_spans_metadata_keys(self, create):
+        for index in range(60):
+            CartItem.objects.create(user=self.user, product=make_product(f"bulk {index}"), quantity=1)
+
+        intent = self.checkout(create)
+        metadata = intent["metadata"]
+        self.assertGreater(int(metadata["cart_lines"]), 1)
+        self.assertLessEqual(len(metadata), 50)
+
+        fulfil_payment_intent(intent)
+        self.assertEqual(OrderItem.objects.count(), 63)
+        self.assertFalse(CartItem.objects.filter(user=self.user).exists())
+
+
+# ---------------- FULFILMENT WRITES -----------------
+
+class FulfilmentQueryCountTests(CartFixtureMixin, APITestCase):
+    """Fulfilment writes in bulk: same query count for 1 and 20 cart lines."""
+
+    def count_fulfilment_queries(self, purchase_type):
+        intent = {
+            "id": f"pi_{purchase_type}",
+            "metadata": {"user_id": str(self.user.id), "purchase_type": purchase_type, "duration_days": "30"},
+        }
+        if purchase_type == "buy":
+            intent["metadata"].update(checkout_snapshot(self.user)[1])
+        with CaptureQueriesContext(connection) as ctx:
+            fulfil_payment_intent(intent)
+        self.assertFalse(CartItem.objects.filter(user=self.user).exists())
+        return len(ctx.captured_queries)
+
+    def assertConstantFulfilment(self, purchase_type):
+        self.fill_cart(2)       # a product and a bundle line
+        small = self.count_fulfilment_queries(purchase_type)
+
+        self.fill_cart(20)
+        large = self.count_fulfilment_queries(purchase_type)
+
+        self.assertEqual(small, large)
+
+    def test_buy(self):
+        self.assertConstantFulfilment("buy")
+        order = Order.objects.latest("id")
+        self.assertEqual(order.items.count(), 20)
+        self.assertEqual(Invoice.objects.get(related_id=order.id, purchase_type="buy").amount, order.total_amount)
+
+    def test_rent(self):
+        self.assertConstantFulfilment("rent")
+        self.assertEqual(Rental.objects.filter(bundle__isnull=False).count(), 1 + 10)
+
+        invoice = Invoice.objects.filter(purchase_type="rent").latest("id")
+        self.assertEqual(len(invoice.invoice_data["rentals"]), 20)
+        self.assertTrue(Rental.objects.filter(id=invoice.related_id).exists())
+
+    def test_failure_writes_nothing(self):
+        self.fill_cart(5)
+        with mock.patch("UserApp.helpers.fulfilment.Invoice.objects.create", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                self.count_fulfilment_queries("rent")
+
+        self.assertFalse(Rental.objects.exists())
+        self.assertEqual(CartItem.objects.filter(user=self.user).count(), 5)
+
+
+# ---------------- INVOICE PDFS -----------------
+
+class InvoicePDFTests(CartFixtureMixin, APITestCase):
+    """Invoices are rendered once after fulfilment and served with an ETag."""
+
+    def fulfil(self):
+        self.fill_cart(3)
+        intent = {"id": "pi_pdf", "metadata": {"user_id": str(self.user.id), "purchase_type": "buy"}}
+        with mock.patch("UserApp.helpers.invoices.kick_invoice_render") as kick, \
+                self.captureOnCommitCallbacks(execute=True):
+            fulfil_payment_intent(intent)
+        return Invoice.objects.get(), kick
+
+    def download(self, invoice, **headers):
+        return self.client.get(f"/api/user/invoices/{invoice.id}/download/", **headers)
+
+    def test_render_scheduled_after_commit(self):
+        invoice, kick = self.fulfil()
+        kick.assert_called_once_with(invoice.id)
+        self.assertEqual(list(unrendered_invoices()), [invoice])
+
+        pdf = store_invoice_pdf(invoice)
+        self.assertTrue(bytes(pdf.content).startswith(b"%PDF"))
+        self.assertEqual(store_invoice_pdf(invoice).sha256, pdf.sha256)     # reproducible
+        self.assertFalse(unrendered_invoices().exists())
+
+    def test_etag_and_not_modified(self):
+        invoice, _ = self.fulfil()
+        pdf = store_invoice_pdf(invoice)
+
+        with mock.patch("UserApp.helpers.invoices.render_invoice_pdf", side_effect=AssertionError("re-rendered")):
+            response = self.download(invoice)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["ETag"], f'"{pdf.sha256}"')
+            self.assertEqual(response.content, bytes(pdf.content))
+
+            cached = self.download(invoice, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(cached.status_code, 304)
+            self.assertEqual(cached.content, b"")
+
+    def test_missing_pdf_rendered_on_download(self):
+        invoice, _ = self.fulfil()
+        response = self.download(invoice)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], f'"{InvoicePDF.objects.get(invoice=invoice).sha256}"')
+
+
+class InvoiceLayoutTests(APITestCase):
+    """Every purchase_type renders its own lines and long invoices paginate."""
+
+    def pages(self, pdf):
+        return len(re.findall(rb"/Type /Page\b(?!s)", pdf))
+
+    def test_rows_for_every_purchase_type(self):
+        for purchase_type, layout in INVOICE_LAYOUTS.items():
+            columns, rows, _, _ = layout(sample_invoice(purchase_type, 3))
+            self.assertEqual(len(rows), 3, purchase_type)
+            self.assertTrue(all(len(row) == len(columns) for row in rows))
+
+        _, rows, _, _ = INVOICE_LAYOUTS["rent"](sample_invoice("rent", 1))
+        self.assertEqual(rows[0][1:3], ["30", "2026-05-01"])
+
+    def test_pagination(self):
+        for purchase_type in INVOICE_LAYOUTS:
+            self.assertEqual(self.pages(render_invoice_pdf(sample_invoice(purchase_type, 1))), 1)
+            self.assertGreater(self.pages(render_invoice_pdf(sample_invoice(purchase_type, 150))), 2)
+
+
+# ---------------- WHATTOMINE INDEX -----------------
+
+ASIC_PAYLOAD = {"coins": {
+    "Bitcoin": {"tag": "BTC", "algorithm": "SHA-256", "profitability": 100, "nethash": 6e20},
+    "BitcoinCash": {"tag": "BCH", "algorithm": "SHA-256", "profitability": 104, "nethash": 4e18},
+    "Litecoin": {"tag": "LTC", "algorithm": "Scrypt", "profitability": 120, "nethash": 2e15},
+    "Dogecoin": {"tag": "DOGE", "algorithm": "Scrypt", "profitability": 95, "nethash": 2e15},
+}}
+
+
+class AsicProfitabilityTests(APITestCase):
+    """WhatToMine payload indexed once, filtered server-side, served pre-compressed."""
+
+    url = "/api/user/asic-profitability/"
+
+    def setUp(self):
+        reset_asic_index()
+        self.addCleanup(reset_asic_index)
+        patcher = mock.patch.object(
+            whattomine_source, "get_with_timestamp", return_value=(ASIC_PAYLOAD, timezone.now())
+        )
+        self.source = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, **params):
+        headers = {key: params.pop(key) for key in list(params) if key.startswith("HTTP_")}
+        return self.client.get(self.url, params, **headers)
+
+    def coins(self, response):
+        body = response.content
+        if response.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        return json.loads(body)["data"]["coins"]
+
+    def test_filters_and_projection(self):
+        self.assertEqual(list(self.coins(self.get())), ["Litecoin", "BitcoinCash", "Bitcoin", "Dogecoin"])
+        self.assertEqual(list(self.coins(self.get(algorithm="sha-256"))), ["BitcoinCash", "Bitcoin"])
+        self.assertEqual(list(self.coins(self.get(coin="doge,btc"))), ["Bitcoin", "Dogecoin"])
+        self.assertEqual(
+            self.coins(self.get(algorithm="Scrypt", top="1", fields="tag,profitability")),
+            {"Litecoin": {"tag": "LTC", "profitability": 120}},
+        )
+        self.assertEqual(self.get(fields="tag,secret").status_code, 400)
+        self.assertEqual(self.get(top="0").status_code, 400)
+
+    def test_compression_and_etag(self):
+        response = self.get(HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(len(self.coins(response)), 4)
+
+        plain = self.get()
+        self.assertNotIn("Content-Encoding", plain)
+        self.assertNotEqual(plain["ETag"], response["ETag"])
+
+        cached = self.get(HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual((cached.status_code, cached.content), (304, b""))
+
+    def test_index_built_once(self):
+        for _ in range(5):
+            self.get(algorithm="scrypt")
+        self.assertEqual(self.source.call_count, 1)
+
+    def test_unavailable(self):
+        self.source.return_value = (None, None)
+        self.assertEqual(self.get().status_code, 503)
+
+
+# ---------------- REVIEW AGGREGATES -----------------
+
+class ReviewAggregateTests(APITestCase):
+    """Review writes move the product's counters in place; reconciliation repairs drift."""
+
+    def setUp(self):
+        self.product = make_product(1)
+        self.users = [
+            User.objects.create_user(
+                username=f"reviewer{index}", email=f"reviewer{index}@example.com", password="pass", is_active=True
+            )
+            for index in range(4)
+        ]
+
+    def review(self, user, rating):
+        self.client.force_authenticate(user)
+        return self.client.post(
+            f"/api/user/products/{self.product.id}/reviews/create/", {"rating": rating, "comment": "ok"}
+        )
+
+    def assertAggregates(self, count, rating_sum, average, histogram):
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, count)
+        self.assertEqual(self.product.rating_sum, rating_sum)
+        self.assertEqual(self.product.average_rating, average)
+        self.assertEqual(self.product.rating_histogram, dict(zip(range(1, 6), histogram)))
+
+    def test_product_save_keeps_reviews_written_after_load(self):
+        self.review(self.users[0], 5)
+        loaded = Product.objects.get(pk=self.product.pk)    # e.g. the admin update view
+
+        self.review(self.users[1], 3)
+        loaded.price = "1500.00"
+        loaded.save()
+
+        self.assertAggregates(2, 8, 4.0, [0, 0, 1, 0, 1])
+        self.assertEqual(str(self.product.price), "1500.00")
+
+    def test_create_update_delete(self):
+        for user, rating in zip(self.users, [5, 4, 4]):
+            self.assertEqual(self.review(user, rating).status_code, 201)
+        self.assertAggregates(3, 13, 4.3, [0, 0, 0, 2, 1])
+
+        review = ProductReview.objects.get(user=self.users[0])
+        review.rating = 1
+        review.save()
+        self.assertAggregates(3, 9, 3.0, [1, 0, 0, 2, 0])
+
+        ProductReview.objects.get(user=self.users[1]).delete()
+        self.assertAggregates(2, 5, 2.5, [1, 0, 0, 1, 0])
+
+        review.delete()
+        self.assertAggregates(1, 4, 4.0, [0, 0, 0, 1, 0])
+        self.review(self.users[3], 4)
+        self.assertAggregates(2, 8, 4.0, [0, 0, 0, 2, 0])
+
+        for review in ProductReview.objects.all():
+            review.delete()
+        self.assertAggregates(0, 0, 0, [0, 0, 0, 0, 0])
+
+    def test_create_queries_do_not_grow_with_reviews(self):
+        self.review(self.users[0], 5)
+        with CaptureQueriesContext(connection) as first:
+            self.review(self.users[1], 3)
+        for user in self.users[2:]:
+            self.review(user, 4)
+        ProductReview.objects.bulk_create(
+            ProductReview(
+                product=self.product,
+                user=User.objects.create_user(username=f"bulk{index}", email=f"bulk{index}@example.com"),
+                rating=2,
+            )
+            for index in range(20)
+        )
+        user = User.objects.create_user(
+            username="late", email="late@example.com", password="pass", is_active=True
+        )
+        with CaptureQueriesContext(connection) as later:
+            self.review(user, 3)
+
+        self.assertEqual(len(later), len(first))
+
+    def test_delete_twice_moves_aggregates_once(self):
+        for user, rating in zip(self.users, [5, 3]):
+            self.review(user, rating)
+        first = ProductReview.objects.get(user=self.users[0])
+        second = ProductReview.objects.get(pk=first.pk)
+        second.rating = 1       # stale in-memory copy must not matter
+
+        first.delete()
+        second.delete()
+        self.assertAggregates(1, 3, 3.0, [0, 0, 1, 0, 0])
+
+    def test_rejects_out_of_range_and_duplicate(self):
+        self.assertEqual(self.review(self.users[0], 6).status_code, 400)
+        self.assertEqual(self.review(self.users[0], 0).status_code, 400)
+        self.assertEqual(self.review(self.users[0], 5).status_code, 201)
+        self.assertEqual(self.review(self.users[0], 4).status_code, 400)
+        self.assertAggregates(1, 5, 5.0, [0, 0, 0, 0, 1])
+
+    def test_reconcile_repairs_drift(self):
+        for user, rating in zip(self.users, [5, 3, 2]):
+            self.review(user, rating)
+        empty = make_product(2)
+        Product.objects.filter(pk=empty.pk).update(review_count=7, rating_sum=30, average_rating=4.3)
+        ProductReview.objects.filter(user=self.users[2]).delete()        # bypasses the model
+
+        self.assertEqual(reconcile_rating_aggregates(dry_run=True), (2, 2))
+        self.assertAggregates(3, 10, 3.3, [0, 1, 1, 0, 1])
+
+        call_command("reconcile_review_aggregates", "--batch-size", "1", stdout=mock.Mock())
+        self.assertAggregates(2, 8, 4.0, [0, 0, 1, 0, 1])
+        empty.refresh_from_db()
+        self.assertEqual((empty.review_count, empty.rating_sum, empty.average_rating), (0, 0, 0))
+        self.assertEqual(reconcile_rating_aggregates(), (2, 0))
+
+
+class ReviewListingTests(APITestCase):
+    """Review tab: keyset pages with the author joined, cached summary dropped on writes."""
+
+    def setUp(self):
+        for alias in ("default", "local"):
+            caches[alias].clear()
+        self.product = make_product(1)
+
+    def add_reviews(self, ratings):
+        for rating in ratings:
+            index = ProductReview.objects.count()
+            user = User.objects.create_user(username=f"reviewer{index}", email=f"reviewer{index}@example.com")
+            with self.captureOnCommitCallbacks(execute=True):
+                ProductReview.objects.create(product=self.product, user=user, rating=rating)
+
+    def summary(self):
+        return self.client.get(f"/api/user/products/{self.product.id}/reviews/summary/")
+
+    def test_pages_without_per_row_queries(self):
+        self.add_reviews([5, 4, 3, 5, 2])
+        url = f"/api/user/products/{self.product.id}/reviews/?page_size=2"
+
+        seen = []
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(len(queries), 1)
+
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen += [review["user_name"] for review in response.data["results"]]
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+
+        self.assertEqual(seen, [f"reviewer{index}" for index in reversed(range(5))])
+
+    def test_summary_cached_and_invalidated(self):
+        self.add_reviews([5, 4])
+        self.assertEqual(self.summary().data, {
+            "product_id": self.product.id,
+            "review_count": 2,
+            "average_rating": 4.5,
+            "histogram": {"1": 0, "2": 0, "3": 0, "4": 1, "5": 1},
+        })
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.summary().data["review_count"], 2)
+
+        self.add_reviews([1])
+        response = self.summary()
+        self.assertEqual(response.data["review_count"], 3)
+        self.assertEqual(response.data["histogram"]["1"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductReview.objects.get(rating=5).delete()
+        self.assertEqual(self.summary().data["average_rating"], 2.5)
+
+    def test_summary_unknown_product(self):
+        response = self.client.get("/api/user/products/999999/reviews/summary/")
+        self.assertEqual(response.status_code, 404)
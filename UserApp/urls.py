@@ -1,7 +1,7 @@
 from django.urls import path
 
 from UserApp import views
-from .views import AddToCartView, BundleOfferDetailView, BundleOfferListView, CalculateProfitabilityAPIView, CartListView, CartTotalView, CheckoutView, CreateHostingRequestView, CreatePaymentIntentView, ForgotPasswordView, GetUserInfoView, LogoutView, ProductDetailView, ProductListView, RegisterView, EmailTokenObtainView, RemoveFromCartView, RentMinerView, ResendVerificationEmailView, ResetPasswordView, StripeWebhookView, UpdateCartView, UserActiveRentalsView, UserPastRentalsView, VerifyEmailView
+from .views import AddToCartView, BatchProfitabilityAPIView, BundleOfferDetailView, BundleOfferListView, CalculateProfitabilityAPIView, CartListView, CartTotalView, CheckoutView, CreateHostingRequestView, CreatePaymentIntentView, ForgotPasswordView, GetUserInfoView, LogoutView, ProductDetailView, ProductListView, RegisterView, EmailTokenObtainView, RemoveFromCartView, RentMinerView, ResendVerificationEmailView, ResetPasswordView, StripeWebhookView, UpdateCartView, UserActiveRentalsView, UserPastRentalsView, VerifyEmailView
 from rest_framework_simplejwt.views import TokenRefreshView
 
 urlpatterns = [
@@ -66,9 +66,11 @@ urlpatterns = [
 
     path('products/<int:product_id>/reviews/', views.list_product_reviews, name='product-reviews'),
     path('products/<int:product_id>/reviews/create/', views.create_review, name='review-create'),
+    path('products/<int:product_id>/reviews/summary/', views.product_review_summary, name='review-summary'),
     # path('products/<int:product_id>/reviews/',views.list_product_reviews,name='product-review-list'),
 
    
-    path("api/calculate-profitability/",CalculateProfitabilityAPIView.as_view(),name="calculate-profitability")
+    path("api/calculate-profitability/",CalculateProfitabilityAPIView.as_view(),name="calculate-profitability"),
+    path("api/calculate-profitability/batch/",BatchProfitabilityAPIView.as_view(),name="calculate-profitability-batch"),
 
 ]
\ No newline at end of file
@@ -1,21 +1,207 @@
-from .models import CartItem
+import re
+from decimal import Decimal
 
-def calculate_cart_total(user):
-    cart_items = CartItem.objects.filter(user=user)
+from django.db.models import Case, DecimalField, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
 
-    total_price = 0
-    for item in cart_items:
+from .models import CartItem, Invoice
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def get_cart_items(user):
+    """
+    Single loader for every cart read path (cart list, totals, checkout,
+    hosting, rent). Product and bundle come in the same query, so reading
+    item.product / item.bundle never hits the database again.
+    """
+    return (
+        CartItem.objects
+        .filter(user=user)
+        .select_related("product", "bundle")
+    )
+
+
+def with_invoice_id(queryset, purchase_type):
+    """
+    Annotate `invoice_pk` on orders / rentals / hosting requests so the
+    serializers' invoice_id costs no extra query per row.
+    Backed by the Invoice(purchase_type, related_id) index.
+    """
+    invoices = (
+        Invoice.objects
+        .filter(user=OuterRef("user"), purchase_type=purchase_type, related_id=OuterRef("pk"))
+        .order_by("id")
+        .values("id")[:1]
+    )
+    return queryset.annotate(invoice_pk=Subquery(invoices))
+
+
+def get_cart_totals(user):
+    """
+    Cart pricing in ONE aggregate query, all amounts as Decimal.
+    Single source of truth for cart total, checkout and the buy payment intent.
+
+    Returns:
+    - subtotal      list price of all lines
+    - discount      Product.discount_percentage savings
+    - total         subtotal - discount (the amount charged)
+    - device_count  sum of line quantities
+    - breakdown     the same numbers per line type ("product" / "bundle")
+    """
+    zero = Value(Decimal("0.00"), output_field=MONEY)
+
+    product_price = Coalesce(F("product__price"), zero) * F("quantity")
+    product_final = product_price * (100 - F("product__discount_percentage")) / 100
+    bundle_price = F("bundle__price") * F("quantity")
+
+    list_price = Case(
+        When(product__isnull=False, then=product_price),
+        When(bundle__isnull=False, then=bundle_price),
+        default=zero,
+        output_field=MONEY,
+    )
+    final_price = Case(
+        When(product__isnull=False, then=product_final),
+        When(bundle__isnull=False, then=bundle_price),
+        default=zero,
+        output_field=MONEY,
+    )
+
+    is_product = Q(product__isnull=False)
+    is_bundle = Q(product__isnull=True, bundle__isnull=False)
+
+    def money_sum(expression, condition=None):
+        return Coalesce(Sum(expression, filter=condition), zero, output_field=MONEY)
+
+    def quantity_sum(condition):
+        return Coalesce(Sum("quantity", filter=condition), 0)
+
+    row = CartItem.objects.filter(user=user).aggregate(
+        subtotal=money_sum(list_price),
+        total=money_sum(final_price),
+        device_count=Coalesce(Sum("quantity"), 0),
+        product_subtotal=money_sum(list_price, is_product),
+        product_total=money_sum(final_price, is_product),
+        product_quantity=quantity_sum(is_product),
+        bundle_subtotal=money_sum(list_price, is_bundle),
+        bundle_total=money_sum(final_price, is_bundle),
+        bundle_quantity=quantity_sum(is_bundle),
+    )
+
+    cents = Decimal("0.01")
+    subtotal = Decimal(row["subtotal"]).quantize(cents)
+    total = Decimal(row["total"]).quantize(cents)
+
+    return {
+        "subtotal": subtotal,
+        "discount": subtotal - total,
+        "total": total,
+        "device_count": row["device_count"],
+        "breakdown": {
+            kind: {
+                "subtotal": Decimal(row[f"{kind}_subtotal"]).quantize(cents),
+                "total": Decimal(row[f"{kind}_total"]).quantize(cents),
+                "quantity": row[f"{kind}_quantity"],
+            }
+            for kind in ("product", "bundle")
+        },
+    }
+
+
+
+# ---------- checkout snapshot ----------
+# The buy webhook is fulfilled later (Celery, with retries), so it must not
+# read the live cart: the lines and totals that were paid for travel in the
+# PaymentIntent metadata. Stripe caps a metadata value at 500 characters and
+# an intent at 50 keys, so lines are packed as "p12x2@1999.99" (p=product,
+# b=bundle, quantity, unit list price) into as many cart_N keys as needed.
+
+SNAPSHOT_VALUE_LIMIT = 500
+MAX_SNAPSHOT_KEYS = 30
+SNAPSHOT_TOTALS = ("subtotal", "discount", "total")
+_SNAPSHOT_LINE_RE = re.compile(r"^([pb])(\d+)x(\d+)@(\d+(?:\.\d+)?)$")
+
+
+def checkout_snapshot(user):
+    """
+    (totals, metadata) for a buy PaymentIntent: get_cart_totals() plus the
+    cart lines it priced. Raises ValueError if the cart does not fit.
+    """
+    totals = get_cart_totals(user)
+
+    chunks, current = [], ""
+    for item in get_cart_items(user).order_by("id"):
         if item.product:
-            total_price += float(item.product.price) * item.quantity
+            line = f"p{item.product_id}x{item.quantity}@{item.product.price}"
         elif item.bundle:
-            total_price += float(item.bundle.price) * item.quantity
+            line = f"b{item.bundle_id}x{item.quantity}@{item.bundle.price}"
+        else:
+            continue
+        if current and len(current) + 1 + len(line) > SNAPSHOT_VALUE_LIMIT:
+            chunks.append(current)
+            current = ""
+        current = f"{current},{line}" if current else line
+    if current:
+        chunks.append(current)
+
+    if len(chunks) > MAX_SNAPSHOT_KEYS:
+        raise ValueError("Cart has too many lines to check out at once")
+
+    metadata = {f"cart_{index}": chunk for index, chunk in enumerate(chunks)}
+    metadata["cart_lines"] = str(len(chunks))
+    metadata.update({name: str(totals[name]) for name in SNAPSHOT_TOTALS})
+    return totals, metadata
+
+
+def read_checkout_snapshot(metadata):
+    """
+    (lines, totals) from checkout_snapshot() metadata, lines as
+    [("product" | "bundle", id, quantity, unit_price)]; None for intents
+    created without a snapshot.
+    """
+    if "cart_lines" not in metadata:
+        return None
+
+    lines = []
+    for index in range(int(metadata["cart_lines"])):
+        for line in metadata[f"cart_{index}"].split(","):
+            match = _SNAPSHOT_LINE_RE.match(line)
+            if match is None:
+                raise ValueError(f"Malformed cart snapshot line {line!r}")
+            kind, object_id, quantity, price = match.groups()
+            lines.append(
+                ("product" if kind == "p" else "bundle", int(object_id), int(quantity), Decimal(price))
+            )
 
-    return total_price, cart_items
+    totals = {name: Decimal(metadata[name]) for name in SNAPSHOT_TOTALS}
+    return lines, totals
 
 
 
 from decimal import Decimal
-from django.utils import timezone
+
+def price_rentals(cart_items, duration_days):
+    """
+    Rental fee per cart line in one pass over already-loaded items
+    (get_cart_items), no queries. Returns [(cart_item, fee), ...].
+
+    - product: Rental.calculate_rental_fee (power x hosting fee x days)
+    - bundle:  bundle price x quantity (simple for now)
+    """
+    from .models import Rental
+
+    priced = []
+    for item in cart_items:
+        if item.product:
+            fee = Rental(product=item.product, duration_days=duration_days).calculate_rental_fee()
+        elif item.bundle:
+            fee = (Decimal(item.bundle.price) * Decimal(item.quantity)).quantize(Decimal("0.01"))
+        else:
+            continue
+        priced.append((item, fee))
+    return priced
+
 
 def calculate_rent_total(user, duration_days):
     """
@@ -23,54 +209,25 @@ def calculate_rent_total(user, duration_days):
     - total_rent_amount
     - detailed_snapshot (for invoice + webhook safety)
     """
-    from .models import CartItem, Rental
-
-    cart_items = CartItem.objects.filter(user=user)
+    cart_items = list(get_cart_items(user))
 
     # 🔧 UPDATED: guard against empty cart
-    if not cart_items.exists():
+    if not cart_items:
         return Decimal("0.00"), []
 
     snapshot = []
     total = Decimal("0.00")
 
-    for item in cart_items:
-
-        # PRODUCT RENT
-        if item.product:
-            temp_rental = Rental(
-                user=user,
-                product=item.product,
-                duration_days=duration_days,
-                end_date=timezone.now()
-            )
-
-            fee = temp_rental.calculate_rental_fee()
-
-            snapshot.append({
-                "type": "product",
-                "id": item.product.id,
-                "name": item.product.model_name,
-                "duration_days": duration_days,
-                "amount": str(fee)
-            })
-
-            total += fee
-
-        # BUNDLE RENT (simple for now)
-        elif item.bundle:
-            # 🔧 UPDATED: Decimal-safe calculation
-            fee = Decimal(item.bundle.price) * Decimal(item.quantity)
-
-            snapshot.append({
-                "type": "bundle",
-                "id": item.bundle.id,
-                "name": item.bundle.name,
-                "duration_days": duration_days,
-                "amount": str(fee)
-            })
-
-            total += fee
+    for item, fee in price_rentals(cart_items, duration_days):
+        rented = item.product or item.bundle
+        snapshot.append({
+            "type": "product" if item.product else "bundle",
+            "id": rented.id,
+            "name": item.product.model_name if item.product else item.bundle.name,
+            "duration_days": duration_days,
+            "amount": str(fee)
+        })
+        total += fee
 
     # UPDATED: always return Decimal + snapshot
     return total.quantize(Decimal("0.01")), snapshot
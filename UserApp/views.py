@@ -8,6 +8,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 
 
 from .serializers import HostingRequestSerializer, InvoiceSerializer, RegisterSerializer, ResendVerificationSerializer, UserOrderSerializer
+from .helpers.outbox import enqueue_email
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from django.contrib.auth.tokens import default_token_generator
@@ -27,12 +28,13 @@ class RegisterView(generics.CreateAPIView):
         uid = urlsafe_base64_encode(force_bytes(user.pk))
         verification_link = f"{settings.FRONTEND_URL}/verify-email/{uid}/{token}"
 
-        send_mail(
+        # queued, sent by the Celery worker (no SendGrid call in the request)
+        enqueue_email(
+            to_email=user.email,
             subject="Verify your Cryptonite account",
-            message=f"Hi {user.username}, please verify your email by clicking here: {verification_link}",
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            fail_silently=False,
+            body=f"Hi {user.username}, please verify your email by clicking here: {verification_link}",
+            kind="verification",
+            dedupe_key=f"verify:{user.pk}",
         )
 
 # ---------- verification endpoint  ----------
@@ -71,7 +73,6 @@ class VerifyEmailView(APIView):
 # ---------- Resend Verification Email ----------
 from django.conf import settings
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from rest_framework.views import APIView
@@ -99,17 +100,18 @@ class ResendVerificationEmailView(APIView):
             f"{settings.FRONTEND_URL}/verify-email/{uid}/{token}"
         )
 
-        send_mail(
+        # repeat clicks while one is still queued (or was just sent) are deduped
+        enqueue_email(
+            to_email=user.email,
             subject="Verify your Cryptonite account",
-            message=(
+            body=(
                 f"Hi {user.username},\n\n"
                 f"Please verify your email by clicking the link below:\n"
                 f"{verification_link}\n\n"
                 f"If you did not request this, you can safely ignore this email."
             ),
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            fail_silently=False,
+            kind="verification",
+            dedupe_key=f"verify:{user.pk}",
         )
 
         return Response(
@@ -155,7 +157,6 @@ class EmailTokenObtainView(APIView):
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
-from django.core.mail import send_mail
 from django.conf import settings
 
 # ---------------- FORGOT PASSWORD -----------------
@@ -178,12 +179,12 @@ class ForgotPasswordView(APIView):
 
         reset_link = f"{settings.FRONTEND_URL}/reset-password/{uid}/{token}"
 
-        send_mail(
+        enqueue_email(
+            to_email=email,
             subject="Password Reset Request",
-            message=f"Click the link to reset your password: {reset_link}",
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[email],
-            fail_silently=False,
+            body=f"Click the link to reset your password: {reset_link}",
+            kind="password_reset",
+            dedupe_key=f"reset:{user.pk}",
         )
 
         return Response({"detail": "Password reset link sent to email."})
@@ -254,17 +255,18 @@ from AdminApp.models import Blog, Product
 
 
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import OrderingFilter
-from .filters import ProductFilter
-from django.db.models import Q
+from .filters import ProductFilter, SearchRankOrderingFilter
+from .pagination import KeysetPagination
+from AdminApp.search import search_products
 
 class ProductListView(generics.ListAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = []
+    pagination_class = KeysetPagination
 
     # 🔹 enable filter & sorting
-    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, SearchRankOrderingFilter]
     filterset_class = ProductFilter
 
     # 🔹 sorting fields
@@ -272,20 +274,18 @@ class ProductListView(generics.ListAPIView):
         "price",
         "created_at",
         "average_rating",
+        "daily_profit_usd",  # ?ordering=-daily_profit_usd -> most profitable first
     ]
 
-    ordering = ["-id"]  # default
+    ordering = ["-created_at", "-id"]  # default (matches the keyset index)
 
     def get_queryset(self):
         queryset = Product.objects.all()
 
+        # full-text search (GIN index on Postgres), ranked via search_rank
         search = self.request.query_params.get("q", "").strip()
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(brand__icontains=search) |
-                Q(description__icontains=search)
-            )
+            queryset = search_products(queryset, search)
 
         return queryset
 # ---------------- VIEW SINGLE PRODUCT -----------------
@@ -302,6 +302,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from .models import CartItem, HostingRequest
+from .utils import get_cart_items, get_cart_totals, with_invoice_id
 from AdminApp.models import BundleOffer
 
 class AddToCartView(generics.CreateAPIView):
@@ -354,7 +355,7 @@ class CartListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return CartItem.objects.filter(user=self.request.user)
+        return get_cart_items(self.request.user)
 
 
 # ---------------- UPDATE CART -----------------
@@ -384,17 +385,15 @@ class CartTotalView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        cart_items = CartItem.objects.filter(user=request.user)
-
-        total_price = 0
-
-        for item in cart_items:
-            if item.product:
-                total_price += float(item.product.price) * item.quantity
-            elif item.bundle:
-                total_price += float(item.bundle.price) * item.quantity
+        totals = get_cart_totals(request.user)
 
-        return Response({"total_price": total_price})
+        return Response({
+            "total_price": totals["total"],
+            "subtotal": totals["subtotal"],
+            "discount": totals["discount"],
+            "device_count": totals["device_count"],
+            "breakdown": totals["breakdown"],
+        })
 
 
 from rest_framework import generics, status
@@ -483,7 +482,8 @@ class UserActiveRentalsView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Rental.objects.filter(user=self.request.user, is_active=True)
+        rentals = Rental.objects.filter(user=self.request.user, is_active=True).select_related("product", "bundle")
+        return with_invoice_id(rentals, "rent")
 
 
 
@@ -495,7 +495,8 @@ class UserPastRentalsView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Rental.objects.filter(user=self.request.user, is_active=False)
+        rentals = Rental.objects.filter(user=self.request.user, is_active=False).select_related("product", "bundle")
+        return with_invoice_id(rentals, "rent")
 
 
 def mark_expired_rentals():
@@ -525,10 +526,11 @@ class GetUserInfoView(APIView):
 
 from AdminApp.models import BundleOffer
 from AdminApp.serializers import BlogSerializer, BundleOfferSerializer
+from AdminApp.bundles import with_bundle_items
 
 
 class BundleOfferListView(generics.ListAPIView):
-    queryset = BundleOffer.objects.all().order_by('-created_at')
+    queryset = with_bundle_items(BundleOffer.objects.all()).order_by('-created_at')
     serializer_class = BundleOfferSerializer
     permission_classes = [AllowAny]
 
@@ -536,7 +538,7 @@ class BundleOfferListView(generics.ListAPIView):
 # ---------------- VIEW SINGLE BUNDLE OFFER -----------------
 
 class BundleOfferDetailView(generics.RetrieveAPIView):
-    queryset = BundleOffer.objects.all()
+    queryset = with_bundle_items(BundleOffer.objects.all())
     serializer_class = BundleOfferSerializer
     permission_classes = [AllowAny]
     lookup_field = 'id'
@@ -551,9 +553,8 @@ from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from .utils import calculate_cart_total, calculate_rent_total
+from .utils import calculate_rent_total, checkout_snapshot
 from decimal import Decimal
-from .utils import calculate_cart_total
 from .models import HostingRequest
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
@@ -576,9 +577,14 @@ class CreatePaymentIntentView(APIView):
         # BUY 
         # -------------------------------
         if purchase_type == "buy":
-            total_price, cart_items = calculate_cart_total(user)
+            # the webhook fulfils exactly these lines, whatever the cart holds by then
+            try:
+                totals, cart_metadata = checkout_snapshot(user)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=400)
+            total_price = totals["total"]
 
-            if not cart_items.exists():
+            if total_price <= 0:
                 return Response({"error": "Cart is empty"}, status=400)
         # -------------------------------
         # RENT 
@@ -645,6 +651,7 @@ class CreatePaymentIntentView(APIView):
                 "postal_code": address.get("postal_code", ""),
                 "country": address.get("country", ""),
             })
+            metadata.update(cart_metadata)
 
         # -------------------------------
         # RENT → duration required
@@ -689,6 +696,9 @@ from django.contrib.auth import get_user_model
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
+import json
+from django.db import transaction
+
 from .models import (
     CartItem,
     Order,
@@ -696,7 +706,9 @@ from .models import (
     Rental,
     HostingRequest,
     Invoice,
+    StripeEvent,
 )
+from .helpers.fulfilment import kick_stripe_fulfilment, record_stripe_event
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
@@ -718,206 +730,12 @@ class StripeWebhookView(APIView):
         except Exception as e:
             return Response({"error": str(e)}, status=400)
 
-        # We only care about successful payments
-        if event["type"] != "payment_intent.succeeded":
-            return Response(status=200)
-
-        intent = event["data"]["object"]
-        metadata = intent.get("metadata", {})
-
-        # 🔐 DUPLICATE PROTECTION (VERY IMPORTANT)
-        if Invoice.objects.filter(stripe_payment_intent=intent["id"]).exists():
-            return Response(status=200)
-
-        user_id = metadata.get("user_id")
-        purchase_type = metadata.get("purchase_type")
-
-        if not user_id or not purchase_type:
-            return Response(status=200)
-
-        User = get_user_model()
-        user = User.objects.get(id=user_id)
-
-        # =====================================================
-        # BUY
-        # =====================================================
-        if purchase_type == "buy":
-            cart_items = CartItem.objects.filter(user=user)
-            if not cart_items.exists():
-                return Response(status=200)
-
-            total_price = sum(
-                (ci.product.price if ci.product else ci.bundle.price) * ci.quantity
-                for ci in cart_items
-            )
-
-            order = Order.objects.create(
-                user=user,
-                total_amount=total_price,
-                stripe_payment_intent=intent["id"],
-                status="completed",
-                delivery_address={
-                    "name": metadata.get("name"),
-                    "line1": metadata.get("line1"),
-                    "city": metadata.get("city"),
-                    "state": metadata.get("state"),
-                    "postal_code": metadata.get("postal_code"),
-                    "country": metadata.get("country"),
-                },
-            )
-
-            for item in cart_items:
-                OrderItem.objects.create(
-                    order=order,
-                    product=item.product,
-                    bundle=item.bundle,
-                    quantity=item.quantity,
-                )
+        # fast path: record the event (unique event id) and acknowledge;
+        # fulfilment runs in the worker (UserApp.tasks.process_stripe_event)
+        stripe_event, created = record_stripe_event(json.loads(payload))
 
-            # 🧾 INVOICE (BUY)
-            Invoice.objects.create(
-                user=user,
-                invoice_number=f"INV-BUY-{order.id}",
-                purchase_type="buy",
-                related_id=order.id,
-                amount=order.total_amount,
-                currency="USD",
-                stripe_payment_intent=intent["id"],
-                invoice_data={
-                    "items": [
-                        {
-                            "title": (
-                                item.product.model_name
-                                if item.product else item.bundle.name
-                            ),
-                            "quantity": item.quantity,
-                            "unit_price": str(
-                                item.product.price if item.product else item.bundle.price
-                            ),
-                            "total_price": str(
-                                (item.product.price if item.product else item.bundle.price)
-                                * item.quantity
-                            ),
-                        }
-                        for item in cart_items
-                    ],
-                    "delivery_address": order.delivery_address,
-                },
-            )
-
-            cart_items.delete()
-
-        # =====================================================
-        # RENT
-        # =====================================================
-
-        elif purchase_type == "rent":
-            duration_days = int(metadata.get("duration_days", 30))
-            cart_items = CartItem.objects.filter(user=user)
-
-            rentals = []
-
-            for item in cart_items:
-
-                # PRODUCT RENT
-                if item.product:
-                    temp_rental = Rental(
-                        user=user,
-                        product=item.product,
-                        duration_days=duration_days,
-                        end_date=timezone.now()
-                    )
-                    amount = temp_rental.calculate_rental_fee()
-
-                    rental = Rental.objects.create(
-                        user=user,
-                        product=item.product,
-                        duration_days=duration_days,
-                        amount_paid=amount,
-                        end_date=timezone.now() + timezone.timedelta(days=duration_days),
-                    )
-                    rentals.append(rental)
-
-                # BUNDLE RENT
-                elif item.bundle:
-                    amount = item.bundle.price * item.quantity
-
-                    rental = Rental.objects.create(
-                        user=user,
-                        bundle=item.bundle,
-                        duration_days=duration_days,
-                        amount_paid=amount,
-                        end_date=timezone.now() + timezone.timedelta(days=duration_days),
-                    )
-                    rentals.append(rental)
-
-
-            # 🧾 INVOICE (RENT)
-            if rentals:
-                Invoice.objects.create(
-                    user=user,
-                    invoice_number=f"INV-RENT-{timezone.now().strftime('%Y%m%d%H%M%S')}",
-                    purchase_type="rent",
-                    # related_id=rentals[0].id,  # ✅ SAFE
-                    related_id=None,
-                    amount=sum(r.amount_paid for r in rentals),
-                    currency="USD",
-                    stripe_payment_intent=intent["id"],
-                    invoice_data={
-                        "rentals": [
-                            {
-                                "item": (
-                                    r.product.model_name
-                                    if r.product
-                                    else r.bundle.name
-                                ),
-                                "duration_days": r.duration_days,
-                                "amount": str(r.amount_paid),
-                                "end_date": str(r.end_date),
-                            }
-                            for r in rentals
-                        ]
-                    },
-                )
-
-            cart_items.delete()
-
-        # =====================================================
-        # HOSTING
-        # =====================================================
-        elif purchase_type == "hosting":
-            hosting_request_id = metadata.get("hosting_request_id")
-
-            hosting_request = HostingRequest.objects.get(
-                id=hosting_request_id,
-                user=user
-            )
-
-            if hosting_request.is_paid:
-                return Response(status=200)
-
-            hosting_request.is_paid = True
-            hosting_request.payment_reference = intent["id"]
-            hosting_request.status = "paid"
-            hosting_request.save()
-
-            # 🧾 INVOICE (HOSTING)
-            Invoice.objects.create(
-                user=user,
-                invoice_number=f"INV-HOST-{hosting_request.id}",
-                purchase_type="hosting",
-                related_id=hosting_request.id,
-                amount=hosting_request.total_amount,
-                currency="USD",
-                stripe_payment_intent=intent["id"],
-                invoice_data={
-                    "items": hosting_request.items,
-                    "setup_fee": str(hosting_request.setup_fee),
-                    "hosting_location": hosting_request.hosting_location,
-                },
-            )
-
-            CartItem.objects.filter(user=user).delete()
+        if created and stripe_event.status == StripeEvent.RECEIVED:
+            transaction.on_commit(lambda: kick_stripe_fulfilment(stripe_event.pk))
 
         return Response(status=200)
 
@@ -928,7 +746,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from .models import CartItem
 from .serializers import CartItemSerializer
-from .utils import calculate_cart_total
+from .utils import get_cart_items, get_cart_totals
 
 class CheckoutView(APIView):
     permission_classes = [IsAuthenticated]
@@ -937,16 +755,20 @@ class CheckoutView(APIView):
         """
         Returns checkout summary for frontend
         """
-        total_price, cart_items = calculate_cart_total(request.user)
-        serialized_items = CartItemSerializer(cart_items, many=True).data
+        totals = get_cart_totals(request.user)
+        serialized_items = CartItemSerializer(get_cart_items(request.user), many=True).data
+
+        total_price = totals["total"]
+        tax = (total_price * Decimal("0.05")).quantize(Decimal("0.01"))   # example 5%
 
         response = {
             "cart_items": serialized_items,
             "total_price": total_price,
             "price_breakup": {
-                "subtotal": total_price,
-                "tax": round(total_price * 0.05, 2),      # example 5%
-                "final_total": round(total_price * 1.05, 2)
+                "subtotal": totals["subtotal"],
+                "discount": totals["discount"],
+                "tax": tax,
+                "final_total": total_price + tax
             },
             "can_buy": True,
             "can_rent": True,
@@ -974,8 +796,8 @@ class CreateHostingRequestView(APIView):
         if hosting_location not in ["US", "ET", "UAE"]:
             return Response({"error": "Invalid hosting location"}, status=400)
 
-        cart_items = CartItem.objects.filter(user=user)
-        if not cart_items.exists():
+        cart_items = list(get_cart_items(user))
+        if not cart_items:
             return Response({"error": "Cart is empty"}, status=400)
 
         snapshot = []
@@ -1041,62 +863,55 @@ class CreateHostingRequestView(APIView):
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from django.core.cache import cache
-import requests
-import traceback
-import requests
-from django.core.cache import cache
-from rest_framework.decorators import api_view
-from rest_framework.response import Response
-from rest_framework import status
+from .helpers.mining import whattomine_source
+
+MARKET_DATA_RETRY_AFTER = "30"  # seconds, while the first fetch is in flight
 
-WHAT_TO_MINE_URL = "https://whattomine.com/asic.json"
-CACHE_KEY = "asic_profitability_raw"
-CACHE_TTL = 900  # 15 minutes
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from .helpers.asic_index import RECHECK_SECONDS, get_asic_index, negotiate_encoding, parse_query
 
 @api_view(["GET"])
 def asic_profitability(request):
-    try:
-        # Check cache
-        cached_data = cache.get(CACHE_KEY)
-        if cached_data:
-            return Response({
-                "live": False,
-                "cached": True,
-                "source": "whattomine.com",
-                "data": cached_data
-            })
-
-        # Fetch external API
-        r = requests.get(
-            WHAT_TO_MINE_URL,
-            headers={"User-Agent": "Mozilla/5.0"},
-            timeout=10
-        )
-        r.raise_for_status()
-
-        data = r.json()  # FULL response
+    """
+    WhatToMine ASIC coins, most profitable first (see helpers/asic_index.py).
 
-        # Cache full response
-        cache.set(CACHE_KEY, data, CACHE_TTL)
+    ?algorithm=SHA-256  ?coin=BTC,LTC  ?top=10  ?fields=tag,algorithm,profitability
 
-        return Response({
-            "live": True,
-            "cached": False,
-            "source": "whattomine.com",
-            "data": data
-        })
+    Never calls WhatToMine in the request: cache / last known good + background
+    refresh. Bodies are pre-serialized and gzip / brotli compressed once per
+    payload and query; ETag / If-None-Match supported.
+    """
+    index = get_asic_index()
 
-    except requests.exceptions.RequestException as e:
+    if index is None:
         return Response(
             {
                 "status": "error",
-                "message": "Failed to fetch data from WhatToMine",
-                "details": str(e)
+                "message": "WhatToMine data is not available yet, retry shortly",
             },
-            status=status.HTTP_503_SERVICE_UNAVAILABLE
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": MARKET_DATA_RETRY_AFTER}
         )
 
+    try:
+        params = parse_query(request.query_params, index)
+    except ValueError as e:
+        return Response({"status": "error", "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    encoding = negotiate_encoding(request.META.get("HTTP_ACCEPT_ENCODING"))
+    body, etag = index.response(params, encoding)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type="application/json")
+        if encoding:
+            response["Content-Encoding"] = encoding
+
+    response["ETag"] = etag
+    patch_vary_headers(response, ["Accept-Encoding"])
+    response["Cache-Control"] = f"public, max-age={RECHECK_SECONDS}"
+    return response
+
 
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
@@ -1111,6 +926,7 @@ def my_orders(request):
         .order_by("-created_at")
         .prefetch_related("items", "items__product", "items__bundle")
     )
+    orders = with_invoice_id(orders, "buy")
 
     serializer = UserOrderSerializer(orders, many=True)
     return Response(serializer.data, status=200)
@@ -1129,9 +945,10 @@ def my_rentals(request):
     rentals = (
         Rental.objects
         .filter(user=request.user)
-        .select_related("product")
+        .select_related("product", "bundle")
         .order_by("-start_date")
     )
+    rentals = with_invoice_id(rentals, "rent")
 
     serializer = RentalSerializer(rentals, many=True)
     return Response(serializer.data, status=200)
@@ -1143,8 +960,10 @@ def my_hosting_requests(request):
     requests = (
         HostingRequest.objects
         .filter(user=request.user)
+        .select_related("user")
         .order_by("-created_at")
     )
+    requests = with_invoice_id(requests, "hosting")
 
     serializer = HostingRequestSerializer(requests, many=True)
     return Response(serializer.data, status=200)
@@ -1161,126 +980,44 @@ def my_invoices(request):
     serializer = InvoiceSerializer(invoices, many=True)
     return Response(serializer.data)
 
-from reportlab.pdfgen import canvas
-
-
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
 
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-
+from .helpers.invoices import get_invoice_pdf, invoice_etag, stored_invoice_etag
 from .models import Invoice
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def download_invoice(request, id):
+    """
+    Stored PDF (rendered once after fulfilment, see helpers/invoices.py).
+    ETag = sha256 of the bytes; a matching If-None-Match gets a 304
+    without loading the PDF.
+    """
     invoice = get_object_or_404(
-        Invoice,
+        Invoice.objects.select_related("user"),
         id=id,
         user=request.user
     )
 
-    response = HttpResponse(content_type="application/pdf")
-    response["Content-Disposition"] = (
-        f'attachment; filename="{invoice.invoice_number}.pdf"'
-    )
-
-    p = canvas.Canvas(response, pagesize=A4)
-    width, height = A4
-
-    BRAND = colors.HexColor("#00c336")
-
-    # ================= HEADER =================
-    p.setFillColor(BRAND)
-    p.setFont("Helvetica-Bold", 22)
-    p.drawString(40, height - 50, "CRYPTONITE")
-
-    p.setFont("Helvetica", 11)
-    p.setFillColor(colors.black)
-    p.drawRightString(
-        width - 40,
-        height - 50,
-        "INVOICE"
-    )
-
-    p.setStrokeColor(BRAND)
-    p.setLineWidth(3)
-    p.line(40, height - 65, width - 40, height - 65)
-
-    # ================= META =================
-    y = height - 110
-    p.setFont("Helvetica", 10)
-
-    meta = [
-        ("Invoice No", invoice.invoice_number),
-        ("Date", invoice.created_at.strftime("%d %b %Y")),
-        ("Customer", invoice.user.username),
-        ("Type", invoice.purchase_type.upper()),
-    ]
+    etag = stored_invoice_etag(invoice.id)
+    if etag:
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
 
-    for label, value in meta:
-        p.drawString(40, y, f"{label}:")
-        p.setFont("Helvetica-Bold", 10)
-        p.drawString(120, y, str(value))
-        p.setFont("Helvetica", 10)
-        y -= 18
-
-    # ================= TABLE HEADER =================
-    y -= 10
-    p.setFillColor(BRAND)
-    p.rect(40, y, width - 80, 22, fill=True, stroke=False)
-
-    p.setFillColor(colors.white)
-    p.setFont("Helvetica-Bold", 10)
-
-    headers = ["ITEM", "QTY", "UNIT PRICE", "TOTAL"]
-    x_positions = [45, 300, 360, 460]
-
-    for header, x in zip(headers, x_positions):
-        p.drawString(x, y + 6, header)
-
-    # ================= TABLE ROWS =================
-    p.setFillColor(colors.black)
-    p.setFont("Helvetica", 10)
-
-    y -= 22
-
-    for item in invoice.invoice_data.get("items", []):
-        p.drawString(45, y, item["title"][:40])
-        p.drawRightString(320, y, str(item["quantity"]))
-        p.drawRightString(420, y, item["unit_price"])
-        p.drawRightString(540, y, item["total_price"])
-        y -= 18
-
-    # ================= TOTAL =================
-    y -= 10
-    p.setStrokeColor(BRAND)
-    p.line(360, y, width - 40, y)
-
-    p.setFont("Helvetica-Bold", 12)
-    p.drawRightString(
-        width - 40,
-        y - 20,
-        f"TOTAL: {invoice.amount} {invoice.currency}"
-    )
+    pdf = get_invoice_pdf(invoice)
 
-    # ================= FOOTER =================
-    p.setFont("Helvetica", 9)
-    p.setFillColor(colors.grey)
-    p.drawCentredString(
-        width / 2,
-        40,
-        "This is a system-generated invoice. Payment confirmed."
+    response = HttpResponse(bytes(pdf.content), content_type="application/pdf")
+    response["Content-Disposition"] = (
+        f'attachment; filename="{invoice.invoice_number}.pdf"'
     )
-
-    p.showPage()
-    p.save()
-
+    response["ETag"] = invoice_etag(pdf.sha256)
+    response["Cache-Control"] = "private, no-cache"
     return response
 
 
@@ -1324,10 +1061,12 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.db import IntegrityError
 
 from .models import ProductReview
 from AdminApp.models import Product
 from .serializers import ProductReviewSerializer
+from .helpers.reviews import review_summary
 
 
 @api_view(["POST"])
@@ -1344,13 +1083,15 @@ def create_review(request, product_id):
 
     serializer = ProductReviewSerializer(data=request.data)
     if serializer.is_valid():
-        serializer.save(user=request.user, product=product)
-        reviews = ProductReview.objects.filter(product=product)
-        product.review_count = reviews.count()
-        product.average_rating = round(
-            sum(r.rating for r in reviews) / product.review_count, 1
-        )
-        product.save()
+        try:
+            # ProductReview.save moves the product's rating aggregates
+            serializer.save(user=request.user, product=product)
+        except IntegrityError:
+            # a concurrent request got in between the check above and the insert
+            return Response(
+                {"error": "You have already reviewed this product"},
+                status=400
+            )
         return Response(serializer.data, status=201)
 
     return Response(serializer.errors, status=400)
@@ -1358,9 +1099,23 @@ def create_review(request, product_id):
 
 @api_view(["GET"])
 def list_product_reviews(request, product_id):
-    reviews = ProductReview.objects.filter(product_id=product_id).order_by("-created_at")
-    serializer = ProductReviewSerializer(reviews, many=True)
-    return Response(serializer.data)
+    reviews = (
+        ProductReview.objects.filter(product_id=product_id)
+        .select_related("user")
+        .order_by("-created_at")
+    )
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(reviews, request)
+    serializer = ProductReviewSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(["GET"])
+def product_review_summary(request, product_id):
+    summary = review_summary(product_id)
+    if summary is None:
+        return Response({"error": "Product not found"}, status=404)
+    return Response(summary)
 
 
 # ---------------- GRAPH UNDER PRODUCT DETAIL PAGE -----------------
@@ -1371,10 +1126,11 @@ from rest_framework import status
 from AdminApp.models import Product
 
 from .helpers.mining import (
-    parse_hashrate,
     get_btc_price,
-    calculate_profitability
+    calculate_profitability,
+    calculate_profitability_batch
 )
+from .helpers.network import get_network_stats, network_arrays, network_for
 
 class CalculateProfitabilityAPIView(APIView):
     permission_classes = []
@@ -1398,21 +1154,123 @@ class CalculateProfitabilityAPIView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        hashrate_th = parse_hashrate(product.hashrate)
-        power = int(product.power)
+        hashrate_th = product.hashrate_th or 0.0
+        power = product.power_watts or 0.0
         btc_price = get_btc_price()
+        if btc_price is None:
+            return Response(
+                {"error": "BTC price is not available yet, retry shortly"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": MARKET_DATA_RETRY_AFTER}
+            )
+
+        # live network stats for the product's coin (cached, never blocks)
+        network = network_for(product.minable_coins, product.algorithm, get_network_stats())
 
         metrics = calculate_profitability(
             hashrate_th=hashrate_th,
             power_watts=power,
             btc_price=btc_price,
             number_of_miners=number_of_miners,
-            electricity_cost=electricity_cost
+            electricity_cost=electricity_cost,
+            network=network
         )
 
         return Response({
             "hashrate": hashrate_th,
             "power": power,
             "btc_price": btc_price,
+            "network": network,
             "metrics": metrics
         })
+
+
+# ---------------- BATCH PROFITABILITY (COMPARISON PAGES) -----------------
+
+from .serializers import MAX_BATCH_PRODUCTS, BatchProfitabilityRequestSerializer
+
+class BatchProfitabilityAPIView(APIView):
+    """
+    POST {
+        "product_ids": [1, 2, 3],            # optional, else the filtered catalog
+        "electricity_costs": [0.05, 0.08],   # optional, default [0.058]
+        "miner_counts": [1, 10]              # optional, default [1]
+    }
+    Catalog filters (ProductFilter) can be passed as query params,
+    e.g. ?brand=Bitmain&min_hashrate=100
+
+    Every metric comes back as a grid: metrics[name][cost_index][count_index]
+    At most MAX_BATCH_PRODUCTS products (by id); "truncated" says if more matched.
+    """
+    permission_classes = []
+
+    def post(self, request):
+        serializer = BatchProfitabilityRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        electricity_costs = serializer.validated_data.get("electricity_costs") or [0.058]
+        miner_counts = serializer.validated_data.get("miner_counts") or [1]
+
+        # same 400 as DjangoFilterBackend on the catalog list
+        filterset = ProductFilter(request.query_params, queryset=Product.objects.all())
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+        products = filterset.qs
+
+        product_ids = serializer.validated_data.get("product_ids")
+        if product_ids:
+            products = products.filter(id__in=product_ids)
+
+        rows = list(
+            products
+            .filter(hashrate_th__isnull=False, power_watts__isnull=False)
+            .order_by("id")
+            .values_list(
+                "id", "model_name", "hashrate_th", "power_watts", "minable_coins", "algorithm"
+            )[:MAX_BATCH_PRODUCTS + 1]
+        )
+        truncated = len(rows) > MAX_BATCH_PRODUCTS
+        rows = rows[:MAX_BATCH_PRODUCTS]
+
+        btc_price = get_btc_price()
+        if btc_price is None:
+            return Response(
+                {"error": "BTC price is not available yet, retry shortly"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": MARKET_DATA_RETRY_AFTER}
+            )
+
+        ids, names, hashrates, powers, coins, algorithms = zip(*rows) if rows else ((),) * 6
+
+        metrics = calculate_profitability_batch(
+            hashrates,
+            powers,
+            btc_price,
+            electricity_costs=electricity_costs,
+            miner_counts=miner_counts,
+            network=network_arrays(zip(coins, algorithms), get_network_stats()),
+        )
+        # one tolist() per metric instead of converting P x C x M numbers one by one
+        grids = {name: values.tolist() for name, values in metrics.items()}
+
+        results = [
+            {
+                "product_id": ids[i],
+                "model_name": names[i],
+                "hashrate": hashrates[i],
+                "power": powers[i],
+                "metrics": {name: grid[i] for name, grid in grids.items()},
+            }
+            for i in range(len(ids))
+        ]
+
+        return Response({
+            "btc_price": btc_price,
+            "electricity_costs": electricity_costs,
+            "miner_counts": miner_counts,
+            "results": results,
+            "truncated": truncated,     # more products matched than MAX_BATCH_PRODUCTS
+            "limit": MAX_BATCH_PRODUCTS,
+        })
+